@@ -5,17 +5,48 @@
 import json
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify, session, make_response, stream_with_context, stream_template, Blueprint, g, has_request_context, send_from_directory
+from flask.cli import AppGroup
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
+from flask import template_rendered, before_render_template
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from config import SQLALCHEMY_DATABASE_URI
 from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+import os
 import sys
-from datetime import datetime
+import csv
+import io
+import click
+import functools
+import hashlib
+import itertools
+import sqlite3
+import subprocess
+import time
+import threading
+import collections
+import mimetypes
+import shutil
+from sqlalchemy.engine import Engine
+from datetime import datetime, timezone, timedelta
+import search
+import cache
+import bulk_import
+import export
+import query_stats
+import intervals
+import metrics
+import assets
+import streaming
+import autocomplete
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -25,21 +56,60 @@ moment = Moment(app)
 app.config.from_object('config')
 
 app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
-app.config['SQLALCHEMY_ECHO'] = True
 
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 
+
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+  # SQLite only enforces foreign keys, ON DELETE CASCADE included, when each
+  # connection asks for it.
+  if isinstance(dbapi_connection, sqlite3.Connection):
+    dbapi_connection.execute('PRAGMA foreign_keys = ON')
+
 DEFAULT_ARTIST_IMAGE = "https://artcentereast.org/wp-content/uploads/2017/07/8415275-Artist-s-palette-with-paintbrushes-isolated-over-white-background-With-clipping-path-Stock-Photo.jpg"
 DEFAULT_VENUE_IMAGE = "https://upload.wikimedia.org/wikipedia/commons/e/e8/Vienna_-_Vienna_Opera_main_auditorium_-_9825.jpg"
 DEFAULT_SHOW_IMAGE = "https://i.ytimg.com/vi/1yBwWLunlOM/maxresdefault.jpg"
 
+SHOWS_PER_PAGE = 30
+MAX_SHOWS_PER_PAGE = 200
+# Listing pages stream their HTML and fetch rows in batches of this size.
+LISTING_YIELD_PER = 500
+
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+def trigram_index(name, column):
+    # GIN trigram index backing ILIKE '%term%' search on PostgreSQL; other dialects
+    # ignore the postgresql_* options and get a plain index.
+    return db.Index(name, column, postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+@event.listens_for(db.metadata, 'before_create')
+def create_trigram_extension(target, connection, **kw):
+    # The trigram indexes need pg_trgm before db.create_all() builds them.
+    if connection.dialect.name == 'postgresql':
+        connection.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+
+
+def hidden_index(name):
+    # Only the few soft-deleted rows waiting for `flask purge`.
+    condition = db.text('deleted_at IS NOT NULL')
+    return db.Index(name, 'deleted_at', postgresql_where=condition, sqlite_where=condition)
+
+
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        trigram_index('ix_venues_name_trgm', 'name'),
+        trigram_index('ix_venues_city_trgm', 'city'),
+        trigram_index('ix_venues_state_trgm', 'state'),
+        # Matches the city, state, id ordering of the venues listing.
+        db.Index('ix_venues_city_state', 'city', 'state', 'id'),
+        hidden_index('ix_venues_deleted_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -52,9 +122,18 @@ class Venue(db.Model):
     website = db.Column(db.String(120), nullable=True)
     seeking_talent = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String(500), default="")
-    children = db.relationship('VenueGenre', backref="venue", lazy=True,
-                               collection_class=list, cascade="all, delete, delete-orphan")
-    venue_shows = db.relationship("Show", backref="show_venue", cascade="all, delete, delete-orphan")
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set when the venue is deleted with SOFT_DELETE on: it disappears from every page
+    # at once and `flask purge` removes its rows later.
+    deleted_at = db.Column(db.DateTime)
+    # Genre rows and shows go with the venue through ON DELETE CASCADE; the ORM never
+    # loads them just to delete them (see Deletion).
+    children = db.relationship('VenueGenre', backref="venue", lazy=True, collection_class=list,
+                               cascade="all, delete, delete-orphan", passive_deletes=True)
+    venue_shows = db.relationship("Show", backref="show_venue", cascade="all, delete, delete-orphan",
+                                  passive_deletes=True)
 
     def __repr__ (self):
       return f'<Venue %r>' % self.name
@@ -62,6 +141,12 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        trigram_index('ix_artists_name_trgm', 'name'),
+        trigram_index('ix_artists_city_trgm', 'city'),
+        trigram_index('ix_artists_state_trgm', 'state'),
+        hidden_index('ix_artists_deleted_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -73,58 +158,1955 @@ class Artist(db.Model):
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String(500))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    deleted_at = db.Column(db.DateTime)
     children = db.relationship('ArtistGenre', backref="artist", lazy=True,
                                collection_class=list,
-                               cascade="all, delete, delete-orphan"
+                               cascade="all, delete, delete-orphan",
+                               passive_deletes=True
                               )
-    artist_shows = db.relationship("Show", backref="show_artist", cascade="all, delete, delete-orphan")
+    artist_shows = db.relationship("Show", backref="show_artist", cascade="all, delete, delete-orphan",
+                                   passive_deletes=True)
 
 
 class Show(db.Model):
   __tablename__ = 'shows'
+  # On PostgreSQL the migrations turn shows into a table range-partitioned by month on
+  # start_time, with primary key (id, start_time); see Show storage. The ORM keeps
+  # identifying shows by id alone.
+  #
+  # Partial index over the shows still counted as upcoming; it is all the periodic
+  # counter rollover has to look at.
+  __table_args__ = (
+    db.Index('ix_shows_counted_upcoming_start_time', 'start_time',
+             postgresql_where=db.text('counted_upcoming'), sqlite_where=db.text('counted_upcoming')),
+    # A venue's or artist's shows in start_time order, and the keyset-paged listing.
+    db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+    # SQLite would otherwise reuse the id of the newest show once it has been archived.
+    {'sqlite_autoincrement': True},
+  )
   id = db.Column(db.Integer, primary_key=True)
   start_time = db.Column(db.DateTime, nullable=False)
-  venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'))
-  artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'))
+  venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'))
+  artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'))
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+  # Whether this show is currently included in its venue's and artist's
+  # upcoming_show_count (True) or past_show_count (False).
+  counted_upcoming = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+  duration_minutes = db.Column(db.Integer, nullable=False, default=120, server_default='120')
+  # start_time + duration_minutes, kept by set_show_end_times so that overlap checks
+  # and the exclusion constraints below can use it directly.
+  end_time = db.Column(db.DateTime, nullable=False)
+
+
+# No two shows may overlap at one venue or for one artist. The conflict check in the
+# Show scheduling section is what enforces it. On PostgreSQL, GiST exclusion
+# constraints (btree_gist provides = on integers) back it up, but only within one
+# table: partitioned shows tables carry them per partition (PostgreSQL has no
+# exclusion constraints on partitioned tables), so two shows in different months'
+# partitions, e.g. one starting at 23:00 on the 31st and one at 00:30 on the 1st, are
+# not checked against each other by the database.
+def overlap_exclusion_sql(show_fk, table_name='shows'):
+  return (f'ALTER TABLE {table_name} ADD CONSTRAINT {table_name}_{show_fk}_overlap_excl '
+          f'EXCLUDE USING gist ({show_fk} WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def overlap_exclusion(show_fk):
+  return db.DDL(overlap_exclusion_sql(show_fk)).execute_if(dialect='postgresql')
+
+
+event.listen(Show.__table__, 'before_create',
+             db.DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+event.listen(Show.__table__, 'after_create', overlap_exclusion('venue_id'))
+event.listen(Show.__table__, 'after_create', overlap_exclusion('artist_id'))
+
+
+class ShowArchive(db.Model):
+  # Past shows moved out of shows by `flask shows roll` where shows is not partitioned.
+  # Same columns as Show, so queries over show history can run against either.
+  __tablename__ = 'shows_archive'
+  __table_args__ = (
+    db.Index('ix_shows_archive_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_shows_archive_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_shows_archive_start_time_id', 'start_time', 'id'),
+  )
+  id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  start_time = db.Column(db.DateTime, nullable=False)
+  venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'))
+  artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'))
+  updated_at = db.Column(db.DateTime, nullable=False)
+  counted_upcoming = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+  duration_minutes = db.Column(db.Integer, nullable=False)
+  end_time = db.Column(db.DateTime, nullable=False)
 
 
-# Is there a way to make these two genre classes extend a single Genre class without SQL-
-# Alchemy creating a database for that prototypical Genre class when calling 'flask db
-# migrate'?
+# Every table show rows live in; queries over show history read them all.
+SHOW_TABLES = (Show, ShowArchive)
+
 
 class Genre(db.Model):
-  __abstract__ = True
-  name = db.Column(db.String(20), primary_key=True)
+  # Genre dictionary. Venues and artists refer to genres by their small integer id, and
+  # each genre keeps how many venues and artists carry it, updated on every write (see
+  # Genres), so genre sidebars never count over the join tables.
+  __tablename__ = 'genres'
+  id = db.Column(db.Integer, primary_key=True)
+  name = db.Column(db.String(20), nullable=False, unique=True)
+  venue_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+  artist_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+  def __repr__(self):
+    return f'<Genre {self.name}>'
 
 
-class VenueGenre(Genre):
+class VenueGenre(db.Model):
   __tablename__ = 'venueGenres'
-  # name = db.Column(db.String(20), primary_key=True)
-  venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False, primary_key=True)
+  # The primary key serves a venue's genres; the reverse index serves genre filters.
+  __table_args__ = (
+    db.Index('ix_venueGenres_genre_id_venue_id', 'genre_id', 'venue_id'),
+  )
+  venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), nullable=False, primary_key=True)
+  genre_id = db.Column(db.Integer, db.ForeignKey('genres.id'), nullable=False, primary_key=True)
+  genre = db.relationship(Genre, lazy='joined', innerjoin=True)
+
+  @property
+  def name(self):
+    return self.genre.name
 
   def __repr__(self):
-    return f'<VenueGenre {self.name} {self.venue_id}>'
+    return f'<VenueGenre {self.genre_id} {self.venue_id}>'
 
 
-class ArtistGenre(Genre):
+class ArtistGenre(db.Model):
   __tablename__ = 'artistGenres'
-  # name = db.Column(db.String(20), primary_key=True)
-  artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False, primary_key=True)
+  __table_args__ = (
+    db.Index('ix_artistGenres_genre_id_artist_id', 'genre_id', 'artist_id'),
+  )
+  artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), nullable=False,
+                        primary_key=True)
+  genre_id = db.Column(db.Integer, db.ForeignKey('genres.id'), nullable=False, primary_key=True)
+  genre = db.relationship(Genre, lazy='joined', innerjoin=True)
+
+  @property
+  def name(self):
+    return self.genre.name
+
+
+class VenueSummary(db.Model):
+  # The venue page's data, serialized; see Detail summaries.
+  __tablename__ = 'venue_summaries'
+  venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True,
+                       autoincrement=False)
+  # JSON, or NULL until built and after a change to the page.
+  data = db.Column(db.Text)
+  # When the first upcoming show starts and the page changes by itself.
+  expires_at = db.Column(db.DateTime)
+
+
+class ArtistSummary(db.Model):
+  __tablename__ = 'artist_summaries'
+  artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True,
+                        autoincrement=False)
+  data = db.Column(db.Text)
+  expires_at = db.Column(db.DateTime)
+
+
+class TableVersion(db.Model):
+  # One row per listing page, bumped by every transaction that changes what the page
+  # shows (see Conditional requests), one per autocomplete index, bumped when a
+  # visible name is added, changed or removed (see Autocomplete), and one per search
+  # index, bumped when anything it searches changes (see Search).
+  __tablename__ = 'table_versions'
+  name = db.Column(db.String(20), primary_key=True)
+  version = db.Column(db.Integer, nullable=False, default=0)
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+TABLE_VERSION_NAMES = ('venues', 'artists', 'shows', 'venue_names', 'artist_names', 'venue_search',
+                       'artist_search')
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def insert_table_versions(target, connection, **kw):
+  connection.execute(target.insert(), [{'name': name, 'version': 0, 'updated_at': datetime.utcnow()}
+                                       for name in TABLE_VERSION_NAMES])
+
+
+# Case-insensitive name ordering and lookups.
+db.Index('ix_venues_lower_name', db.func.lower(Venue.name))
+db.Index('ix_artists_lower_name', db.func.lower(Artist.name))
+
+
+class ImportCheckpoint(db.Model):
+  # Progress of an interrupted `flask import`, committed in the same transaction as
+  # each batch so a resumed import neither skips nor repeats rows.
+  __tablename__ = 'importCheckpoints'
+  source = db.Column(db.String(500), primary_key=True)
+  kind = db.Column(db.String(20), nullable=False)
+  fingerprint = db.Column(db.String(100), nullable=False)
+  rows_committed = db.Column(db.Integer, nullable=False, default=0)
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  # Compiled pattern and parsed locale, once per (format, locale).
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+
+@functools.lru_cache(maxsize=4096)
+def format_datetime_cached(value, format, locale):
+  if format in ('long', 'short'):
+    return babel.dates.format_datetime(value, format, locale=locale)
+  pattern, parsed_locale = datetime_pattern(format, locale)
+  return pattern.apply(value, parsed_locale)
+
+
+def format_datetime(value, format='medium', locale=None):
+  # Views pass datetimes; strings are still accepted and parsed.
+  if not isinstance(value, datetime):
+    value = dateutil.parser.parse(value)
+  return format_datetime_cached(value, format, locale or babel.dates.LC_TIME)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+# Written by `flask assets build`; None until then, and the layout loads the source
+# files one by one.
+asset_manifest = assets.load_manifest(app.static_folder)
+
+# Built files never change under a given name, so browsers may keep them for a year.
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+  # url_for('static', filename=...) points at the fingerprinted copy once one is built.
+  if endpoint == 'static' and asset_manifest is not None:
+    built = asset_manifest['files'].get(values.get('filename'))
+    if built is not None:
+      values['filename'] = built
+
+
+def asset_urls(bundle):
+  if asset_manifest is not None and bundle in asset_manifest['files']:
+    return [url_for('static', filename=bundle)]
+  return [url_for('static', filename=source) for source in assets.BUNDLES[bundle]]
+
+app.jinja_env.globals['asset_urls'] = asset_urls
+
+
+@app.route('/static/dist/<path:filename>')
+def built_asset(filename):
+  # Serves the precompressed sibling the client accepts, with the original type.
+  available = asset_manifest['encodings'].get(f'{assets.DIST_DIRECTORY}/{filename}', []) if asset_manifest else []
+  encoding = assets.choose_encoding(request.accept_encodings, available)
+  suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+  response = send_from_directory(os.path.join(app.static_folder, assets.DIST_DIRECTORY), filename + suffix,
+                                 mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                                 max_age=ASSET_MAX_AGE)
+  if encoding is not None:
+    response.headers['Content-Encoding'] = encoding
+  if available:
+    response.vary.add('Accept-Encoding')
+  response.cache_control.public = True
+  response.cache_control.immutable = True
+  return response
+
+#----------------------------------------------------------------------------#
+# Genres.
+#----------------------------------------------------------------------------#
+
+# Model -> (join table, its foreign key to the model, Genre count column).
+GENRE_LINKS = {
+  Venue: (VenueGenre, VenueGenre.venue_id, Genre.venue_count),
+  Artist: (ArtistGenre, ArtistGenre.artist_id, Genre.artist_count),
+}
+
+
+def insert_ignoring_duplicates(connection, table):
+  if connection.dialect.name == 'postgresql':
+    return postgresql.insert(table).on_conflict_do_nothing()
+  if connection.dialect.name == 'sqlite':
+    return sqlite.insert(table).on_conflict_do_nothing()
+  return table.insert()
+
+
+def get_genre_ids(names, connection=None):
+  # {name: id} for the given genre names, adding names the dictionary has not seen.
+  # Concurrent writers adding the same name are fine: the insert skips duplicates.
+  names = list(dict.fromkeys(names))
+  if not names:
+    return {}
+  connection = connection or db.session.connection()
+  table = Genre.__table__
+  lookup = db.select(table.c.name, table.c.id).where(table.c.name.in_(names))
+  ids = dict(connection.execute(lookup).all())
+  missing = [name for name in names if name not in ids]
+  if missing:
+    connection.execute(insert_ignoring_duplicates(connection, table), [{'name': name} for name in missing])
+    ids = dict(connection.execute(lookup).all())
+  return ids
+
+
+def genre_filter(model, names):
+  # Entities carrying every one of the named genres, read from the (genre_id, entity)
+  # index of the join table.
+  names = set(names)
+  genre_model, genre_fk = GENRE_LINKS[model][:2]
+  return model.id.in_(
+    db.select(genre_fk).join(Genre, Genre.id == genre_model.genre_id).where(Genre.name.in_(names))
+    .group_by(genre_fk).having(db.func.count() == len(names))
+  )
+
+
+def genre_args():
+  return list(dict.fromkeys(name for name in request.args.getlist('genre') if name))
+
+
+def genre_facets_statement(model):
+  count_column = GENRE_LINKS[model][2]
+  return db.select(Genre.name, count_column.label('count')).where(count_column > 0).order_by(Genre.name)
+
+
+def get_genre_facets(model):
+  return db.session.execute(genre_facets_statement(model)).all()
+
+
+def add_genre_delta(deltas, count_column, genre_id, sign):
+  counts = deltas.setdefault(count_column.key, {})
+  counts[genre_id] = counts.get(genre_id, 0) + sign
+
+
+def apply_genre_deltas(connection, deltas):
+  table = Genre.__table__
+  for column_name, by_id in deltas.items():
+    params = [{'genre_id': genre_id, 'delta': delta} for genre_id, delta in by_id.items() if delta]
+    if params:
+      connection.execute(table.update().where(table.c.id == db.bindparam('genre_id')).values(
+        {column_name: table.c[column_name] + db.bindparam('delta')}), params)
+
+
+@event.listens_for(Session, 'after_flush')
+def update_genre_counts(session, flush_context):
+  deltas = {}
+  for instances, sign in ((session.new, 1), (session.deleted, -1)):
+    for instance in instances:
+      if isinstance(instance, VenueGenre):
+        add_genre_delta(deltas, Genre.venue_count, instance.genre_id, sign)
+      elif isinstance(instance, ArtistGenre):
+        add_genre_delta(deltas, Genre.artist_count, instance.genre_id, sign)
+  apply_genre_deltas(session.connection(), deltas)
+
+
+def reconcile_genre_counts(fix=False):
+  # Recounts the join tables, leaving out soft-deleted entities, and returns the
+  # (genre, column, stored, actual) rows that disagree with the stored facet counts;
+  # fix=True rewrites them.
+  mismatches = []
+  for model, (genre_model, genre_fk, count_column) in GENRE_LINKS.items():
+    actual = dict(db.session.query(genre_model.genre_id, db.func.count())
+                  .filter(genre_fk.notin_(hidden_ids(model)))
+                  .group_by(genre_model.genre_id))
+    for genre_id, name, stored in db.session.query(Genre.id, Genre.name, count_column):
+      if stored != actual.get(genre_id, 0):
+        mismatches.append((genre_id, name, count_column, stored, actual.get(genre_id, 0)))
+  if fix:
+    for genre_id, name, count_column, stored, expected in mismatches:
+      db.session.execute(Genre.__table__.update().where(Genre.id == genre_id).values({count_column.key: expected}))
+    queue_table_versions(db.session, Venue, Artist)
+    db.session.commit()
+  return [(name, count_column.key, stored, expected) for genre_id, name, count_column, stored, expected in mismatches]
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+SEARCH_RESULTS_LIMIT = 50
+SEARCH_RECHECK_SECONDS = 5
+SEARCHED_COLUMNS = ('name', 'city', 'state', 'deleted_at')
+
+# Model -> its table_versions row.
+SEARCH_GENERATIONS = {Venue: 'venue_search', Artist: 'artist_search'}
+
+
+def use_trigram_search():
+  backend = app.config.get('SEARCH_BACKEND')
+  if backend is None:
+    return db.engine.dialect.name == 'postgresql'
+  return backend == 'trigram'
+
+
+def make_search_loader(model, genre_model, genre_fk):
+  def load(ids):
+    entities = db.session.query(model.id, model.name, model.city, model.state).filter(model.deleted_at.is_(None))
+    genres = db.session.query(genre_fk, Genre.name).join(Genre, Genre.id == genre_model.genre_id)
+    if ids is not None:
+      entities = entities.filter(model.id.in_(ids))
+      genres = genres.filter(genre_fk.in_(ids))
+    genres_by_id = {}
+    for entity_id, genre in genres:
+      genres_by_id.setdefault(entity_id, []).append(genre)
+    for entity_id, name, city, state in entities:
+      fields = [(name, search.NAME_WEIGHT), (city, search.LOCATION_WEIGHT), (state, search.LOCATION_WEIGHT)]
+      entity_genres = genres_by_id.get(entity_id, [])
+      fields += [(genre, search.GENRE_WEIGHT) for genre in entity_genres]
+      yield entity_id, name, fields, entity_genres
+  return load
+
+
+def make_generation_reader(name):
+  def read():
+    return db.session.execute(db.select(TableVersion.version).where(TableVersion.name == name)).scalar()
+  return read
+
+
+def spawn_with_app_context(function):
+  def run():
+    with app.app_context():
+      function()
+  threading.Thread(target=run, daemon=True).start()
+
+
+search_indexes = {
+  model: search.SearchIndex(make_search_loader(model, genre_model, genre_fk),
+                            make_generation_reader(SEARCH_GENERATIONS[model]),
+                            SEARCH_RECHECK_SECONDS, spawn_with_app_context)
+  for model, genre_model, genre_fk in ((Venue, VenueGenre, VenueGenre.venue_id),
+                                       (Artist, ArtistGenre, ArtistGenre.artist_id))
+}
+
+
+def queue_search_generation(session, model):
+  session.info.setdefault('table_versions', set()).add(SEARCH_GENERATIONS[model])
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_search_changes(session, flush_context):
+  # This process's indexes reload the ids; other processes see the generation move.
+  changed = session.info.setdefault('search_changes', {})
+  for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+    if isinstance(instance, (Venue, Artist)):
+      changed.setdefault(type(instance), set()).add(instance.id)
+      if instance not in session.dirty or attribute_changed(instance, *SEARCHED_COLUMNS):
+        queue_search_generation(session, type(instance))
+    elif isinstance(instance, VenueGenre):
+      changed.setdefault(Venue, set()).add(instance.venue_id)
+      queue_search_generation(session, Venue)
+    elif isinstance(instance, ArtistGenre):
+      changed.setdefault(Artist, set()).add(instance.artist_id)
+      queue_search_generation(session, Artist)
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_search_changes(session):
+  for model, ids in session.info.pop('search_changes', {}).items():
+    search_indexes[model].invalidate(ids)
+    autocomplete_indexes[model].invalidate(ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_search_changes(session):
+  session.info.pop('search_changes', None)
+
+
+def trigram_search_statement(model, genre_model, genre_fk, term, limit, genres=()):
+  # Every token must match the name, city, state or a genre. pg_trgm serves each
+  # ILIKE '%token%' from a GIN index and similarity() ranks names closest to the term.
+  # The genre dictionary is small enough to match by scanning it.
+  statement = db.select(model.id, model.name, db.func.count().over().label('total')) \
+    .where(model.deleted_at.is_(None))
+  tokens = search.tokenize(term)
+  for token in tokens:
+    pattern = f'%{token}%'
+    statement = statement.where(db.or_(
+      model.name.ilike(pattern), model.city.ilike(pattern), model.state.ilike(pattern),
+      model.id.in_(db.select(genre_fk).join(Genre, Genre.id == genre_model.genre_id)
+                   .where(Genre.name.ilike(pattern)))
+    ))
+  if genres:
+    statement = statement.where(genre_filter(model, genres))
+  if tokens:
+    statement = statement.order_by(db.func.similarity(model.name, term).desc())
+  return statement.order_by(model.name, model.id).limit(limit)
+
+
+def trigram_matches(rows):
+  return [(row.id, row.name) for row in rows], rows[0].total if rows else 0
+
+
+def trigram_search(model, genre_model, genre_fk, term, limit, genres=()):
+  statement = trigram_search_statement(model, genre_model, genre_fk, term, limit, genres)
+  return trigram_matches(db.session.execute(statement).all())
+
+
+def upcoming_show_counts_statement(model, ids):
+  return db.select(model.id, model.upcoming_show_count).where(model.id.in_(ids))
+
+
+def get_upcoming_show_counts(model, ids):
+  if not ids:
+    return {}
+  return dict(db.session.execute(upcoming_show_counts_statement(model, ids)).all())
+
+
+def search_results(matches, total, counts):
+  return {
+    "count": total,
+    "data": [{"id": entity_id, "name": name, "num_upcoming_shows": counts.get(entity_id, 0)}
+             for entity_id, name in matches]
+  }
+
+
+def search_entities(model, genre_model, genre_fk, term, limit=SEARCH_RESULTS_LIMIT, genres=()):
+  if use_trigram_search():
+    matches, total = trigram_search(model, genre_model, genre_fk, term, limit, genres)
+  else:
+    matches, total = search_indexes[model].search(term, limit, tags=genres)
+  counts = get_upcoming_show_counts(model, [entity_id for entity_id, name in matches])
+  return search_results(matches, total, counts)
+
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
+
+# Venue and artist pickers on the show form query these per keystroke. Each worker
+# loads them when it starts: gunicorn.conf.py does it from post_worker_init, asgi.py
+# from the lifespan startup, and other servers (flask run) start loading in the
+# background on the first request of any kind. The search commit hooks above hand
+# them the ids every commit in this process touched, which the next query reloads by
+# primary key. Other processes (workers, `flask import`, `flask purge`) bump a name
+# generation in table_versions, which each index checks every few seconds and
+# answers with a full reload in the background.
+
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+AUTOCOMPLETE_RECHECK_SECONDS = 5
+
+# Model -> its table_versions row.
+NAME_GENERATIONS = {Venue: 'venue_names', Artist: 'artist_names'}
+
+
+def queue_name_changes(session, model):
+  session.info.setdefault('table_versions', set()).add(NAME_GENERATIONS[model])
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_name_changes(session, flush_context):
+  for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+    if isinstance(instance, (Venue, Artist)) and \
+        (instance not in session.dirty or attribute_changed(instance, 'name', 'deleted_at')):
+      queue_name_changes(session, type(instance))
+
+
+def make_autocomplete_loader(model):
+  def load(ids):
+    entries = db.session.query(model.id, model.name).filter(model.deleted_at.is_(None))
+    if ids is not None:
+      entries = entries.filter(model.id.in_(ids))
+    return entries.all()
+  return load
+
+
+autocomplete_indexes = {
+  model: autocomplete.PrefixIndex(make_autocomplete_loader(model),
+                                  make_generation_reader(NAME_GENERATIONS[model]),
+                                  AUTOCOMPLETE_RECHECK_SECONDS, spawn_with_app_context)
+  for model in (Venue, Artist)
+}
+
+
+autocomplete_warming = threading.Event()
+
+
+def load_autocomplete_indexes():
+  autocomplete_warming.set()
+  with app.app_context():
+    for index in autocomplete_indexes.values():
+      index.reload()
+
+
+@app.before_request
+def warm_autocomplete_indexes():
+  # Tests keep the first query synchronous, on their own connection.
+  if app.testing or autocomplete_warming.is_set():
+    return
+  autocomplete_warming.set()
+  threading.Thread(target=load_autocomplete_indexes, daemon=True).start()
+
+
+def autocomplete_response(model):
+  limit = min(max(request.args.get('limit', AUTOCOMPLETE_LIMIT, type=int), 1), MAX_AUTOCOMPLETE_LIMIT)
+  matches = autocomplete_indexes[model].complete(request.args.get('q', ''), limit)
+  return jsonify(data=[{"id": entity_id, "name": name} for entity_id, name in matches])
+
+#----------------------------------------------------------------------------#
+# Cache.
+#----------------------------------------------------------------------------#
+
+def make_detail_cache():
+  backend = app.config.get('DETAIL_CACHE_BACKEND')
+  ttl = app.config.get('DETAIL_CACHE_TTL', 300)
+  if backend == 'memory':
+    return cache.LRUCache(max_entries=app.config.get('DETAIL_CACHE_MAX_ENTRIES', 1024), ttl=ttl)
+  if backend == 'redis':
+    return cache.RedisCache.from_url(app.config['DETAIL_CACHE_REDIS_URL'], ttl=ttl)
+  return None
+
+
+detail_cache = make_detail_cache()
+
+
+def next_show_start(data):
+  # A page stops being correct as soon as its first upcoming show starts, since that
+  # show has to move to the past section.
+  if not data["upcoming_shows"]:
+    return None
+  next_start = data["upcoming_shows"][0]["start_time"]
+  if not isinstance(next_start, datetime):
+    next_start = datetime.fromisoformat(next_start)
+  return next_start
+
+
+def seconds_until_next_show(data):
+  # Cached pages expire when their first upcoming show starts.
+  next_start = next_show_start(data)
+  return None if next_start is None else (next_start - datetime.now()).total_seconds()
+
+
+def get_cached_detail(key, load):
+  if detail_cache is None:
+    return load()
+  data = detail_cache.get(key)
+  metrics.record_cache('detail', data is not None)
+  if data is None:
+    data = load()
+    if data is not None:
+      detail_cache.set(key, data, ttl=seconds_until_next_show(data))
+  return data
+
+
+def counterpart_ids(session, model, entity_id, tables=SHOW_TABLES):
+  # Ids of the venues or artists the entity has shows with.
+  prefix, show_fk, counterpart_fk, counterpart, counterpart_prefix = SHOW_LINKS[model]
+  rows = session.execute(db.union(*(db.select(getattr(shows, counterpart_fk))
+                                    .where(getattr(shows, show_fk) == entity_id) for shows in tables)))
+  return {counterpart_id for counterpart_id, in rows if counterpart_id is not None}
+
+
+def counterpart_keys(session, model, entity_id):
+  counterpart_prefix = SHOW_LINKS[model][4]
+  return {f'{counterpart_prefix}:{counterpart_id}' for counterpart_id in counterpart_ids(session, model, entity_id)}
+
+
+def show_parent_ids(show):
+  # ('venue', id) and ('artist', id) pairs a pending, changed or deleted show belongs
+  # to, including the previous parent when a foreign key was reassigned.
+  state = db.inspect(show)
+  for attr, prefix in (('venue_id', 'venue'), ('artist_id', 'artist')):
+    history = state.attrs[attr].history
+    for entity_id in list(history.unchanged or ()) + list(history.added or ()) + list(history.deleted or ()):
+      if entity_id is not None:
+        yield prefix, entity_id
+
+
+def attribute_changed(instance, *names):
+  state = db.inspect(instance)
+  return any(state.attrs[name].history.has_changes() for name in names)
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_detail_cache_changes(session, flush_context):
+  # Work out which detail pages a flush touched, for the detail cache and the detail
+  # summaries. A show appears on one venue page and one artist page; a venue or artist
+  # rename, image change or soft delete also shows up on the pages of everyone it has
+  # shows with.
+  keys = session.info.setdefault('detail_cache_keys', set())
+  for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+    if isinstance(instance, Show):
+      keys |= {f'{prefix}:{entity_id}' for prefix, entity_id in show_parent_ids(instance)}
+    elif isinstance(instance, VenueGenre):
+      keys.add(f'venue:{instance.venue_id}')
+    elif isinstance(instance, ArtistGenre):
+      keys.add(f'artist:{instance.artist_id}')
+    elif isinstance(instance, Venue):
+      keys.add(f'venue:{instance.id}')
+      if instance in session.dirty and attribute_changed(instance, 'name', 'image_link', 'deleted_at'):
+        keys |= counterpart_keys(session, Venue, instance.id)
+    elif isinstance(instance, Artist):
+      keys.add(f'artist:{instance.id}')
+      if instance in session.dirty and attribute_changed(instance, 'name', 'image_link', 'deleted_at'):
+        keys |= counterpart_keys(session, Artist, instance.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_detail_cache_changes(session):
+  keys = session.info.pop('detail_cache_keys', None)
+  if keys and detail_cache is not None:
+    detail_cache.delete_many(keys)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_detail_cache_changes(session):
+  session.info.pop('detail_cache_keys', None)
+
+#----------------------------------------------------------------------------#
+# Detail summaries.
+#----------------------------------------------------------------------------#
+
+# Venue and artist pages are read from venue_summaries and artist_summaries, one
+# primary-key lookup each, and their ETag is a digest of the summary itself. A write
+# that changes a page clears its summary in the same transaction, using the keys
+# collected for the detail cache, and the next read rebuilds it; so does a read after
+# the page's first upcoming show has started. Clearing and rebuilding both go through
+# the summary row, so one waits for the other and a rebuild never stores a page older
+# than a committed write. Missing and hidden entities have no summary row.
+
+SUMMARY_BATCH_SIZE = 500
+
+# Key prefix -> (model, summary model, its foreign key).
+SUMMARY_LINKS = {
+  'venue': (Venue, VenueSummary, VenueSummary.venue_id),
+  'artist': (Artist, ArtistSummary, ArtistSummary.artist_id),
+}
+
+
+def summary_ids(keys):
+  # {'venue': ids, 'artist': ids} from 'venue:<id>' / 'artist:<id>' keys.
+  ids = {kind: set() for kind in SUMMARY_LINKS}
+  for key in keys:
+    kind, entity_id = key.split(':')
+    ids[kind].add(int(entity_id))
+  return ids
+
+
+def insert_summary_rows(connection, kind, ids, clear=False):
+  # Adds a summary row for each existing entity in ids that has none; with clear, also
+  # clears the rows already there. One upsert rather than an UPDATE, so that it waits
+  # for a rebuild whose new row is not committed yet.
+  model, summary, summary_fk = SUMMARY_LINKS[kind]
+  dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+  statement = dialect.insert(summary.__table__).from_select(
+    [summary_fk.name], db.select(model.id).where(model.id.in_(ids)))
+  if clear:
+    statement = statement.on_conflict_do_update(index_elements=[summary_fk.name],
+                                                set_={'data': None, 'expires_at': None})
+  else:
+    statement = statement.on_conflict_do_nothing()
+  connection.execute(statement)
+
+
+def batched(rows, size):
+  # Lists of up to size rows; itertools.batched arrives in Python 3.12.
+  rows = iter(rows)
+  while batch := list(itertools.islice(rows, size)):
+    yield batch
+
+
+@event.listens_for(Session, 'before_commit')
+def clear_changed_summaries(session):
+  session.flush()
+  for kind, ids in summary_ids(session.info.get('detail_cache_keys', ())).items():
+    for batch in batched(sorted(ids), SUMMARY_BATCH_SIZE):
+      insert_summary_rows(session.connection(), kind, batch, clear=True)
+
+
+def summary_statement(kind, entity_id):
+  model, summary, summary_fk = SUMMARY_LINKS[kind]
+  return db.select(summary.data, summary.expires_at).where(summary_fk == entity_id)
+
+
+def fresh_summary(row):
+  # The page data from a summary_statement row, or None if it has to be rebuilt.
+  if row is None or row.data is None or (row.expires_at is not None and row.expires_at <= datetime.now()):
+    return None
+  return json.loads(row.data, object_hook=cache.decode_value)
+
+
+def build_summaries(kind, ids):
+  # Builds the summaries of ids that are still stale once their rows are locked, and
+  # returns {id: data} for the visible ones. The rows are locked before anything is
+  # read, so a write clearing them has either committed by then or waits until this
+  # transaction ends; readers that found the same summary stale wait here and then
+  # take the first one's result.
+  model, summary, summary_fk = SUMMARY_LINKS[kind]
+  connection = db.session.connection()
+  ids = sorted(ids)
+  insert_summary_rows(connection, kind, ids)
+  rows = db.session.execute(db.select(summary_fk.label('entity_id'), summary.data, summary.expires_at)
+                            .where(summary_fk.in_(ids)).order_by(summary_fk).with_for_update()).all()
+  fresh = {row.entity_id: fresh_summary(row) for row in rows}
+  stale = [entity_id for entity_id, data in fresh.items() if data is None]
+  if not stale:
+    return fresh
+  entities = db.session.execute(db.select(model).options(db.joinedload(model.children))
+                                .where(model.id.in_(stale), model.deleted_at.is_(None))).unique().scalars()
+  built = {entity.id: SUMMARY_BUILDERS[kind](entity) for entity in entities}
+  table = summary.__table__
+  if built:
+    params = [{'entity_id': entity_id, 'summary_data': json.dumps(data, default=cache.encode_value, separators=(',', ':')),
+               'summary_expires_at': next_show_start(data)} for entity_id, data in built.items()]
+    connection.execute(table.update().where(summary_fk == db.bindparam('entity_id')).values(
+      data=db.bindparam('summary_data'), expires_at=db.bindparam('summary_expires_at')), params)
+  hidden = [entity_id for entity_id in stale if entity_id not in built]
+  if hidden:
+    connection.execute(table.delete().where(summary_fk.in_(hidden)))
+  return {entity_id: data for entity_id, data in {**fresh, **built}.items() if data is not None}
+
+
+def rebuild_summary(kind, entity_id):
+  data = build_summaries(kind, [entity_id]).get(entity_id)
+  db.session.commit()
+  return data
+
+
+def load_stale_summary(kind, entity_id, row):
+  # For a summary_statement row without fresh data: rebuilds it, or returns None
+  # without writing anything when there is no row and no visible entity to build.
+  model = SUMMARY_LINKS[kind][0]
+  if row is None and db.session.execute(db.select(model.id).where(
+      model.id == entity_id, model.deleted_at.is_(None))).first() is None:
+    return None
+  return rebuild_summary(kind, entity_id)
+
+
+def get_summary(kind, entity_id):
+  # The page data of a visible venue or artist, else None.
+  row = db.session.execute(summary_statement(kind, entity_id)).first()
+  data = fresh_summary(row)
+  if data is None:
+    data = load_stale_summary(kind, entity_id, row)
+  return data
+
+
+def rebuild_all_summaries(stale_only=False, batch_size=SUMMARY_BATCH_SIZE):
+  # Rebuilds every summary, or with stale_only those missing, cleared or expired, a
+  # batch per transaction. Returns {kind: number rebuilt}.
+  rebuilt = {}
+  for kind, (model, summary, summary_fk) in SUMMARY_LINKS.items():
+    statement = db.select(model.id).where(model.deleted_at.is_(None)).order_by(model.id)
+    if stale_only:
+      statement = statement.outerjoin(summary, summary_fk == model.id).where(
+        db.or_(summary.data.is_(None), summary.expires_at <= datetime.now()))
+    count = 0
+    for batch in batched(db.session.execute(statement).scalars().all(), batch_size):
+      count += len(build_summaries(kind, batch))
+      db.session.commit()
+    rebuilt[kind] = count
+  return rebuilt
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+# Listing -> the models whose rows it shows. A show's counters live on its venue and
+# artist, so shows count towards all three.
+VERSIONED_MODELS = {
+  Venue: ('venues',), VenueGenre: ('venues',),
+  Artist: ('artists',), ArtistGenre: ('artists',),
+  Show: ('shows', 'venues', 'artists'), ShowArchive: ('shows',),
+}
+
+
+def queue_table_versions(session, *models):
+  # Core statements bypass the flush hook below; they name what they changed here.
+  session.info.setdefault('table_versions', set()).update(
+    itertools.chain.from_iterable(VERSIONED_MODELS[model] for model in models))
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_table_versions(session, flush_context):
+  for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+    if type(instance) in VERSIONED_MODELS:
+      queue_table_versions(session, type(instance))
+
+
+@event.listens_for(Session, 'before_commit')
+def bump_table_versions(session):
+  # In the committing transaction, so a version never runs ahead of or behind the rows
+  # it stands for. Concurrent writers to the same listing queue up on its row here,
+  # in name order, for the rest of their commit.
+  session.flush()
+  names = session.info.pop('table_versions', None)
+  if names:
+    table = TableVersion.__table__
+    bumped = session.info.setdefault('bumped_versions', {})
+    for name in sorted(names):
+      bumped[name] = session.execute(table.update().where(table.c.name == name)
+                                     .values(version=table.c.version + 1, updated_at=datetime.utcnow())
+                                     .returning(table.c.version)).scalar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_table_versions(session):
+  session.info.pop('table_versions', None)
+  session.info.pop('bumped_versions', None)
+
+
+@event.listens_for(Session, 'after_flush')
+def touch_parent_versions(session, flush_context):
+  # Shows, genre rows and counterpart names are part of their venue's and artist's
+  # pages, so any change to them bumps the parent's updated_at, which is all the
+  # version query reads. Core UPDATEs keep this out of the ORM flush.
+  touched = {'venue': set(), 'artist': set()}
+  for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+    if isinstance(instance, Show):
+      for prefix, entity_id in show_parent_ids(instance):
+        touched[prefix].add(entity_id)
+    elif isinstance(instance, VenueGenre):
+      touched['venue'].add(instance.venue_id)
+    elif isinstance(instance, ArtistGenre):
+      touched['artist'].add(instance.artist_id)
+    elif isinstance(instance, (Venue, Artist)) and instance in session.dirty and \
+        attribute_changed(instance, 'name', 'image_link', 'deleted_at'):
+      model = type(instance)
+      touched[SHOW_LINKS[model][4]] |= counterpart_ids(session, model, instance.id)
+  touch_updated_at(session, Venue, touched['venue'])
+  touch_updated_at(session, Artist, touched['artist'])
+
+
+def touch_updated_at(session, model, ids):
+  if ids:
+    session.execute(model.__table__.update().where(model.id.in_(ids)).values(updated_at=datetime.utcnow()))
+    queue_table_versions(session, model)
+
+
+def as_utc(value, local=False):
+  # updated_at is stored as naive UTC; show start times are naive local time.
+  if value is None:
+    return None
+  return value.astimezone(timezone.utc) if local else value.replace(tzinfo=timezone.utc)
+
+
+def page_version(key, modified, *parts):
+  # (etag, last_modified) for a page whose content last changed at max(modified);
+  # parts carry whatever else the representation depends on, such as row counts.
+  last_modified = max((value for value in modified if value is not None), default=None)
+  digest = hashlib.sha1(repr((key, last_modified, parts)).encode()).hexdigest()[:24]
+  return digest, last_modified
+
+
+def entity_version_statement(model, show_fk, entity_id):
+  # The entity's row by primary key, and the latest start time that has passed from
+  # the (show_fk, start_time) index: a show moving from upcoming to past changes the
+  # page without any write.
+  last_passed = db.select(db.func.max(Show.start_time)) \
+    .where(show_fk == entity_id, Show.start_time <= datetime.now()).scalar_subquery()
+  return db.select(model.updated_at, last_passed).where(model.id == entity_id, model.deleted_at.is_(None))
+
+
+def venue_version_statement(venue_id):
+  return entity_version_statement(Venue, Show.venue_id, venue_id)
+
+
+def artist_version_statement(artist_id):
+  return entity_version_statement(Artist, Show.artist_id, artist_id)
+
+
+def entity_version(key, row):
+  if row is None:
+    return None
+  return page_version(key, [as_utc(row[0]), as_utc(row[1], local=True)])
+
+
+def venue_version(venue_id):
+  return entity_version(f'venue:{venue_id}', db.session.execute(venue_version_statement(venue_id)).first())
+
+
+def artist_version(artist_id):
+  return entity_version(f'artist:{artist_id}', db.session.execute(artist_version_statement(artist_id)).first())
+
+
+def listing_version_statement(*models):
+  # The versions only go up, so their sum changes whenever any of them does.
+  names = set(itertools.chain.from_iterable(VERSIONED_MODELS[model][:1] for model in models))
+  return db.select(db.func.sum(TableVersion.version), db.func.max(TableVersion.updated_at)) \
+    .where(TableVersion.name.in_(names))
+
+
+def listing_version(key, row):
+  return page_version(key, [as_utc(row[1])], row[0])
+
+
+def data_version(key, data):
+  # For pages read whole from a summary or cache: the data is the version, so checking
+  # it costs nothing beyond loading the page.
+  encoded = json.dumps(data, default=cache.encode_value, sort_keys=True, separators=(',', ':'))
+  return page_version(key, [], hashlib.sha1(encoded.encode()).hexdigest())
+
+
+def venues_version():
+  return listing_version('venues', db.session.execute(listing_version_statement(Venue)).one())
+
+
+def artists_version():
+  return listing_version('artists', db.session.execute(listing_version_statement(Artist)).one())
+
+
+def shows_version():
+  return listing_version('shows', db.session.execute(listing_version_statement(Show, Venue, Artist)).one())
+
+
+def is_not_modified(version):
+  etag, last_modified = version
+  if request.if_none_match:
+    not_modified = request.if_none_match.contains(etag)
+  else:
+    not_modified = request.if_modified_since is not None and last_modified is not None and \
+      last_modified.replace(microsecond=0) <= request.if_modified_since
+  metrics.record_cache('http', not_modified)
+  return not_modified
+
+
+def mark_version(response, version):
+  etag, last_modified = version
+  if response.status_code in (200, 304):
+    response.set_etag(etag)
+    if last_modified is not None:
+      response.last_modified = last_modified
+    response.cache_control.no_cache = True
+  return response
+
+
+def versioned_response(version, render):
+  # A 304 when the client already has this version of the page, else render().
+  if version is None or '_flashes' in session:
+    return render()
+  if is_not_modified(version):
+    return mark_version(Response(status=304), version)
+  return mark_version(make_response(render()), version)
+
+
+def conditional(get_version):
+  # Answers If-None-Match / If-Modified-Since with a 304 from a single version query,
+  # before the view loads relationships or renders a template. Pages are marked
+  # no-cache so clients always revalidate instead of serving them from cache blind.
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+      # A pending flash message has to be rendered into the page, so skip the check.
+      version = None if '_flashes' in session else get_version(*args, **kwargs)
+      return versioned_response(version, lambda: view(*args, **kwargs))
+    return wrapper
+  return decorator
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+COUNTER_ROLLOVER_BATCH_SIZE = 1000
+
+
+@event.listens_for(Session, 'before_flush')
+def classify_new_shows(session, flush_context, instances):
+  now = datetime.now()
+  for instance in list(session.new) + list(session.dirty):
+    if isinstance(instance, Show) and (instance in session.new or attribute_changed(instance, 'start_time')):
+      instance.counted_upcoming = instance.start_time > now
+
+
+def counted_values(state, attrs, current):
+  # Values a show was counted under before this flush (current=False) or is counted
+  # under after it (current=True), from the attribute history.
+  values = []
+  for attr in attrs:
+    history = state.attrs[attr].history
+    if current:
+      values.append((history.added or history.unchanged or [None])[0])
+    else:
+      values.append((history.deleted or history.unchanged or [None])[0])
+  return values
+
+
+def add_counter_delta(deltas, venue_id, artist_id, upcoming, sign):
+  column = 'upcoming' if upcoming else 'past'
+  for model, entity_id in ((Venue, venue_id), (Artist, artist_id)):
+    if entity_id is not None:
+      counts = deltas[model].setdefault(int(entity_id), {'upcoming': 0, 'past': 0})
+      counts[column] += sign
+
+
+def apply_counter_deltas(connection, deltas):
+  for model, by_id in deltas.items():
+    params = [{'entity_id': entity_id, 'upcoming': counts['upcoming'], 'past': counts['past']}
+              for entity_id, counts in by_id.items() if counts['upcoming'] or counts['past']]
+    if params:
+      table = model.__table__
+      connection.execute(table.update().where(table.c.id == db.bindparam('entity_id')).values(
+        upcoming_show_count=table.c.upcoming_show_count + db.bindparam('upcoming'),
+        past_show_count=table.c.past_show_count + db.bindparam('past')
+      ), params)
+
+
+@event.listens_for(Session, 'after_flush')
+def update_show_counters(session, flush_context):
+  attrs = ('venue_id', 'artist_id', 'counted_upcoming')
+  deltas = {Venue: {}, Artist: {}}
+  for instance in session.new:
+    if isinstance(instance, Show):
+      add_counter_delta(deltas, instance.venue_id, instance.artist_id, instance.counted_upcoming, 1)
+  for instance in session.deleted:
+    if isinstance(instance, Show):
+      add_counter_delta(deltas, *counted_values(db.inspect(instance), attrs, current=False), -1)
+  for instance in session.dirty:
+    if isinstance(instance, Show) and attribute_changed(instance, *attrs):
+      state = db.inspect(instance)
+      add_counter_delta(deltas, *counted_values(state, attrs, current=False), -1)
+      add_counter_delta(deltas, *counted_values(state, attrs, current=True), 1)
+  apply_counter_deltas(session.connection(), deltas)
+
+
+def rollover_show_counters(now=None, batch_size=COUNTER_ROLLOVER_BATCH_SIZE):
+  # Moves shows whose start_time has passed from the upcoming to the past counters, a
+  # locked batch at a time. Bulk statements, so the ORM counter hooks don't fire.
+  now = now or datetime.now()
+  moved = 0
+  while True:
+    rows = db.session.query(Show.id, Show.venue_id, Show.artist_id) \
+      .filter(Show.counted_upcoming == True, Show.start_time <= now, visible_shows()) \
+      .order_by(Show.start_time).limit(batch_size).with_for_update().all()
+    if not rows:
+      break
+    deltas = {Venue: {}, Artist: {}}
+    for row in rows:
+      add_counter_delta(deltas, row.venue_id, row.artist_id, True, -1)
+      add_counter_delta(deltas, row.venue_id, row.artist_id, False, 1)
+    db.session.execute(Show.__table__.update().where(Show.id.in_([row.id for row in rows]))
+                       .values(counted_upcoming=False))
+    apply_counter_deltas(db.session.connection(), deltas)
+    queue_table_versions(db.session, Show)
+    db.session.commit()
+    moved += len(rows)
+  return moved
+
+
+def reconcile_show_counters(fix=False, now=None):
+  # Recounts every venue's and artist's visible shows from the show tables and
+  # returns the (model, id, stored, actual) rows that disagree; hidden entities count
+  # none. With fix=True the counters and the counted_upcoming flags are rewritten from
+  # the recount.
+  now = now or datetime.now()
+  mismatches = []
+  for model in (Venue, Artist):
+    actual = {}
+    for shows in SHOW_TABLES:
+      show_fk = getattr(shows, SHOW_LINKS[model][1])
+      rows = db.session.query(show_fk, shows.start_time > now, db.func.count(shows.id)) \
+        .filter(show_fk.isnot(None), visible_shows(shows)).group_by(show_fk, shows.start_time > now)
+      for entity_id, upcoming, count in rows:
+        actual.setdefault(entity_id, [0, 0])[0 if upcoming else 1] += count
+    for entity_id, upcoming_count, past_count in db.session.query(model.id, model.upcoming_show_count, model.past_show_count):
+      expected = tuple(actual.get(entity_id, (0, 0)))
+      if (upcoming_count, past_count) != expected:
+        mismatches.append((model, entity_id, (upcoming_count, past_count), expected))
+
+  if fix:
+    for shows in SHOW_TABLES:
+      db.session.execute(shows.__table__.update().values(counted_upcoming=shows.start_time > now))
+    for model, entity_id, stored, expected in mismatches:
+      db.session.execute(model.__table__.update().where(model.id == entity_id)
+                         .values(upcoming_show_count=expected[0], past_show_count=expected[1]))
+      db.session.info.setdefault('detail_cache_keys', set()).add(f'{SHOW_LINKS[model][0]}:{entity_id}')
+    queue_table_versions(db.session, Show)
+    db.session.commit()
+  return mismatches
+
+#----------------------------------------------------------------------------#
+# Show scheduling.
+#----------------------------------------------------------------------------#
+
+DEFAULT_SHOW_DURATION = 120
+# Longest allowed show in minutes. It bounds every overlap lookup: a show overlapping
+# [start, end) must start after start - MAX_SHOW_DURATION.
+MAX_SHOW_DURATION = 24 * 60
+
+
+class ShowConflict(Exception):
+
+  def __init__(self, conflicts):
+    super().__init__(f'overlaps {len(conflicts)} booked show(s)')
+    # [('venue' | 'artist', show id), ...]
+    self.conflicts = conflicts
+
+
+def use_exclusion_constraints():
+  return db.engine.dialect.name == 'postgresql'
+
+
+def show_end_time(start_time, duration_minutes):
+  return start_time + timedelta(minutes=duration_minutes or DEFAULT_SHOW_DURATION)
+
+
+@event.listens_for(Session, 'before_flush')
+def set_show_end_times(session, flush_context, instances):
+  for instance in list(session.new) + list(session.dirty):
+    if isinstance(instance, Show) and (instance in session.new or
+                                       attribute_changed(instance, 'start_time', 'duration_minutes')):
+      instance.duration_minutes = instance.duration_minutes or DEFAULT_SHOW_DURATION
+      instance.end_time = show_end_time(instance.start_time, instance.duration_minutes)
+
+
+def load_show_intervals(key):
+  prefix, entity_id = key
+  merged = union_shows(lambda shows: db.select(shows.start_time, shows.end_time, shows.id)
+                       .where(getattr(shows, f'{prefix}_id') == entity_id))
+  return db.session.execute(db.select(merged)).all()
+
+
+# Per-venue and per-artist bookings for databases without exclusion constraints. The
+# shows table version tells each process when another one has booked, moved or
+# removed shows.
+show_intervals = intervals.IntervalIndex(load_show_intervals, timedelta(minutes=MAX_SHOW_DURATION),
+                                         make_generation_reader('shows'))
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_show_interval_changes(session, flush_context):
+  keys = session.info.setdefault('show_interval_keys', set())
+  for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+    if isinstance(instance, Show):
+      keys.update(show_parent_ids(instance))
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_show_interval_changes(session):
+  show_intervals.invalidate(session.info.pop('show_interval_keys', ()))
+  bumped = session.info.pop('bumped_versions', {})
+  if 'shows' in bumped:
+    show_intervals.advance(bumped['shows'])
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_show_interval_changes(session):
+  session.info.pop('show_interval_keys', None)
+
+
+def find_show_conflicts(venue_id, artist_id, start_time, end_time, exclude_id=None):
+  # [('venue' | 'artist', show id)] for booked shows overlapping [start_time, end_time)
+  # at the venue or for the artist. On PostgreSQL this is a range scan of the
+  # (venue_id, start_time) and (artist_id, start_time) indexes over every partition.
+  # It is the authoritative check: callers lock the venue and artist rows first
+  # (missing_show_parents, make_id_resolver), so concurrent bookings for either are
+  # checked one after the other rather than relying on the per-partition exclusion
+  # constraints.
+  if use_exclusion_constraints():
+    rows = db.session.query(Show.id, Show.venue_id, Show.artist_id).filter(
+      db.or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+      Show.start_time > start_time - timedelta(minutes=MAX_SHOW_DURATION),
+      Show.start_time < end_time,
+      Show.end_time > start_time,
+      Show.id != exclude_id if exclude_id is not None else db.true(),
+    ).order_by(Show.start_time).all()
+    return [('venue' if row.venue_id == venue_id else 'artist', row.id) for row in rows]
+  # Elsewhere the sets are checked against the shows table version read in the
+  # caller's transaction, so bookings committed by other processes are seen.
+  show_intervals.sync()
+  return [(prefix, show_id)
+          for prefix, entity_id in (('venue', venue_id), ('artist', artist_id))
+          for show_id in show_intervals.overlapping((prefix, entity_id), start_time, end_time, exclude_id)]
+
+
+def check_show_conflicts(venue_id, artist_id, start_time, end_time, exclude_id=None):
+  conflicts = find_show_conflicts(venue_id, artist_id, start_time, end_time, exclude_id)
+  if conflicts:
+    raise ShowConflict(conflicts)
+
+
+def missing_show_parents(venue_id, artist_id):
+  # 'venue' and/or 'artist' when there is no such visible row. The rows that are found
+  # stay locked until commit, so neither can be deleted or hidden while a show is
+  # booked against it, and other bookings for them wait for this one before running
+  # their conflict check. FOR NO KEY UPDATE leaves the foreign key checks of other
+  # tables' inserts alone.
+  return [prefix for prefix, model, entity_id in (('venue', Venue, venue_id), ('artist', Artist, artist_id))
+          if db.session.execute(db.select(model.id).where(model.id == entity_id, model.deleted_at.is_(None))
+                                .with_for_update(key_share=True)).scalar_one_or_none() is None]
+
+
+def is_overlap_violation(error):
+  return 'overlap_excl' in str(getattr(error, 'orig', error))
+
+#----------------------------------------------------------------------------#
+# Show storage.
+#----------------------------------------------------------------------------#
+
+# Upcoming shows are read on every detail page; past ones pile up and are mostly left
+# alone. On PostgreSQL the migrations range-partition shows by month, so queries
+# bounded on start_time only open the partitions they need, and `flask shows roll`
+# creates the months ahead. Elsewhere the same command moves shows that are long over
+# to shows_archive. Reads that span all of show history go through union_shows; the
+# upcoming-shows queries read shows alone.
+
+SHOW_PARTITION_MONTHS_AHEAD = 3
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_BATCH_SIZE = 1000
+PAST_SHOWS_PER_PAGE = 12
+
+
+def oldest_first(shows):
+  return shows.start_time, shows.id
+
+
+def newest_first(shows):
+  return shows.start_time.desc(), shows.id.desc()
+
+
+def union_shows(build, order_by=None, limit=None):
+  # build(shows) is a SELECT against one show table; returns a subquery over all of
+  # them. With a limit each table contributes only its first limit rows in order_by
+  # order, which is all an outer query with the same order and limit can use.
+  parts = []
+  for shows in SHOW_TABLES:
+    part = build(shows)
+    if limit is not None:
+      part = db.select(part.order_by(*order_by(shows)).limit(limit).subquery())
+    parts.append(part)
+  return db.union_all(*parts).subquery()
+
+
+def upcoming_shows_statement(build, now):
+  return build(Show).where(Show.start_time >= now).order_by(*oldest_first(Show))
+
+
+def past_shows_statement(build, now, before=None, limit=PAST_SHOWS_PER_PAGE):
+  # One page of past shows, newest first, plus one row to tell whether there is
+  # another; before is the (start_time, id) of the last show on the previous page.
+  def build_past(shows):
+    statement = build(shows).where(shows.start_time < now)
+    if before is not None:
+      statement = statement.where(db.tuple_(shows.start_time, shows.id) < db.tuple_(*before))
+    return statement
+  merged = union_shows(build_past, newest_first, limit + 1)
+  return db.select(merged).order_by(*newest_first(merged.c)).limit(limit + 1)
+
+
+def past_shows_count_statement(build, now):
+  # Every past show the pages list, across the show tables.
+  merged = union_shows(lambda shows: build(shows).where(shows.start_time < now))
+  return db.select(db.func.count()).select_from(merged)
+
+
+def past_show_page(rows, build, limit=PAST_SHOWS_PER_PAGE):
+  # (shows, cursor of the next page or None) from past_shows_statement rows.
+  cursor = encode_show_cursor(rows[limit - 1].start_time, rows[limit - 1].id) if len(rows) > limit else None
+  return [build(row) for row in rows[:limit]], cursor
+
+
+def shows_partitioned():
+  if db.engine.dialect.name != 'postgresql':
+    return False
+  return bool(db.session.execute(db.text(
+    "SELECT relkind = 'p' FROM pg_class WHERE oid = 'shows'::regclass")).scalar())
+
+
+def month_start(value, months=0):
+  month = value.year * 12 + value.month - 1 + months
+  return datetime(month // 12, month % 12 + 1, 1)
+
+
+def roll_show_partitions(months_ahead=SHOW_PARTITION_MONTHS_AHEAD, now=None):
+  # Creates the monthly partitions of shows from this month through months_ahead
+  # months on, moving any of their rows out of shows_default, one month per
+  # transaction. Returns the names of the partitions created. Each partition's
+  # exclusion constraints only see that month; see find_show_conflicts.
+  now = now or datetime.now()
+  existing = set(db.session.execute(db.text(
+    "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'shows'::regclass")).scalars())
+  created = []
+  for months in range(months_ahead + 1):
+    start, end = month_start(now, months), month_start(now, months + 1)
+    name = f'shows_{start:%Y_%m}'
+    if name in existing:
+      continue
+    # A partition can't be added while the default partition holds rows in its range.
+    in_range = f"WHERE start_time >= '{start.isoformat()}' AND start_time < '{end.isoformat()}'"
+    for statement in (
+      'ALTER TABLE shows DETACH PARTITION shows_default',
+      f"CREATE TABLE {name} PARTITION OF shows FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')",
+      overlap_exclusion_sql('venue_id', name),
+      overlap_exclusion_sql('artist_id', name),
+      f'INSERT INTO {name} SELECT * FROM shows_default {in_range}',
+      f'DELETE FROM shows_default {in_range}',
+      'ALTER TABLE shows ATTACH PARTITION shows_default DEFAULT',
+    ):
+      db.session.execute(db.text(statement))
+    db.session.commit()
+    created.append(name)
+  return created
+
+
+def archive_past_shows(before, batch_size=ARCHIVE_BATCH_SIZE):
+  # Moves shows that started before `before` and are already counted as past from
+  # shows to shows_archive, batch_size per transaction. Returns the number moved.
+  columns = [column.name for column in Show.__table__.columns]
+  moved = 0
+  while True:
+    rows = db.session.execute(db.select(Show.id, Show.venue_id, Show.artist_id)
+                              .where(Show.start_time < before, Show.counted_upcoming == False)
+                              .order_by(Show.start_time).limit(batch_size).with_for_update()).all()
+    if not rows:
+      break
+    ids = [row.id for row in rows]
+    db.session.execute(ShowArchive.__table__.insert().from_select(
+      columns, db.select(*[Show.__table__.c[name] for name in columns]).where(Show.id.in_(ids))))
+    db.session.execute(Show.__table__.delete().where(Show.id.in_(ids)))
+    queue_table_versions(db.session, Show, ShowArchive)
+    # The pages don't change, but their version queries only look at shows.
+    touch_updated_at(db.session, Venue, {row.venue_id for row in rows if row.venue_id is not None})
+    touch_updated_at(db.session, Artist, {row.artist_id for row in rows if row.artist_id is not None})
+    db.session.commit()
+    moved += len(ids)
+  return moved
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+IMPORT_BATCH_SIZE = 5000
+
+IMPORT_COLUMNS = {
+  'venues': ['name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link', 'website', 'seeking_description'],
+  'artists': ['name', 'city', 'state', 'phone', 'image_link', 'facebook_link', 'website', 'seeking_description'],
+}
+
+
+def copy_rows(connection, table, rows):
+  # COPY ... FROM STDIN through psycopg2, much faster than INSERT for large batches.
+  # Only used for tables whose values never need to tell '' apart from NULL.
+  columns = list(rows[0])
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  for row in rows:
+    writer.writerow([row[column] for column in columns])
+  buffer.seek(0)
+  preparer = connection.dialect.identifier_preparer
+  statement = f'COPY {preparer.format_table(table)} ({", ".join(preparer.quote(c) for c in columns)}) FROM STDIN WITH (FORMAT csv)'
+  connection.connection.cursor().copy_expert(statement, buffer)
+
+
+def bulk_insert(connection, table, rows):
+  if not rows:
+    return
+  if connection.dialect.name == 'postgresql':
+    copy_rows(connection, table, rows)
+  else:
+    connection.execute(table.insert(), rows)
+
+
+def queue_cache_changes(session, model, ids):
+  # Bulk statements bypass the ORM flush hooks, so hand the affected ids to the same
+  # commit hooks that update the search index, detail summaries and detail cache.
+  session.info.setdefault('search_changes', {}).setdefault(model, set()).update(ids)
+  queue_search_generation(session, model)
+  queue_table_versions(session, model)
+  prefix = 'venue' if model is Venue else 'artist'
+  session.info.setdefault('detail_cache_keys', set()).update(f'{prefix}:{entity_id}' for entity_id in ids)
+
+
+def import_entities(model, genre_model, genre_fk_name, kind, rows):
+  connection = db.session.connection()
+  table = model.__table__
+  entity_rows = [{column: row.get(column) or None for column in IMPORT_COLUMNS[kind]} for row in rows]
+  for entity_row in entity_rows:
+    entity_row['name'] = entity_row['name'].strip()
+  ids = connection.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True),
+                           entity_rows).scalars().all()
+  genre_ids = get_genre_ids([genre for row in rows for genre in row['genres']], connection)
+  genre_rows = [{'genre_id': genre_ids[genre], genre_fk_name: entity_id}
+                for entity_id, row in zip(ids, rows) for genre in dict.fromkeys(row['genres'])]
+  bulk_insert(connection, genre_model.__table__, genre_rows)
+  # Core inserts skip the flush hook that keeps the facet counts.
+  deltas = {}
+  for genre_row in genre_rows:
+    add_genre_delta(deltas, GENRE_LINKS[model][2], genre_row['genre_id'], 1)
+  apply_genre_deltas(connection, deltas)
+  queue_cache_changes(db.session, model, ids)
+  queue_name_changes(db.session, model)
+  return []
+
+
+def make_id_resolver(model, rows, id_key, name_key):
+  # Shows refer to a venue/artist either by id or by exact name; both are checked for
+  # the whole batch with one query each, and ambiguous names are rejected.
+  # Soft-deleted rows count as missing. The rows found stay locked until commit, as in
+  # missing_show_parents, in id order so that batches don't deadlock each other.
+  ids = {int(row[id_key]) for row in rows if str(row.get(id_key) or '').strip().isdigit()}
+  names = {row[name_key] for row in rows if not str(row.get(id_key) or '').strip() and row.get(name_key)}
+  visible = model.deleted_at.is_(None)
+  existing = {entity_id for entity_id, in db.session.query(model.id).filter(visible, model.id.in_(ids))
+              .order_by(model.id).with_for_update(key_share=True)} if ids else set()
+  by_name = {}
+  if names:
+    for name, entity_id in db.session.query(model.name, model.id).filter(visible, model.name.in_(names)) \
+        .order_by(model.id).with_for_update(key_share=True):
+      by_name.setdefault(name, []).append(entity_id)
+
+  def resolve(row):
+    value = str(row.get(id_key) or '').strip()
+    if value:
+      if value.isdigit() and int(value) in existing:
+        return int(value), None
+      return None, f'no {model.__tablename__} row with id {value}'
+    matches = by_name.get(row.get(name_key), [])
+    if len(matches) == 1:
+      return matches[0], None
+    return None, f'{len(matches)} {model.__tablename__} rows named {row.get(name_key)!r}'
+  return resolve
+
+
+def batch_bookings(rows):
+  # Existing bookings of a batch's venues and artists over the batch's time span, with
+  # one query, as IntervalSets keyed ('venue' | 'artist', id) like show_intervals.
+  max_length = timedelta(minutes=MAX_SHOW_DURATION)
+  bookings = collections.defaultdict(lambda: intervals.IntervalSet(max_length))
+  if not rows:
+    return bookings
+  venue_ids = {row['venue_id'] for row in rows}
+  artist_ids = {row['artist_id'] for row in rows}
+  existing = db.session.query(Show.start_time, Show.end_time, Show.id, Show.venue_id, Show.artist_id).filter(
+    db.or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)),
+    Show.start_time > min(row['start_time'] for row in rows) - max_length,
+    Show.start_time < max(row['end_time'] for row in rows))
+  for start_time, end_time, show_id, venue_id, artist_id in existing:
+    bookings[('venue', venue_id)].add(start_time, end_time, show_id)
+    bookings[('artist', artist_id)].add(start_time, end_time, show_id)
+  return bookings
+
+
+def import_shows(rows):
+  resolve_venue = make_id_resolver(Venue, rows, 'venue_id', 'venue')
+  resolve_artist = make_id_resolver(Artist, rows, 'artist_id', 'artist')
+  now, updated_at = datetime.now(), datetime.utcnow()
+  resolved, rejected = [], []
+  for row in rows:
+    venue_id, venue_error = resolve_venue(row)
+    artist_id, artist_error = resolve_artist(row)
+    if venue_error or artist_error:
+      rejected.append((row, {key: [error] for key, error in (('venue', venue_error), ('artist', artist_error)) if error}))
+      continue
+    duration_minutes = row.get('duration_minutes') or DEFAULT_SHOW_DURATION
+    resolved.append((row, {'start_time': row['start_time'], 'end_time': show_end_time(row['start_time'], duration_minutes),
+                           'duration_minutes': duration_minutes, 'venue_id': venue_id, 'artist_id': artist_id,
+                           'updated_at': updated_at}))
+
+  # Rows are checked against existing bookings and against the rows accepted before
+  # them in the same batch.
+  bookings = batch_bookings([show_row for _, show_row in resolved])
+  show_rows = []
+  deltas = {Venue: {}, Artist: {}}
+  for row, show_row in resolved:
+    keys = (('venue', show_row['venue_id']), ('artist', show_row['artist_id']))
+    conflicts = {prefix: bookings[(prefix, entity_id)].overlapping(show_row['start_time'], show_row['end_time'])
+                 for prefix, entity_id in keys}
+    if any(conflicts.values()):
+      rejected.append((row, {prefix: [f'overlaps a show booked {"at this venue" if prefix == "venue" else "for this artist"}']
+                             for prefix, show_ids in conflicts.items() if show_ids}))
+      continue
+    for key in keys:
+      bookings[key].add(show_row['start_time'], show_row['end_time'], None)
+    show_row['counted_upcoming'] = upcoming = show_row['start_time'] > now
+    show_rows.append(show_row)
+    add_counter_delta(deltas, show_row['venue_id'], show_row['artist_id'], upcoming, 1)
+
+  connection = db.session.connection()
+  bulk_insert(connection, Show.__table__, show_rows)
+  apply_counter_deltas(connection, deltas)
+  queue_table_versions(db.session, Show)
+  db.session.info.setdefault('show_interval_keys', set()).update(
+    (prefix, entity_id) for model, prefix in ((Venue, 'venue'), (Artist, 'artist')) for entity_id in deltas[model])
+  for model in (Venue, Artist):
+    touch_updated_at(db.session, model, deltas[model].keys())
+    prefix = 'venue' if model is Venue else 'artist'
+    db.session.info.setdefault('detail_cache_keys', set()).update(f'{prefix}:{entity_id}' for entity_id in deltas[model])
+  return rejected
+
+
+IMPORT_WRITERS = {
+  'venues': lambda rows: import_entities(Venue, VenueGenre, 'venue_id', 'venues', rows),
+  'artists': lambda rows: import_entities(Artist, ArtistGenre, 'artist_id', 'artists', rows),
+  'shows': import_shows,
+}
+
+
+def file_fingerprint(path):
+  stat = os.stat(path)
+  return f'{stat.st_size}:{int(stat.st_mtime)}'
+
+#----------------------------------------------------------------------------#
+# Entity writes.
+#----------------------------------------------------------------------------#
+
+def sync_genres(model, entity_id, names):
+  # Brings the entity's genre rows in line with names: one read of its current genre
+  # ids through the primary key, then one DELETE and one INSERT for the difference.
+  # Only the entity's own rows are touched, however large the join table is.
+  genre_model, genre_fk, count_column = GENRE_LINKS[model]
+  connection = db.session.connection()
+  table = genre_model.__table__
+  entity_column = table.c[genre_fk.key]
+  wanted = set(get_genre_ids(names, connection).values())
+  current = set(connection.execute(db.select(table.c.genre_id).where(entity_column == entity_id)).scalars())
+  added, removed = wanted - current, current - wanted
+  if removed:
+    connection.execute(table.delete().where(entity_column == entity_id, table.c.genre_id.in_(removed)))
+  if added:
+    connection.execute(table.insert(), [{genre_fk.key: entity_id, 'genre_id': genre_id} for genre_id in added])
+  # Core statements skip the flush hooks that keep facet counts, versions and caches.
+  deltas = {}
+  for genre_ids, sign in ((added, 1), (removed, -1)):
+    for genre_id in genre_ids:
+      add_genre_delta(deltas, count_column, genre_id, sign)
+  apply_genre_deltas(connection, deltas)
+  return bool(added or removed)
+
+
+def create_entity(model, fields, genres):
+  # Inserts a venue or artist with its genres in the caller's transaction, with a
+  # single ORM flush. The caller commits.
+  entity = model(**fields)
+  db.session.add(entity)
+  db.session.flush()
+  if sync_genres(model, entity.id, genres):
+    queue_cache_changes(db.session, model, [entity.id])
+  return entity
+
+
+def update_entity(entity, fields, genres=None):
+  # Updates an existing venue or artist and, unless genres is None, syncs its genres,
+  # in the caller's transaction. The caller commits.
+  model = type(entity)
+  for key, value in fields.items():
+    setattr(entity, key, value)
+  db.session.flush()
+  if genres is not None and sync_genres(model, entity.id, genres):
+    touch_updated_at(db.session, model, [entity.id])
+    queue_cache_changes(db.session, model, [entity.id])
+  return entity
+
+
+def get_visible_or_404(model, entity_id):
+  entity = db.get_or_404(model, entity_id)
+  if entity.deleted_at is not None:
+    abort(404)
+  return entity
+
+
+def form_fields(*names, default=None):
+  return {name: request.form.get(name, default) for name in names}
+
+
+def form_genres():
+  # None when the form lists no genres: edits then keep the existing ones.
+  return request.form.getlist('genres') or None
+
+#----------------------------------------------------------------------------#
+# Deletion.
+#----------------------------------------------------------------------------#
+
+# A venue's or artist's genre rows and shows go with it through ON DELETE CASCADE,
+# so deleting one never loads its children. What the flush hooks would have done for
+# those rows (counters, facet counts, versions, caches) is worked out beforehand from
+# grouped counts. With SOFT_DELETE on, a delete only sets deleted_at, which hides the
+# entity and its shows everywhere, and `flask purge` removes the rows later in
+# batches of short transactions. Show counters and facet counts cover visible
+# entities and shows only, so both are released when the entity is deleted or hidden,
+# and purging its rows later leaves them alone.
+
+PURGE_BATCH_SIZE = 1000
+
+# Model -> (its key prefix, name of the show foreign key to it, name of the show
+# foreign key to the other side, the other side's model and key prefix).
+SHOW_LINKS = {
+  Venue: ('venue', 'venue_id', 'artist_id', Artist, 'artist'),
+  Artist: ('artist', 'artist_id', 'venue_id', Venue, 'venue'),
+}
+
+
+def hidden_ids(model):
+  return db.select(model.id).where(model.deleted_at.isnot(None))
+
+
+def visible_shows(shows=Show):
+  # For show queries that do not join the venue and artist anyway.
+  return db.and_(shows.venue_id.notin_(hidden_ids(Venue)), shows.artist_id.notin_(hidden_ids(Artist)))
+
+
+def release_shows(model, entity_id, shows=Show, condition=None, counters=True):
+  # The entity's rows in the shows table matching condition are about to be deleted
+  # or hidden outside the ORM. Reads one row per counterpart and counter, however many
+  # shows there are. counters=False leaves the show counters to an earlier release.
+  prefix, show_fk, counterpart_fk, counterpart, counterpart_prefix = SHOW_LINKS[model]
+  show_fk, counterpart_fk = getattr(shows, show_fk), getattr(shows, counterpart_fk)
+  session = db.session
+  rows = session.execute(db.select(counterpart_fk, shows.counted_upcoming, db.func.count())
+                         .where(show_fk == entity_id, condition if condition is not None else db.true())
+                         .group_by(counterpart_fk, shows.counted_upcoming)).all()
+  if counters:
+    deltas = {Venue: {}, Artist: {}}
+    for counterpart_id, upcoming, count in rows:
+      venue_id, artist_id = (entity_id, counterpart_id) if model is Venue else (counterpart_id, entity_id)
+      add_counter_delta(deltas, venue_id, artist_id, upcoming, -count)
+    apply_counter_deltas(session.connection(), deltas)
+  queue_table_versions(session, shows, model)
+
+  counterpart_ids = {counterpart_id for counterpart_id, upcoming, count in rows if counterpart_id is not None}
+  touch_updated_at(session, counterpart, counterpart_ids)
+  session.info.setdefault('detail_cache_keys', set()).update(
+    f'{counterpart_prefix}:{counterpart_id}' for counterpart_id in counterpart_ids)
+  session.info.setdefault('show_interval_keys', set()).update(
+    [(prefix, int(entity_id))] + [(counterpart_prefix, counterpart_id) for counterpart_id in counterpart_ids])
+
+
+def release_genres(model, entity_id):
+  genre_model, genre_fk, count_column = GENRE_LINKS[model]
+  deltas = {}
+  for genre_id in db.session.execute(db.select(genre_model.genre_id).where(genre_fk == entity_id)).scalars():
+    add_genre_delta(deltas, count_column, genre_id, -1)
+  apply_genre_deltas(db.session.connection(), deltas)
+
+
+def remove_entity(model, entity_id):
+  # Deletes the row; the database deletes its genre rows and remaining shows. Its
+  # genres and shows were released from the counts when it was deleted or hidden.
+  for shows in SHOW_TABLES:
+    release_shows(model, entity_id, shows, counters=False)
+  table = model.__table__
+  db.session.execute(table.delete().where(table.c.id == entity_id))
+  queue_cache_changes(db.session, model, [entity_id])
+  queue_name_changes(db.session, model)
+
+
+def delete_entity(model, entity_id):
+  # False when there is no such visible entity. The row stays locked until commit, so
+  # no show can be booked against it between counting its shows and deleting them.
+  entity = db.session.execute(db.select(model).where(model.id == entity_id, model.deleted_at.is_(None))
+                              .with_for_update()).scalar_one_or_none()
+  if entity is None:
+    return False
+  release_genres(model, entity.id)
+  # Shows whose other side is hidden already were released when it was.
+  prefix, show_fk, counterpart_fk, counterpart, counterpart_prefix = SHOW_LINKS[model]
+  for shows in SHOW_TABLES:
+    release_shows(model, entity.id, shows, getattr(shows, counterpart_fk).notin_(hidden_ids(counterpart)))
+  if app.config.get('SOFT_DELETE'):
+    entity.deleted_at = datetime.utcnow()
+  else:
+    remove_entity(model, entity.id)
+  return True
+
+
+def purge_hidden(batch_size=PURGE_BATCH_SIZE):
+  # Removes soft-deleted venues and artists: their shows batch_size at a time, each
+  # batch committed on its own so locks stay short, then the entity row itself.
+  # Returns {model: (entities, shows)} purged.
+  purged = {}
+  for model in (Venue, Artist):
+    entities = show_count = 0
+    for entity_id in db.session.execute(hidden_ids(model)).scalars().all():
+      for shows in SHOW_TABLES:
+        show_fk = getattr(shows, SHOW_LINKS[model][1])
+        while True:
+          show_ids = db.session.execute(db.select(shows.id).where(show_fk == entity_id).limit(batch_size)
+                                        .with_for_update()).scalars().all()
+          if not show_ids:
+            break
+          release_shows(model, entity_id, shows, shows.id.in_(show_ids), counters=False)
+          db.session.execute(shows.__table__.delete().where(shows.id.in_(show_ids)))
+          db.session.commit()
+          show_count += len(show_ids)
+      remove_entity(model, entity_id)
+      db.session.commit()
+      entities += 1
+    purged[model] = (entities, show_count)
+  return purged
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+EXPORT_YIELD_PER = 1000
+EXPORT_ENTITIES = ('venues', 'artists', 'genres', 'shows')
+
+
+def export_statement(entity, since=None):
+  # With since set only rows whose updated_at is at or after it are exported; genre
+  # rows follow their venue's/artist's updated_at, which every genre change bumps.
+  if entity == 'genres':
+    parts = []
+    for kind, model, genre_model, genre_fk in (('venue', Venue, VenueGenre, VenueGenre.venue_id),
+                                               ('artist', Artist, ArtistGenre, ArtistGenre.artist_id)):
+      part = db.select(db.literal(kind).label('kind'), genre_fk.label('entity_id'), Genre.name) \
+        .join(Genre, Genre.id == genre_model.genre_id)
+      if since is not None:
+        part = part.join(model, model.id == genre_fk).where(model.updated_at >= since)
+      parts.append(part)
+    return db.union_all(*parts)
+
+  def build(model):
+    statement = db.select(*[column for column in model.__table__.columns if column.name != 'counted_upcoming'])
+    if since is not None:
+      statement = statement.where(model.updated_at >= since)
+    return statement
+
+  if entity == 'shows':
+    merged = union_shows(build)
+    return db.select(merged).order_by(merged.c.id)
+  model = {'venues': Venue, 'artists': Artist}[entity]
+  return build(model).order_by(model.id)
+
+
+def stream_export(entity, fmt, since=None):
+  # yield_per makes the driver use a server-side cursor where it has one (psycopg2
+  # named cursors), so only one batch of rows is held in memory at a time.
+  result = db.session.execute(export_statement(entity, since), execution_options={'yield_per': EXPORT_YIELD_PER})
+  try:
+    write_chunks, mimetype = export.FORMATS[fmt]
+    yield from write_chunks(list(result.keys()), result)
+  finally:
+    result.close()
+
+#----------------------------------------------------------------------------#
+# Query instrumentation.
+#----------------------------------------------------------------------------#
+
+recent_query_stats = collections.deque(maxlen=app.config['SQL_RECENT_REQUESTS'])
+
+
+def current_query_stats():
+  return g.get('query_stats') if has_request_context() else None
+
+
+query_stats.instrument(Engine, current_query_stats)
+
+
+@app.before_request
+def start_query_stats():
+  if app.config['SQL_INSTRUMENTATION'] and request.endpoint != 'debug_queries':
+    g.query_stats = query_stats.QueryStats()
+
+
+def log_query_stats(stats, method, path, full_path, status):
+  summary = stats.summary(app.config['SQL_SLOWEST_STATEMENTS'], app.config['SQL_N_PLUS_ONE_THRESHOLD'])
+  for repeated in summary["n_plus_one"]:
+    app.logger.warning('probable N+1 on %s %s: %sx %s', method, path, repeated["times"], repeated["statement"])
+  summary.update(method=method, path=full_path, status=status)
+  recent_query_stats.append(summary)
+
+
+@app.after_request
+def report_query_stats(response):
+  stats = g.get('query_stats')
+  if stats is None:
+    return response
+  request_line = (request.method, request.path, request.full_path.rstrip('?'), response.status_code)
+  if response.is_streamed:
+    # Most of a streamed page's queries run after its headers are sent, so it gets no
+    # Server-Timing header and is logged when the server closes it.
+    response.call_on_close(lambda: log_query_stats(stats, *request_line))
+  else:
+    response.headers.add('Server-Timing', stats.server_timing())
+    log_query_stats(stats, *request_line)
+  return response
+
+
+@app.route('/debug/queries')
+def debug_queries():
+  if not app.config['SQL_DEBUG_ENDPOINT']:
+    abort(404)
+  return jsonify(requests=list(reversed(recent_query_stats)))
+
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+@app.before_request
+def start_request_metrics():
+  g.request_started = time.perf_counter()
+  metrics.IN_FLIGHT.inc()
+
+
+def observe_request(endpoint, method, status, started, stats):
+  metrics.REQUESTS.labels(endpoint, method, status).inc()
+  metrics.REQUEST_LATENCY.labels(endpoint, method).observe(time.perf_counter() - started)
+  if stats is not None:
+    metrics.REQUEST_DB_TIME.labels(endpoint).observe(stats.db_time)
+    metrics.REQUEST_QUERIES.labels(endpoint).observe(stats.count)
+
+
+@app.after_request
+def record_request_metrics(response):
+  observation = (request.endpoint or 'unmatched', request.method, response.status_code,
+                 g.request_started, g.get('query_stats'))
+  if not response.is_streamed:
+    observe_request(*observation)
+    return response
+
+  # A streamed page is still being produced after teardown; it stays in flight and
+  # is observed when the server closes it.
+  g.pop('request_started')
+
+  def finish():
+    observe_request(*observation)
+    metrics.IN_FLIGHT.dec()
+  response.call_on_close(finish)
+  return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+  if g.pop('request_started', None) is not None:
+    metrics.IN_FLIGHT.dec()
+
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+  g.render_started = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def record_render_time(sender, template, context, **extra):
+  started = g.pop('render_started', None)
+  if started is not None:
+    metrics.TEMPLATE_RENDER_TIME.labels(template.name).observe(time.perf_counter() - started)
+
+
+with app.app_context():
+  db_pool = db.engine.pool
+
+
+@event.listens_for(db_pool, 'checkout')
+def count_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+  metrics.POOL_CHECKED_OUT.inc()
+  metrics.sample_pool(db_pool)
+
+
+@event.listens_for(db_pool, 'checkin')
+def count_pool_checkin(dbapi_connection, connection_record):
+  metrics.POOL_CHECKED_OUT.dec()
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+  body, content_type = metrics.exposition()
+  return Response(body, content_type=content_type)
+
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -137,81 +2119,168 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
+def venue_areas_statement(per_area=None, page=1, genres=()):
+  # One query ordered by area, reading upcoming show counts from the venue rows. With
+  # per_area set, a window function ranks venues within each city/state so every area
+  # is paginated independently inside the same statement.
+  venue_rows = db.select(Venue.id, Venue.name, Venue.city, Venue.state,
+                         Venue.upcoming_show_count.label('num_upcoming_shows')).where(Venue.deleted_at.is_(None))
+  if genres:
+    venue_rows = venue_rows.where(genre_filter(Venue, genres))
+
+  if per_area:
+    area = (Venue.city, Venue.state)
+    ranked = venue_rows.add_columns(
+      db.func.row_number().over(partition_by=area, order_by=Venue.id).label('area_rank'),
+      db.func.count().over(partition_by=area).label('area_size')
+    ).subquery()
+    offset = (page - 1) * per_area
+    return db.select(ranked) \
+      .where(ranked.c.area_rank > offset, ranked.c.area_rank <= offset + per_area) \
+      .order_by(ranked.c.city, ranked.c.state, ranked.c.id)
+  return venue_rows.order_by(Venue.city, Venue.state, Venue.id)
+
+
+def venue_area_listing(rows, per_area=None, page=1):
+  # Areas come out one at a time and each area's venues are read off the rows as the
+  # template renders them.
+  def produce(listing):
+    for (city, state), first, area_rows in streaming.grouped(rows, lambda row: (row.city, row.state)):
+      area_size = first.area_size if per_area else None
+      has_more = per_area is not None and area_size > page * per_area
+      listing.has_more = listing.has_more or has_more
+      yield { "city": city, "state": state, "num_venues": area_size, "has_more": has_more,
+              "venues": ({ "id": row.id, "name": row.name, "num_upcoming_shows": row.num_upcoming_shows }
+                         for row in area_rows) }
+  return streaming.Listing(produce)
+
+
+def venue_area_args():
+  per_area = request.args.get('per_area', type=int)
+  if per_area is not None and per_area < 1:
+    per_area = None
+  return per_area, max(request.args.get('page', 1, type=int), 1)
+
+
 @app.route('/venues')
+@conditional(venues_version)
 def venues():
-  all_venues = Venue.query.order_by("city").all()
-  data = []
-  for venue in all_venues:
-    num_upcoming_shows = Show.query.filter(Show.venue_id==venue.id, Show.start_time > datetime.now()).count()
-    if len(data) == 0 or data[-1]["city"] != venue.city:
-      data.append({ "city": venue.city, "state": venue.state, "venues": [] })
-    data[-1]["venues"].append({ "id": venue.id, "name": venue.name,
-                             "num_upcoming_shows": num_upcoming_shows})
-  return render_template('pages/venues.html', areas=data)
+  per_area, page = venue_area_args()
+  genres = genre_args()
+  facets = get_genre_facets(Venue)
+  rows = db.session.execute(venue_areas_statement(per_area=per_area, page=page, genres=genres),
+                            execution_options={'yield_per': LISTING_YIELD_PER})
+  return stream_template('pages/venues.html', areas=venue_area_listing(rows, per_area=per_area, page=page),
+                         per_area=per_area, page=page, genres=genres, facets=facets)
 
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
-  venue_matches = Venue.query.filter(Venue.name.ilike(f'%{request.form.get("search_term", "")}%')).all()
+  search_term = request.form.get('search_term', '')
+  genres = genre_args()
+  response = search_entities(Venue, VenueGenre, VenueGenre.venue_id, search_term, genres=genres)
+  return render_template('pages/search_venues.html', results=response, search_term=search_term, genres=genres)
+
+
+def get_detail_shows(build, build_show):
+  # All upcoming shows, read from shows alone, the first page of past shows and their
+  # count; later pages are loaded on request (venue_past_shows, artist_past_shows).
+  now = datetime.now()
+  upcoming_rows = db.session.execute(upcoming_shows_statement(build, now)).all()
+  past_rows = db.session.execute(past_shows_statement(build, now)).all()
+  past_shows, past_cursor = past_show_page(past_rows, build_show)
+  # Only more than a page of past shows has to be counted.
+  past_count = len(past_shows) if past_cursor is None else \
+    db.session.execute(past_shows_count_statement(build, now)).scalar()
+  return past_shows, [build_show(row) for row in upcoming_rows], past_cursor, past_count
+
+
+def past_show_args():
+  try:
+    return decode_show_cursor(request.args['before']) if request.args.get('before') else None
+  except ValueError:
+    abort(400)
 
-  search_responses = [{"id": v.id, "name": v.name} for v in venue_matches]
-  search_counts = []
-  for s in search_responses:
-    search_counts.append(Show.query.filter(Show.venue_id == s["id"], Show.start_time > datetime.now()).count())
 
-  response = {
-    "count": len(venue_matches),
-    "data": [{"id": vm["id"], "name": vm["name"], "num_upcoming_shows": sc} for (vm, sc) in zip(search_responses, search_counts)]
-  }
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+def render_past_shows(model, entity_id, build, build_show):
+  name = db.session.execute(db.select(model.name).where(model.id == entity_id, model.deleted_at.is_(None))) \
+    .scalar_one_or_none()
+  if name is None:
+    abort(404)
+  rows = db.session.execute(past_shows_statement(build, datetime.now(), before=past_show_args())).all()
+  shows, cursor = past_show_page(rows, build_show)
+  return render_template('pages/past_shows.html', kind=SHOW_LINKS[model][0], counterpart=SHOW_LINKS[model][4],
+                         entity_id=entity_id, name=name, shows=shows, cursor=cursor)
 
 
-def get_venue_show_data(show_record):
-  displayed_artist_image_link = show_record.show_artist.image_link
+def get_venue_show_data(show_row):
+  displayed_artist_image_link = show_row.artist_image_link
   if displayed_artist_image_link is None:
     displayed_artist_image_link = DEFAULT_ARTIST_IMAGE
   return {
-    "artist_id": show_record.artist_id,
-    "artist_name": show_record.show_artist.name,
+    "artist_id": show_row.artist_id,
+    "artist_name": show_row.artist_name,
     "artist_image_link": displayed_artist_image_link,
-    "start_time": str(show_record.start_time)
+    "start_time": show_row.start_time
   }
 
 
+def venue_shows_statement(venue_id, shows=Show):
+  return db.select(shows.id, shows.artist_id, shows.start_time, Artist.name.label('artist_name'),
+                   Artist.image_link.label('artist_image_link')) \
+    .join(Artist, Artist.id == shows.artist_id) \
+    .where(shows.venue_id == venue_id, Artist.deleted_at.is_(None))
+
+
+def build_venue_data(venue, past_shows, upcoming_shows, past_cursor, past_shows_count):
+  data = {}
+  data["id"] = venue.id
+  data["name"] = venue.name
+  data["genres"] = [g.name for g in venue.children]
+  data["address"] = venue.address
+  data["city"] = venue.city
+  data["state"] = venue.state
+  data["phone"] = venue.phone
+  data["website"] = venue.website
+  data["facebook_link"] = venue.facebook_link
+  data["seeking_talent"] = venue.seeking_talent
+
+  data["seeking_description"], = venue.seeking_description,
+  if data["seeking_description"] is None:
+    data["seeking_description"] = ""
+
+  data["image_link"], = venue.image_link,
+  if data["image_link"] is None:
+    data["image_link"] = DEFAULT_VENUE_IMAGE
+
+  data["past_shows"] = past_shows
+  data["upcoming_shows"] = upcoming_shows
+  data["past_shows_count"] = past_shows_count
+  data["upcoming_shows_count"] = len(upcoming_shows)
+  data["past_cursor"] = past_cursor
+  return data
+
+
+def build_venue_summary(venue):
+  # Two queries regardless of how many shows the venue has: its upcoming shows and a
+  # page of past ones, each joined with the artist columns the page displays.
+  return build_venue_data(venue, *get_detail_shows(functools.partial(venue_shows_statement, venue.id),
+                                                   get_venue_show_data))
+
+
+def get_venue_data(venue_id):
+  return get_summary('venue', venue_id)
+
+
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
   error_code = None
   data = {}
 
   try:
-    venue = Venue.query.get(venue_id)
-    genres = VenueGenre.query.filter(VenueGenre.venue_id==venue.id).all()
-    past_shows = db.session.query(Show).join(Venue, Venue.id==Show.venue_id).filter(Venue.id==venue_id, Show.start_time < datetime.now()).all()
-    upcoming_shows = db.session.query(Show).join(Venue, Venue.id==Show.venue_id).filter(Venue.id==venue_id, Show.start_time >= datetime.now()).all()
-
-    data["id"] = venue_id
-    data["name"] = venue.name
-    data["genres"] = [g.name for g in genres]
-    data["address"] = venue.address
-    data["city"] = venue.city
-    data["state"] = venue.state
-    data["phone"] = venue.phone
-    data["website"] = venue.website
-    data["facebook_link"] = venue.facebook_link
-    data["seeking_talent"] = venue.seeking_talent
-
-    data["seeking_description"], = venue.seeking_description,
-    if data["seeking_description"] is None:
-      data["seeking_description"] = ""
-
-    data["image_link"], = venue.image_link,
-    if data["image_link"] is None:
-      data["image_link"] = DEFAULT_VENUE_IMAGE
-
-    data["past_shows"] = [get_venue_show_data(show_record) for show_record in past_shows]
-    data["upcoming_shows"] = [get_venue_show_data(show_record) for show_record in upcoming_shows]
-    data["past_shows_count"] = len(past_shows)
-    data["upcoming_shows_count"] = len(upcoming_shows)
+    data = get_cached_detail(f'venue:{venue_id}', lambda: get_venue_data(venue_id))
+    if data is None:
+      error_code = 404
   except AttributeError:
     db.session.rollback()
     error_code = 404
@@ -227,8 +2296,14 @@ def show_venue(venue_id):
 
   if error_code:
     abort(error_code)
-  else:
-    return render_template('pages/show_venue.html', venue=data)
+  return versioned_response(data_version(f'venue:{venue_id}', data),
+                            lambda: render_template('pages/show_venue.html', venue=data))
+
+
+@app.route('/venues/<int:venue_id>/past-shows')
+@conditional(venue_version)
+def venue_past_shows(venue_id):
+  return render_past_shows(Venue, venue_id, functools.partial(venue_shows_statement, venue_id), get_venue_show_data)
 
 
 #  Create Venue
@@ -245,21 +2320,8 @@ def create_venue_submission():
   error_code = None
 
   try:
-    venue = Venue(
-      name=request.form.get('name'),
-      city = request.form.get('city'),
-      state = request.form.get('state'),
-      address = request.form.get('address'),
-      phone = request.form.get('phone'),
-      facebook_link = request.form.get('facebook_link')
-    )
-
-    genre_list = request.form.getlist('genres')
-    db.session.add(venue)
-    db.session.commit()
-
-    for genre in genre_list:
-      db.session.add(VenueGenre(venue_id=venue.id, name=genre))
+    create_entity(Venue, form_fields('name', 'city', 'state', 'address', 'phone', 'facebook_link'),
+                request.form.getlist('genres'))
     db.session.commit()
     # on successful db insert, flash success
     flash('Venue ' + request.form['name'] + ' was successfully listed!')
@@ -281,10 +2343,11 @@ def delete_venue(venue_id):
   error_code = None
 
   try:
-    venue_match = Venue.query.filter(Venue.id==venue_id).first()
-    db.session.delete(venue_match)
-    db.session.commit()
-    flash('The venue with id ' + venue_id + ' was successfully deleted.')
+    if delete_entity(Venue, venue_id):
+      db.session.commit()
+      flash('The venue with id ' + venue_id + ' was successfully deleted.')
+    else:
+      error_code = 404
   except AttributeError:
     db.session.rollback()
     error_code = 404
@@ -305,78 +2368,104 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
+def artists_statement(genres=()):
+  statement = db.select(Artist.id, Artist.name).where(Artist.deleted_at.is_(None)) \
+    .order_by(db.func.lower(Artist.name), Artist.id)
+  if genres:
+    statement = statement.where(genre_filter(Artist, genres))
+  return statement
+
+
+def artist_listing(rows):
+  return streaming.Listing(lambda listing: ({ "id": row.id, "name": row.name } for row in rows))
+
+
 @app.route('/artists')
+@conditional(artists_version)
 def artists():
-  all_artists = Artist.query.order_by(Artist.name).all()
-  data = []
-  for artist in all_artists:
-    data.append({ "id": artist.id, "name": artist.name })
-  return render_template('pages/artists.html', artists=data)
+  genres = genre_args()
+  facets = get_genre_facets(Artist)
+  rows = db.session.execute(artists_statement(genres=genres), execution_options={'yield_per': LISTING_YIELD_PER})
+  return stream_template('pages/artists.html', artists=artist_listing(rows), genres=genres, facets=facets)
 
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
-  artist_matches = Artist.query.filter(Artist.name.ilike(f'%{request.form.get("search_term", "")}%')).all()
-  search_responses = [{"id": a.id, "name": a.name} for a in artist_matches]
-  search_counts = []
-  for s in search_responses:
-    search_counts.append(Show.query.filter(Show.artist_id == s["id"], Show.start_time > datetime.now()).count())
-  response = {
-    "count": len(artist_matches),
-    "data": [{"id": am["id"], "name": am["name"], "num_upcoming_shows": sc} for (am, sc) in zip(search_responses, search_counts)]
-  }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  search_term = request.form.get('search_term', '')
+  genres = genre_args()
+  response = search_entities(Artist, ArtistGenre, ArtistGenre.artist_id, search_term, genres=genres)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term, genres=genres)
 
 
-def get_artist_show_data(show_record):
-  displayed_venue_image_link = show_record.show_artist.image_link
+def get_artist_show_data(show_row):
+  displayed_venue_image_link = show_row.venue_image_link
   if displayed_venue_image_link is None:
     displayed_venue_image_link = DEFAULT_VENUE_IMAGE
   return {
-    "venue_id": show_record.venue_id,
-    "venue_name": show_record.show_venue.name,
+    "venue_id": show_row.venue_id,
+    "venue_name": show_row.venue_name,
     "venue_image_link": displayed_venue_image_link,
-    "start_time": str(show_record.start_time),
+    "start_time": show_row.start_time,
   }
 
 
+def artist_shows_statement(artist_id, shows=Show):
+  return db.select(shows.id, shows.venue_id, shows.start_time, Venue.name.label('venue_name'),
+                   Venue.image_link.label('venue_image_link')) \
+    .join(Venue, Venue.id == shows.venue_id) \
+    .where(shows.artist_id == artist_id, Venue.deleted_at.is_(None))
+
+
+def build_artist_data(artist, past_shows, upcoming_shows, past_cursor, past_shows_count):
+  data = {}
+  data["id"] = artist.id
+  data["name"] = artist.name
+  data["genres"] = [g.name for g in artist.children]
+  data["city"] = artist.city
+  data["state"] = artist.state
+  data["phone"] = artist.phone
+  data["website"] = artist.website
+  data["facebook_link"] = artist.facebook_link
+  data["seeking_venue"] = artist.seeking_venue
+
+  data["seeking_description"], = artist.seeking_description,
+  if data["seeking_description"] is None:
+    data["seeking_description"] = ""
+
+  data["image_link"], = artist.image_link,
+  if data["image_link"] is None:
+    data["image_link"] = DEFAULT_ARTIST_IMAGE
+
+  data["past_shows"] = past_shows
+  data["upcoming_shows"] = upcoming_shows
+  data["past_shows_count"] = past_shows_count
+  data["upcoming_shows_count"] = len(upcoming_shows)
+  data["past_cursor"] = past_cursor
+  return data
+
+
+def build_artist_summary(artist):
+  return build_artist_data(artist, *get_detail_shows(functools.partial(artist_shows_statement, artist.id),
+                                                     get_artist_show_data))
+
+
+def get_artist_data(artist_id):
+  return get_summary('artist', artist_id)
+
+
+# Key prefix -> page data builder for Detail summaries.
+SUMMARY_BUILDERS = {'venue': build_venue_summary, 'artist': build_artist_summary}
+
+
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
   error_code = None
   data = {}
 
   try:
-    artist = Artist.query.get(artist_id)
-
-    if artist is None:
+    data = get_cached_detail(f'artist:{artist_id}', lambda: get_artist_data(artist_id))
+    if data is None:
       error_code = 404
-    else:
-      genres = ArtistGenre.query.filter(ArtistGenre.artist_id==artist.id).all()
-      past_shows = db.session.query(Show).join(Artist, Artist.id==Show.artist_id).filter(Artist.id==artist_id, Show.start_time < datetime.now()).all()
-      upcoming_shows = db.session.query(Show).join(Artist, Artist.id==Show.artist_id).filter(Artist.id==artist_id, Show.start_time >= datetime.now()).all()
-
-      data["id"] = artist_id
-      data["name"] = artist.name
-      data["genres"] = [g.name for g in genres]
-      data["city"] = artist.city
-      data["state"] = artist.state
-      data["phone"] = artist.phone
-      data["website"] = artist.website
-      data["facebook_link"] = artist.facebook_link
-      data["seeking_venue"] = artist.seeking_venue
-
-      data["seeking_description"], = artist.seeking_description,
-      if data["seeking_description"] is None:
-        data["seeking_description"] = ""
-
-      data["image_link"], = artist.image_link,
-      if data["image_link"] is None:
-        data["image_link"] = DEFAULT_ARTIST_IMAGE
-
-      data["past_shows"] = [get_artist_show_data(show_record) for show_record in past_shows]
-      data["upcoming_shows"] = [get_artist_show_data(show_record) for show_record in upcoming_shows]
-      data["past_shows_count"] = len(past_shows)
-      data["upcoming_shows_count"] = len(upcoming_shows)
   except AttributeError:
     db.session.rollback()
     error_code = 404
@@ -392,8 +2481,15 @@ def show_artist(artist_id):
 
   if error_code:
     abort(error_code)
-  else:
-    return render_template('pages/show_artist.html', artist=data)
+  return versioned_response(data_version(f'artist:{artist_id}', data),
+                            lambda: render_template('pages/show_artist.html', artist=data))
+
+
+@app.route('/artists/<int:artist_id>/past-shows')
+@conditional(artist_version)
+def artist_past_shows(artist_id):
+  return render_past_shows(Artist, artist_id, functools.partial(artist_shows_statement, artist_id),
+                           get_artist_show_data)
 
 
 #  Update
@@ -404,7 +2500,7 @@ def edit_artist(artist_id):
   error_code = None
   try:
     artist = Artist.query.get(artist_id)
-    if artist is None:
+    if artist is None or artist.deleted_at is not None:
       error_code = 404
     else:
       matching_genres = ArtistGenre.query.filter(ArtistGenre.artist_id==artist_id).all()
@@ -434,23 +2530,17 @@ def edit_artist(artist_id):
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-  artist = Artist.query.get(artist_id)
-  artist.name = request.form.get("name")
-  artist.city = request.form.get("city")
-  artist.state = request.form.get("state")
-  artist.phone = request.form.get("phone")
-  artist.facebook_link = request.form.get("facebook_link")
-
-  updated_genres = request.form.getlist('genres')
-  if updated_genres is not None and len(updated_genres) > 0:
-    matching_genre_pairs = ArtistGenre.query.filter(artist_id==artist_id).all()
-    for genre_pair in matching_genre_pairs:
-      db.session.delete(genre_pair)
-
-    for genre in updated_genres:
-      db.session.add(ArtistGenre(artist_id=artist_id, name=genre))
-
-  db.session.commit()
+  artist = get_visible_or_404(Artist, artist_id)
+  try:
+    update_entity(artist, form_fields('name', 'city', 'state', 'phone', 'facebook_link'), form_genres())
+    db.session.commit()
+    flash('Artist ' + request.form.get('name', '') + ' was successfully updated!')
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash('An error occurred. Artist ' + request.form.get('name', '') + ' could not be updated.')
+  finally:
+    db.session.close()
   return redirect(url_for('show_artist', artist_id=artist_id))
 
 
@@ -460,7 +2550,7 @@ def edit_venue(venue_id):
   error_code = None
   try:
     venue = Venue.query.get(venue_id)
-    if venue is None:
+    if venue is None or venue.deleted_at is not None:
       error_code = 404
     else:
       matching_genres = VenueGenre.query.filter(VenueGenre.venue_id==venue_id).all()
@@ -490,24 +2580,17 @@ def edit_venue(venue_id):
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-  venue = Venue.query.get(venue_id)
-  venue.name = request.form.get("name")
-  venue.city = request.form.get("city")
-  venue.state = request.form.get("state")
-  venue.phone = request.form.get("phone")
-  venue.facebook_link = request.form.get("facebook_link")
-  venue.address = request.form.get("address")
-
-  updated_genres = request.form.getlist('genres')
-  if updated_genres is not None and len(updated_genres) > 0:
-    matching_genre_pairs = VenueGenre.query.filter(VenueGenre.venue_id==venue_id).all()
-    for genre_pair in matching_genre_pairs:
-      db.session.delete(genre_pair)
-
-    for genre in updated_genres:
-      db.session.add(VenueGenre(venue_id=venue_id, name=genre))
-
-  db.session.commit()
+  venue = get_visible_or_404(Venue, venue_id)
+  try:
+    update_entity(venue, form_fields('name', 'city', 'state', 'phone', 'facebook_link', 'address'), form_genres())
+    db.session.commit()
+    flash('Venue ' + request.form.get('name', '') + ' was successfully updated!')
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash('An error occurred. Venue ' + request.form.get('name', '') + ' could not be updated.')
+  finally:
+    db.session.close()
   return redirect(url_for('show_venue', venue_id=venue_id))
 
 #  Create Artist
@@ -524,20 +2607,8 @@ def create_artist_submission():
   error_code = None
 
   try:
-    artist = Artist(
-      name=request.form.get('name',''),
-      city = request.form.get('city',''),
-      state = request.form.get('state',''),
-      phone = request.form.get('phone',''),
-      facebook_link = request.form.get('facebook_link','')
-    )
-
-    genre_list = request.form.getlist('genres')
-    db.session.add(artist)
-    db.session.commit()
-
-    for genre in genre_list:
-      db.session.add(ArtistGenre(artist_id=artist.id, name=genre))
+    create_entity(Artist, form_fields('name', 'city', 'state', 'phone', 'facebook_link', default=''),
+                request.form.getlist('genres'))
     db.session.commit()
     # on successful db insert, flash success
     flash('Artist ' + request.form['name'] + ' was successfully listed!')
@@ -554,23 +2625,101 @@ def create_artist_submission():
   return redirect(url_for('index'))
 
 
+@app.route('/artists/<artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  error_code = None
+
+  try:
+    if delete_entity(Artist, artist_id):
+      db.session.commit()
+      flash('The artist with id ' + artist_id + ' was successfully deleted.')
+    else:
+      error_code = 404
+  except:
+    db.session.rollback()
+    error_code = 500
+    print(sys.exc_info())
+    flash('An error occurred. The artist could not be deleted.')
+  finally:
+    db.session.close()
+
+  if error_code:
+    abort(error_code)
+  return jsonify({ 'success': True })
+
+
 #  Shows
 #  ----------------------------------------------------------------
 
+def encode_show_cursor(start_time, show_id):
+  return f'{start_time.isoformat()}_{show_id}'
+
+
+def decode_show_cursor(cursor):
+  start_time, show_id = cursor.rsplit('_', 1)
+  return datetime.fromisoformat(start_time), int(show_id)
+
+
+def show_page_statement(after=None, start=None, end=None, limit=SHOWS_PER_PAGE):
+  # Pages are cut with a keyset on (start_time, id) so the database never has to skip
+  # over earlier rows. Each show table is walked in (start_time, id) index order; venue
+  # and artist names are joined to the page's rows only, so a planner can't choose to
+  # drive the walk from venues instead.
+  def build(shows):
+    statement = db.select(shows.id, shows.start_time, shows.venue_id, shows.artist_id).where(visible_shows(shows))
+    if start is not None:
+      statement = statement.where(shows.start_time >= start)
+    if end is not None:
+      statement = statement.where(shows.start_time < end)
+    if after is not None:
+      statement = statement.where(db.tuple_(shows.start_time, shows.id) > db.tuple_(*after))
+    return statement
+  merged = union_shows(build, oldest_first, limit + 1)
+  return db.select(merged.c.id, merged.c.start_time, merged.c.venue_id, Venue.name.label('venue_name'),
+                   merged.c.artist_id, Artist.name.label('artist_name'),
+                   Artist.image_link.label('artist_image_link')) \
+    .join(Venue, Venue.id == merged.c.venue_id) \
+    .join(Artist, Artist.id == merged.c.artist_id) \
+    .order_by(*oldest_first(merged.c)).limit(limit + 1)
+
+
+def show_listing(rows, limit=SHOWS_PER_PAGE):
+  def produce(listing):
+    for row in streaming.take(rows, limit, listing, lambda row: encode_show_cursor(row.start_time, row.id)):
+      yield {
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link if row.artist_image_link else DEFAULT_SHOW_IMAGE,
+        "start_time": row.start_time
+      }
+  return streaming.Listing(produce)
+
+
+def show_page_args():
+  try:
+    after = decode_show_cursor(request.args['after']) if request.args.get('after') else None
+    start = dateutil.parser.parse(request.args['from']) if request.args.get('from') else None
+    end = dateutil.parser.parse(request.args['to']) if request.args.get('to') else None
+  except (ValueError, OverflowError):
+    abort(400)
+  limit = min(max(request.args.get('limit', SHOWS_PER_PAGE, type=int), 1), MAX_SHOWS_PER_PAGE)
+  return after, start, end, limit
+
+
+def render_show_page(listing, limit, render=render_template):
+  return render('pages/shows.html', shows=listing, date_from=request.args.get('from'),
+                date_to=request.args.get('to'), limit=limit)
+
+
 @app.route('/shows')
+@conditional(shows_version)
 def shows():
-  all_shows = Show.query.all()
-  data = []
-  for show in all_shows:
-    data.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.show_venue.name,
-      "artist_id": show.artist_id,
-      "artist_name": show.show_artist.name,
-      "artist_image_link": show.show_artist.image_link if show.show_artist.image_link else DEFAULT_SHOW_IMAGE,
-      "start_time": str(show.start_time)
-    })
-  return render_template('pages/shows.html', shows=data)
+  after, start, end, limit = show_page_args()
+  rows = db.session.execute(show_page_statement(after=after, start=start, end=end, limit=limit),
+                            execution_options={'yield_per': LISTING_YIELD_PER})
+  return render_show_page(show_listing(rows, limit=limit), limit, render=stream_template)
 
 
 @app.route('/shows/create')
@@ -580,21 +2729,54 @@ def create_shows():
   return render_template('forms/new_show.html', form=form)
 
 
+@app.route('/autocomplete/venues')
+def autocomplete_venues():
+  return autocomplete_response(Venue)
+
+
+@app.route('/autocomplete/artists')
+def autocomplete_artists():
+  return autocomplete_response(Artist)
+
+
 @app.route('/shows/create', methods=['POST'])
 def create_show_submission():
   error_code = None
+  rejected = False
 
   try:
-    venue_id = request.form.get('venue_id')
-    artist_id = request.form.get('artist_id')
+    venue_id = int(request.form.get('venue_id'))
+    artist_id = int(request.form.get('artist_id'))
+    start_time = dateutil.parser.parse(request.form.get('start_time'))
+    duration_minutes = int(request.form.get('duration_minutes') or DEFAULT_SHOW_DURATION)
+    if not 0 < duration_minutes <= MAX_SHOW_DURATION:
+      flash(f'Show length must be between 1 and {MAX_SHOW_DURATION} minutes.')
+      return redirect(url_for('create_shows'))
+    missing = missing_show_parents(venue_id, artist_id)
+    if missing:
+      flash(f'Show could not be listed: there is no {" or ".join(missing)} with that ID.')
+      return redirect(url_for('create_shows'))
+    check_show_conflicts(venue_id, artist_id, start_time, show_end_time(start_time, duration_minutes))
     show = Show(
       venue_id=venue_id,
       artist_id=artist_id,
-      start_time=request.form.get('start_time')
+      start_time=start_time,
+      duration_minutes=duration_minutes
     )
     db.session.add(show)
-    db.session.commit()
+    try:
+      db.session.commit()
+    except IntegrityError as e:
+      # Another booking got in between the check and the commit.
+      if not is_overlap_violation(e):
+        raise
+      raise ShowConflict([])
     flash('Show was successfully listed!')
+  except ShowConflict as e:
+    db.session.rollback()
+    rejected = True
+    places = sorted({'at this venue' if prefix == 'venue' else 'for this artist' for prefix, _ in e.conflicts})
+    flash(f'Show could not be listed: it overlaps another show {" and ".join(places) or "already booked"}.')
   except AttributeError:
     db.session.rollback()
     error_code = 404
@@ -609,9 +2791,199 @@ def create_show_submission():
     db.session.close()
   if error_code:
     abort(error_code)
+  if rejected:
+    return redirect(url_for('create_shows'))
   return redirect(url_for('index'))
 
 
+#  Export
+#  ----------------------------------------------------------------
+
+@app.route('/export/<entity>.<any(ndjson, csv):fmt>')
+def export_entity(entity, fmt):
+  if entity not in EXPORT_ENTITIES:
+    abort(404)
+  try:
+    since = dateutil.parser.parse(request.args['since']) if request.args.get('since') else None
+  except (ValueError, OverflowError):
+    abort(400)
+  mimetype = export.FORMATS[fmt][1]
+  return Response(stream_with_context(stream_export(entity, fmt, since)), mimetype=mimetype,
+                  headers={'Content-Disposition': f'attachment; filename={entity}.{fmt}'})
+
+
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+API_PAGE_SIZE = 50
+MAX_API_PAGE_SIZE = 500
+
+API_FIELDS = {
+  'venues': ['id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link', 'website',
+             'seeking_talent', 'seeking_description', 'upcoming_show_count', 'past_show_count', 'updated_at'],
+  'artists': ['id', 'name', 'city', 'state', 'phone', 'image_link', 'facebook_link', 'website',
+              'seeking_venue', 'seeking_description', 'upcoming_show_count', 'past_show_count', 'updated_at'],
+  'shows': ['id', 'start_time', 'end_time', 'duration_minutes', 'venue_id', 'artist_id', 'updated_at'],
+}
+
+API_EXPANSIONS = {
+  'venues': ['genres'],
+  'artists': ['genres'],
+  'shows': ['venue', 'artist'],
+}
+
+
+class ApiError(Exception):
+
+  def __init__(self, status, message):
+    super().__init__(message)
+    self.status = status
+    self.message = message
+
+
+@api.errorhandler(ApiError)
+def api_error(error):
+  return api_response({"error": {"status": error.status, "message": error.message}}, error.status)
+
+
+def api_response(payload, status=200):
+  body = json.dumps(payload, separators=(',', ':'), default=export.json_default)
+  return Response(body, status=status, mimetype='application/json')
+
+
+def parse_list_arg(name, allowed):
+  values = [value.strip() for value in request.args.get(name, '').split(',') if value.strip()]
+  unknown = [value for value in values if value not in allowed]
+  if unknown:
+    raise ApiError(400, f'unknown {name}: {", ".join(unknown)}; expected any of {", ".join(allowed)}')
+  return values
+
+
+def parse_page_size():
+  limit = request.args.get('limit', API_PAGE_SIZE, type=int)
+  return min(max(limit, 1), MAX_API_PAGE_SIZE)
+
+
+def project(data, fields):
+  return {field: data[field] for field in fields} if fields else data
+
+
+def expand_genres(items, genre_model, genre_fk):
+  genres = {}
+  ids = [item["id"] for item in items]
+  if ids:
+    rows = db.session.query(genre_fk, Genre.name).join(Genre, Genre.id == genre_model.genre_id) \
+      .filter(genre_fk.in_(ids))
+    for entity_id, name in rows:
+      genres.setdefault(entity_id, []).append(name)
+  for item in items:
+    item["genres"] = genres.get(item["id"], [])
+
+
+def expand_parent(items, model, key, embedded_key):
+  ids = {item[key] for item in items if item.get(key) is not None}
+  parents = {}
+  if ids:
+    for row in db.session.query(model.id, model.name, model.image_link).filter(model.id.in_(ids)):
+      parents[row.id] = {"id": row.id, "name": row.name, "image_link": row.image_link}
+  for item in items:
+    item[embedded_key] = parents.get(item.get(key))
+
+
+def list_entities(resource, model, genre_model, genre_fk):
+  # Keyset pagination on id; only the requested columns are selected.
+  fields = parse_list_arg('fields', API_FIELDS[resource]) or API_FIELDS[resource]
+  expand = parse_list_arg('expand', API_EXPANSIONS[resource])
+  limit = parse_page_size()
+  columns = [getattr(model, field) for field in dict.fromkeys(['id'] + fields)]
+  query = db.session.query(*columns).filter(model.deleted_at.is_(None))
+  after = request.args.get('after')
+  if after:
+    if not after.isdigit():
+      raise ApiError(400, 'after must be an id')
+    query = query.filter(model.id > int(after))
+  genres = genre_args()
+  if genres:
+    query = query.filter(genre_filter(model, genres))
+  rows = query.order_by(model.id).limit(limit + 1).all()
+
+  items = [row._asdict() for row in rows[:limit]]
+  if 'genres' in expand:
+    expand_genres(items, genre_model, genre_fk)
+  next_cursor = str(items[-1]["id"]) if len(rows) > limit else None
+  return api_response({"data": [project(item, fields + expand) for item in items], "next_cursor": next_cursor})
+
+
+def get_entity_detail(key, load):
+  data = get_cached_detail(key, load)
+  if data is None:
+    raise ApiError(404, f'{key.replace(":", " ")} not found')
+  fields = parse_list_arg('fields', list(data))
+  return versioned_response(data_version(key, data), lambda: api_response({"data": project(data, fields)}))
+
+
+@api.route('/venues')
+def api_venues():
+  return list_entities('venues', Venue, VenueGenre, VenueGenre.venue_id)
+
+
+@api.route('/venues/<int:venue_id>')
+def api_venue(venue_id):
+  return get_entity_detail(f'venue:{venue_id}', lambda: get_venue_data(venue_id))
+
+
+@api.route('/artists')
+def api_artists():
+  return list_entities('artists', Artist, ArtistGenre, ArtistGenre.artist_id)
+
+
+@api.route('/artists/<int:artist_id>')
+def api_artist(artist_id):
+  return get_entity_detail(f'artist:{artist_id}', lambda: get_artist_data(artist_id))
+
+
+@api.route('/shows')
+def api_shows():
+  # Same (start_time, id) keyset and from/to filters as the /shows page.
+  fields = parse_list_arg('fields', API_FIELDS['shows']) or API_FIELDS['shows']
+  expand = parse_list_arg('expand', API_EXPANSIONS['shows'])
+  limit = parse_page_size()
+  try:
+    after = decode_show_cursor(request.args['after']) if request.args.get('after') else None
+    start = dateutil.parser.parse(request.args['from']) if request.args.get('from') else None
+    end = dateutil.parser.parse(request.args['to']) if request.args.get('to') else None
+  except (ValueError, OverflowError):
+    raise ApiError(400, 'after, from and to must be a cursor and dates')
+
+  needed = ['id', 'start_time'] + fields + [f'{name}_id' for name in expand]
+
+  def build(shows):
+    statement = db.select(*[getattr(shows, field) for field in dict.fromkeys(needed)]).where(visible_shows(shows))
+    if start is not None:
+      statement = statement.where(shows.start_time >= start)
+    if end is not None:
+      statement = statement.where(shows.start_time < end)
+    if after is not None:
+      statement = statement.where(db.tuple_(shows.start_time, shows.id) > db.tuple_(*after))
+    return statement
+  merged = union_shows(build, oldest_first, limit + 1)
+  rows = db.session.execute(db.select(merged).order_by(*oldest_first(merged.c)).limit(limit + 1)).all()
+
+  items = [row._asdict() for row in rows[:limit]]
+  if 'venue' in expand:
+    expand_parent(items, Venue, 'venue_id', 'venue')
+  if 'artist' in expand:
+    expand_parent(items, Artist, 'artist_id', 'artist')
+  next_cursor = encode_show_cursor(items[-1]["start_time"], items[-1]["id"]) if len(rows) > limit else None
+  return api_response({"data": [project(item, fields + expand) for item in items], "next_cursor": next_cursor})
+
+
+app.register_blueprint(api)
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -632,17 +3004,456 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+counters_cli = AppGroup('counters', help='Maintain the denormalized show and genre counters.')
+
+
+@counters_cli.command('rollover')
+@click.option('--batch-size', default=COUNTER_ROLLOVER_BATCH_SIZE, show_default=True)
+def counters_rollover_command(batch_size):
+  """Move shows that have started from the upcoming to the past counters."""
+  moved = rollover_show_counters(batch_size=batch_size)
+  click.echo(f'Rolled over {moved} shows.')
+
+
+@counters_cli.command('reconcile')
+@click.option('--fix', is_flag=True, help='Rewrite counters that disagree with a recount.')
+def counters_reconcile_command(fix):
+  """Check the show and genre counters against a full recount of their tables."""
+  mismatches = reconcile_show_counters(fix=fix)
+  for model, entity_id, stored, expected in mismatches:
+    click.echo(f'{model.__tablename__} {entity_id}: stored upcoming/past {stored}, actual {expected}')
+  genre_mismatches = reconcile_genre_counts(fix=fix)
+  for name, column_name, stored, expected in genre_mismatches:
+    click.echo(f'genre {name}: stored {column_name} {stored}, actual {expected}')
+  mismatches += genre_mismatches
+  click.echo(f'{len(mismatches)} mismatched counters{" fixed" if fix and mismatches else ""}.')
+  if mismatches and not fix:
+    sys.exit(1)
+
+
+app.cli.add_command(counters_cli)
+
+
+shows_cli = AppGroup('shows', help='Maintain show storage.')
+
+
+@shows_cli.command('roll')
+@click.option('--months-ahead', default=SHOW_PARTITION_MONTHS_AHEAD, show_default=True,
+              help='Monthly partitions to have ready after the current one (PostgreSQL).')
+@click.option('--archive-after-days', default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Archive shows that started this long ago (other databases).')
+@click.option('--batch-size', default=ARCHIVE_BATCH_SIZE, show_default=True, help='Shows archived per transaction.')
+def shows_roll_command(months_ahead, archive_after_days, batch_size):
+  """Create the coming months' show partitions, or archive old shows without them.
+
+  Run it daily, after `flask counters rollover`: only shows already counted as past
+  are archived.
+  """
+  if shows_partitioned():
+    created = roll_show_partitions(months_ahead=months_ahead)
+    click.echo(f'Created {len(created)} show partitions{": " + ", ".join(created) if created else ""}.')
+  else:
+    moved = archive_past_shows(datetime.now() - timedelta(days=archive_after_days), batch_size=batch_size)
+    click.echo(f'Archived {moved} shows.')
+
+
+app.cli.add_command(shows_cli)
+
+
+summaries_cli = AppGroup('summaries', help='Maintain the precomputed venue and artist pages.')
+
+
+@summaries_cli.command('rebuild')
+@click.option('--stale-only', is_flag=True, help='Only summaries that are missing, cleared or expired.')
+@click.option('--batch-size', default=SUMMARY_BATCH_SIZE, show_default=True, help='Summaries per transaction.')
+def summaries_rebuild_command(stale_only, batch_size):
+  """Rebuild the venue and artist page summaries.
+
+  Pages rebuild their own summary when they find it stale, so this is for filling
+  the table after a migration, import or seed, or ahead of traffic.
+  """
+  for kind, count in rebuild_all_summaries(stale_only=stale_only, batch_size=batch_size).items():
+    click.echo(f'Rebuilt {count} {kind} summaries.')
+
+
+app.cli.add_command(summaries_cli)
+
+
+@app.cli.command('purge')
+@click.option('--batch-size', default=PURGE_BATCH_SIZE, show_default=True, help='Shows deleted per transaction.')
+def purge_command(batch_size):
+  """Delete soft-deleted venues and artists along with their shows and genres."""
+  for model, (entities, shows) in purge_hidden(batch_size=batch_size).items():
+    click.echo(f'{model.__tablename__}: purged {entities} with {shows} shows.')
+
+
+assets_cli = AppGroup('assets', help='Build the fingerprinted, precompressed static files.')
+
+
+@assets_cli.command('build')
+def assets_build_command():
+  """Bundle, minify, fingerprint and precompress static files into static/dist."""
+  manifest = assets.build(app.static_folder)
+  click.echo(f"Built {len(manifest['files'])} files, {len(manifest['encodings'])} precompressed.")
+
+
+@assets_cli.command('clean')
+def assets_clean_command():
+  """Remove static/dist so pages load the source files again."""
+  shutil.rmtree(os.path.join(app.static_folder, assets.DIST_DIRECTORY), ignore_errors=True)
+  click.echo('Removed built assets.')
+
+
+app.cli.add_command(assets_cli)
+
+
+@app.cli.command('export')
+@click.argument('entity', type=click.Choice(EXPORT_ENTITIES))
+@click.option('--format', 'fmt', type=click.Choice(sorted(export.FORMATS)), default='ndjson', show_default=True)
+@click.option('--since', type=click.DateTime(), help='Only rows updated at or after this time (UTC).')
+@click.option('--output', type=click.File('w'), default='-', help='Defaults to stdout.')
+def export_command(entity, fmt, since, output):
+  """Stream venues, artists, genres or shows to NDJSON or CSV."""
+  for chunk in stream_export(entity, fmt, since):
+    output.write(chunk)
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORT_WRITERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+@click.option('--restart', is_flag=True, help='Discard any checkpoint and start from the first row.')
+@click.option('--rejects', type=click.File('w'), help='Write rejected rows and their errors to this JSONL file.')
+def import_command(kind, path, file_format, batch_size, restart, rejects):
+  """Bulk-load venues, artists or shows from a CSV or JSONL file.
+
+  Columns are the form field names; CSV genres are separated by ';'. Shows may
+  name their venue/artist with venue_id/artist_id or an exact venue/artist name.
+  An interrupted import resumes after its last committed batch.
+  """
+  source = os.path.abspath(path)
+  fingerprint = file_fingerprint(source)
+  checkpoint = db.session.get(ImportCheckpoint, source)
+  if checkpoint is not None and (restart or checkpoint.fingerprint != fingerprint or checkpoint.kind != kind):
+    if not restart:
+      click.echo(f'{path} changed since its checkpoint at row {checkpoint.rows_committed}; '
+                 'rerun with --restart to import it from the beginning.', err=True)
+      sys.exit(1)
+    db.session.delete(checkpoint)
+    db.session.commit()
+    checkpoint = None
+  skip = checkpoint.rows_committed if checkpoint else 0
+  if skip:
+    click.echo(f'Resuming {path} after row {skip}.', err=True)
+
+  def write_batch(batch, position):
+    try:
+      rejected = IMPORT_WRITERS[kind](batch) if batch else []
+      current = db.session.get(ImportCheckpoint, source) or ImportCheckpoint(source=source, kind=kind, fingerprint=fingerprint)
+      current.rows_committed = position
+      db.session.add(current)
+      db.session.commit()
+    except:
+      db.session.rollback()
+      raise
+    return rejected
+
+  def on_reject(row, errors):
+    if rejects:
+      rejects.write(json.dumps({'row': None if isinstance(row, bulk_import.RowError) else row, 'errors': errors},
+                               default=str) + '\n')
+
+  progress = bulk_import.Progress(kind, lambda message: click.echo(message, err=True))
+  bulk_import.run_import(bulk_import.read_rows(source, file_format), kind, write_batch, batch_size,
+                         skip=skip, on_reject=on_reject, progress=progress)
+  finished = db.session.get(ImportCheckpoint, source)
+  if finished is not None:
+    db.session.delete(finished)
+    db.session.commit()
+
+
+
+def reset_catalog():
+  for model in (Show, ShowArchive, VenueGenre, ArtistGenre, VenueSummary, ArtistSummary, Venue, Artist):
+    db.session.query(model).delete(synchronize_session=False)
+  db.session.execute(Genre.__table__.update().values(venue_count=0, artist_count=0))
+  queue_table_versions(db.session, Show)
+  for model in (Venue, Artist):
+    queue_name_changes(db.session, model)
+    queue_search_generation(db.session, model)
+  db.session.commit()
+  for index in itertools.chain(search_indexes.values(), autocomplete_indexes.values()):
+    index.clear()
+  show_intervals.clear()
+  if detail_cache is not None:
+    detail_cache.clear()
+
+
+@app.cli.command('seed')
+@click.option('--scale', type=float, default=1, show_default=True,
+              help='1 = 1k venues, 1k artists and 10k shows; 1000 = 1M, 1M and 10M.')
+@click.option('--seed', 'seed', default=0, show_default=True, help='Same seed, same dataset.')
+@click.option('--anchor', type=click.DateTime(), help='Show dates are spread around this time; defaults to today.')
+@click.option('--reset', is_flag=True, help='Delete all venues, artists and shows first.')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+def seed_command(scale, seed, anchor, reset, batch_size):
+  """Fill an empty database with a deterministic synthetic dataset.
+
+  Rows are generated valid and written through the bulk import writers, without
+  per-row form validation.
+  """
+  # Tooling modules load with their commands only, not in every web worker.
+  import seed_data
+  if reset:
+    reset_catalog()
+  elif any(db.session.query(model.id).first() for model in (Venue, Artist, Show)):
+    click.echo('The database already has venues, artists or shows; rerun with --reset to replace them.', err=True)
+    sys.exit(1)
+
+  counts = seed_data.scaled_counts(scale)
+  ids = {}
+  for kind, model in (('venues', Venue), ('artists', Artist)):
+    progress = bulk_import.Progress(kind, lambda message: click.echo(message, err=True))
+    for batch in seed_data.batched(seed_data.generate_entities(kind, counts[kind], seed), batch_size):
+      IMPORT_WRITERS[kind](batch)
+      db.session.commit()
+      progress.imported += len(batch)
+      progress.report()
+    progress.report(done=True)
+    ids[kind] = [entity_id for entity_id, in db.session.query(model.id).order_by(model.id)]
+
+  progress = bulk_import.Progress('shows', lambda message: click.echo(message, err=True))
+  shows = seed_data.generate_shows(counts['shows'], ids['venues'], ids['artists'], seed, anchor)
+  for batch in seed_data.batched(shows, batch_size):
+    IMPORT_WRITERS['shows'](batch)
+    db.session.commit()
+    progress.imported += len(batch)
+    progress.report()
+  progress.report(done=True)
+
+
+BENCHMARK_SKIP = {'static', 'built_asset', 'prometheus_metrics', 'debug_queries'}
+
+# POST routes that only read; the other POST/DELETE routes write and are not driven.
+BENCHMARK_POSTS = {'search_venues', 'search_artists'}
+
+
+def sample_ids(model, n):
+  # The busiest rows (largest detail pages) plus the first ones by id.
+  busiest = db.session.query(model.id).order_by(model.upcoming_show_count.desc(), model.id).limit(n - n // 2)
+  first = db.session.query(model.id).order_by(model.id).limit(n // 2)
+  return list(dict.fromkeys(entity_id for entity_id, in itertools.chain(busiest, first)))
+
+
+def benchmark_targets(sample_size):
+  # {name: [(method, url, data), ...]} for every read route in the url map.
+  import seed_data
+  arguments = {
+    'venue_id': sample_ids(Venue, sample_size),
+    'artist_id': sample_ids(Artist, sample_size),
+    'entity': list(EXPORT_ENTITIES),
+    'fmt': ['ndjson'],
+  }
+  query_args = {
+    # A full export is a bulk job, not a request to time; a day of changes is.
+    'export_entity': {'since': (datetime.utcnow() - timedelta(days=1)).isoformat()},
+    'autocomplete_venues': {'q': 'the'},
+    'autocomplete_artists': {'q': 'the'},
+  }
+  terms = [city for city, _ in seed_data.CITIES[:5]] + seed_data.GENRES[:5] + ['the', 'blue ro']
+  targets = {}
+  with app.test_request_context():
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+      if rule.endpoint in BENCHMARK_SKIP:
+        continue
+      method = 'GET' if 'GET' in rule.methods else 'POST' if rule.endpoint in BENCHMARK_POSTS else None
+      if method is None:
+        continue
+      missing = [name for name in rule.arguments if not arguments.get(name)]
+      if missing:
+        click.echo(f'Skipping {rule.rule}: no values for {", ".join(missing)}.', err=True)
+        continue
+      n = max([len(arguments[name]) for name in rule.arguments] + [len(terms) if method == 'POST' else 1])
+      requests = []
+      for i in range(n):
+        values = {name: arguments[name][i % len(arguments[name])] for name in rule.arguments}
+        url = url_for(rule.endpoint, **values, **query_args.get(rule.endpoint, {}))
+        requests.append((method, url, {'search_term': terms[i % len(terms)]} if method == 'POST' else None))
+      targets[f'{method} {rule.rule}'] = requests
+  return targets
+
+
+def current_commit():
+  try:
+    return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+  except OSError:
+    return None
+
+
+@app.cli.command('benchmark')
+@click.option('--requests', 'iterations', default=200, show_default=True, help='Requests per route.')
+@click.option('--warmup', default=5, show_default=True, help='Untimed requests per route first.')
+@click.option('--samples', default=20, show_default=True, help='Distinct venue/artist ids per route.')
+@click.option('--url', help='Benchmark a running server at this URL instead of the test client.')
+@click.option('--concurrency', default=1, show_default=True, help='Parallel requests (with --url only).')
+@click.option('--only', help='Only routes whose name contains this text.')
+@click.option('--output', type=click.File('w'), default='-', help='JSON report; defaults to stdout.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Earlier report to compare p95 latency and query counts against.')
+def benchmark_command(iterations, warmup, samples, url, concurrency, only, output, baseline):
+  """Drive every read route and report latency percentiles, throughput and queries.
+
+  Query counts come from the Server-Timing header, so SQL_INSTRUMENTATION must be
+  on in the app being measured. Streamed listing pages send none; against --url
+  their counts are left out.
+  """
+  import benchmark
+  if url:
+    transport = benchmark.HTTPTransport(url, concurrency)
+  else:
+    transport = benchmark.TestClientTransport(app.test_client(), recent_query_stats)
+  targets = benchmark_targets(samples)
+  db.session.close()
+
+  report = {
+    'commit': current_commit(),
+    'mode': url or 'test-client',
+    'dataset': {name: db.session.query(model).count() for name, model in
+                (('venues', Venue), ('artists', Artist), ('shows', Show))},
+    'requests_per_route': iterations,
+    'targets': {},
+  }
+  db.session.close()
+  for name, requests in targets.items():
+    if only and only not in name:
+      continue
+    report['targets'][name] = benchmark.run_target(transport, requests, iterations, warmup)
+    result = report['targets'][name]
+    click.echo(f'{name}: p50 {result["latency_ms"]["p50"]}ms, p95 {result["latency_ms"]["p95"]}ms, '
+               f'{result["throughput_rps"]} req/s', err=True)
+  output.write(json.dumps(report, indent=2, sort_keys=True) + '\n')
+  if baseline:
+    for line in benchmark.compare(report, benchmark.load_report(baseline)) or ['No changes beyond 10%.']:
+      click.echo(line, err=True)
+
+
+
+@app.cli.command('benchmark-datetime')
+@click.option('--rows', default=500, show_default=True, help='Show tiles per simulated page.')
+@click.option('--pages', default=50, show_default=True, help='Runs; the fastest one is reported.')
+def benchmark_datetime_command(rows, pages):
+  """Per-row cost of the datetime filter: the old string round trip against datetimes."""
+  import benchmark
+  def legacy_format_datetime(value, format='full'):
+    return babel.dates.format_datetime(dateutil.parser.parse(value), DATETIME_FORMATS[format])
+
+  first = datetime.now().replace(minute=0, second=0, microsecond=0)
+  values = [first + timedelta(hours=7 * n) for n in range(rows)]
+  report = {
+    'rows': rows,
+    'us_per_row': {
+      'str_parse_babel': benchmark.per_row_microseconds(
+        lambda: [legacy_format_datetime(str(value)) for value in values], rows, pages),
+      'datetime_cold': benchmark.per_row_microseconds(
+        lambda: [format_datetime(value, 'full') for value in values], rows, pages,
+        before_page=format_datetime_cached.cache_clear),
+      'datetime_warm': benchmark.per_row_microseconds(
+        lambda: [format_datetime(value, 'full') for value in values], rows, pages),
+    },
+  }
+  click.echo(json.dumps(report, indent=2, sort_keys=True))
+
+
+# Routes that read a whole table by design: the full venue and artist listings and
+# the exports, whose ?since= may well match most rows.
+EXPLAIN_FULL_SCANS = {
+  'venues': {'venues'},
+  'artists': {'artists'},
+  'export_entity': {'venues', 'artists', 'shows', 'shows_archive', 'venueGenres', 'artistGenres'},
+}
+
+
+@app.cli.command('explain')
+@click.option('--min-rows', default=10000, show_default=True,
+              help='Sequential scans of tables smaller than this are ignored.')
+@click.option('--samples', default=2, show_default=True, help='Distinct venue/artist ids per route.')
+@click.option('--analyze', is_flag=True, help='Refresh planner statistics first.')
+def explain_command(min_rows, samples, analyze):
+  """EXPLAIN every query the read routes run and fail on sequential scans.
+
+  Run it against a seeded database (flask seed --scale 10 or more), since
+  planners rightly scan small tables.
+  """
+  import query_plans
+  if analyze:
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+  targets = benchmark_targets(samples)
+  db.session.close()
+  # Cached detail pages would hide their queries.
+  if detail_cache is not None:
+    detail_cache.clear()
+
+  captured = []
+
+  def capture(conn, cursor, statement, parameters, context, executemany):
+    if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+      captured.append((statement, parameters))
+
+  client = app.test_client()
+  plans = {}
+  event.listen(db.engine, 'before_cursor_execute', capture)
+  try:
+    for name, requests in targets.items():
+      endpoint = app.url_map.bind('').match(requests[0][1].split('?')[0], method=requests[0][0])[0]
+      for method, url, data in requests:
+        captured.clear()
+        client.open(url, method=method, data=data, buffered=True).close()
+        for statement, parameters in captured:
+          plans.setdefault(statement, (name, endpoint, parameters))
+  finally:
+    event.remove(db.engine, 'before_cursor_execute', capture)
+
+  full_scans = dict(EXPLAIN_FULL_SCANS)
+  # The in-memory autocomplete and search indexes load whole tables, once per process.
+  full_scans.update(autocomplete_venues={'venues'}, autocomplete_artists={'artists'})
+  if not use_trigram_search():
+    full_scans.update(search_venues={'venues', 'venueGenres'}, search_artists={'artists', 'artistGenres'})
+  failures = 0
+  with db.engine.connect() as connection:
+    row_counts = query_plans.table_row_counts(connection, db.metadata.tables)
+    for statement, (name, endpoint, parameters) in plans.items():
+      plan = query_plans.explain_statement(connection, statement, parameters)
+      scanned = [table for table in query_plans.seq_scans(connection, plan, statement)
+                 if row_counts.get(table, 0) >= min_rows and table not in full_scans.get(endpoint, ())]
+      if scanned:
+        failures += 1
+        click.echo(f'{name}: sequential scan of {", ".join(sorted(set(scanned)))}\n  {" ".join(statement.split())}',
+                   err=True)
+  click.echo(f'{len(plans)} statements explained, {failures} with sequential scans on tables of '
+             f'{min_rows}+ rows.', err=True)
+  if failures:
+    sys.exit(1)
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
+    load_autocomplete_indexes()
     app.run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
+    load_autocomplete_indexes()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,385 @@
+import asyncio
+import functools
+import io
+import sys
+
+from asgiref.sync import async_to_sync, sync_to_async
+from flask import Response, abort, make_response, render_template, request, request_started, session
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+
+import app as fyyur
+import cache
+import metrics
+
+# Optional ASGI deployment mode:
+#
+#   uvicorn asgi:application --workers 4
+#
+# The read routes below (listings, searches and detail pages) run as coroutines on
+# async SQLAlchemy with an async driver, so a worker keeps serving while they wait on
+# the database, and statements that do not depend on each other run concurrently on
+# separate connections. Every other route goes to the regular Flask app in a worker
+# thread. They share statements, row builders, templates, request hooks and caches
+# with the WSGI views in app.py, which stay the default deployment (`python app.py`,
+# gunicorn). Needs the packages in requirements-asgi.txt: asgiref, uvicorn and an
+# async driver (asyncpg for PostgreSQL, aiosqlite for SQLite).
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def async_database_url(url):
+  url = make_url(url)
+  drivername = ASYNC_DRIVERS.get(url.get_backend_name())
+  if drivername is None:
+    raise ValueError(f'No async driver configured for {url.get_backend_name()}')
+  return url.set(drivername=drivername)
+
+
+engine = create_async_engine(fyyur.app.config.get('ASYNC_DATABASE_URI') or
+                             async_database_url(fyyur.app.config['SQLALCHEMY_DATABASE_URI']))
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+# Each helper checks out its own connection, so statements passed to asyncio.gather
+# really run at the same time.
+
+async def fetch_all(statement):
+  async with async_session() as db_session:
+    return (await db_session.execute(statement)).all()
+
+
+async def fetch_first(statement):
+  async with async_session() as db_session:
+    return (await db_session.execute(statement)).first()
+
+
+async def fetch_entity(statement):
+  async with async_session() as db_session:
+    return (await db_session.execute(statement)).unique().scalar_one_or_none()
+
+
+async def run_blocking(function, *args, **kwargs):
+  # For the pieces that are still synchronous (the Redis cache, the in-memory search
+  # index and its loader); the worker thread inherits the request and app context.
+  return await asyncio.to_thread(function, *args, **kwargs)
+
+
+async def cache_call(detail_cache, function, *args, **kwargs):
+  # The in-process LRU never blocks; Redis does.
+  if isinstance(detail_cache, cache.LRUCache):
+    return function(*args, **kwargs)
+  return await run_blocking(function, *args, **kwargs)
+
+
+async def get_cached_detail(key, load):
+  detail_cache = fyyur.detail_cache
+  if detail_cache is None:
+    return await load()
+  data = await cache_call(detail_cache, detail_cache.get, key)
+  metrics.record_cache('detail', data is not None)
+  if data is None:
+    data = await load()
+    if data is not None:
+      await cache_call(detail_cache, detail_cache.set, key, data, ttl=fyyur.seconds_until_next_show(data))
+  return data
+
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+def listing_version(key, *models):
+  async def get_version():
+    return fyyur.listing_version(key, await fetch_first(fyyur.listing_version_statement(*models)))
+  return get_version
+
+
+def conditional(get_version):
+  # fyyur.conditional for coroutine views.
+  def decorator(view):
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+      version = None if '_flashes' in session else await get_version(*args, **kwargs)
+      if version is None:
+        return await view(*args, **kwargs)
+      if fyyur.is_not_modified(version):
+        return fyyur.mark_version(Response(status=304), version)
+      return fyyur.mark_version(make_response(await view(*args, **kwargs)), version)
+    return wrapper
+  return decorator
+
+
+#----------------------------------------------------------------------------#
+# Views.
+#----------------------------------------------------------------------------#
+
+# Flask endpoint -> coroutine view. Requests for any other endpoint fall through to
+# the WSGI app.
+async_views = {}
+
+
+def async_view(endpoint):
+  def decorator(view):
+    async_views[endpoint] = view
+    return view
+  return decorator
+
+
+@async_view('venues')
+@conditional(listing_version('venues', fyyur.Venue))
+async def venues():
+  per_area, page = fyyur.venue_area_args()
+  genres = fyyur.genre_args()
+  rows, facets = await asyncio.gather(
+    fetch_all(fyyur.venue_areas_statement(per_area=per_area, page=page, genres=genres)),
+    fetch_all(fyyur.genre_facets_statement(fyyur.Venue)),
+  )
+  data = fyyur.venue_area_listing(rows, per_area=per_area, page=page)
+  return render_template('pages/venues.html', areas=data, per_area=per_area, page=page, genres=genres,
+                         facets=facets)
+
+
+@async_view('artists')
+@conditional(listing_version('artists', fyyur.Artist))
+async def artists():
+  genres = fyyur.genre_args()
+  rows, facets = await asyncio.gather(
+    fetch_all(fyyur.artists_statement(genres=genres)),
+    fetch_all(fyyur.genre_facets_statement(fyyur.Artist)),
+  )
+  return render_template('pages/artists.html', artists=fyyur.artist_listing(rows), genres=genres, facets=facets)
+
+
+@async_view('shows')
+@conditional(listing_version('shows', fyyur.Show, fyyur.Venue, fyyur.Artist))
+async def shows():
+  after, start, end, limit = fyyur.show_page_args()
+  rows = await fetch_all(fyyur.show_page_statement(after=after, start=start, end=end, limit=limit))
+  return fyyur.render_show_page(fyyur.show_listing(rows, limit=limit), limit)
+
+
+async def search_entities(model, genre_model, genre_fk, term, limit=fyyur.SEARCH_RESULTS_LIMIT, genres=()):
+  if fyyur.use_trigram_search():
+    rows = await fetch_all(fyyur.trigram_search_statement(model, genre_model, genre_fk, term, limit, genres))
+    matches, total = fyyur.trigram_matches(rows)
+  else:
+    matches, total = await run_blocking(fyyur.search_indexes[model].search, term, limit, tags=genres)
+  ids = [entity_id for entity_id, name in matches]
+  counts = dict(await fetch_all(fyyur.upcoming_show_counts_statement(model, ids))) if ids else {}
+  return fyyur.search_results(matches, total, counts)
+
+
+@async_view('search_venues')
+async def search_venues():
+  search_term = request.form.get('search_term', '')
+  genres = fyyur.genre_args()
+  response = await search_entities(fyyur.Venue, fyyur.VenueGenre, fyyur.VenueGenre.venue_id, search_term, genres=genres)
+  return render_template('pages/search_venues.html', results=response, search_term=search_term, genres=genres)
+
+
+@async_view('search_artists')
+async def search_artists():
+  search_term = request.form.get('search_term', '')
+  genres = fyyur.genre_args()
+  response = await search_entities(fyyur.Artist, fyyur.ArtistGenre, fyyur.ArtistGenre.artist_id, search_term, genres=genres)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term, genres=genres)
+
+
+async def load_summary(kind, entity_id):
+  # One primary-key lookup; a summary that has to be rebuilt is rebuilt on a worker
+  # thread, through the same locking path as WSGI mode.
+  row = await fetch_first(fyyur.summary_statement(kind, entity_id))
+  data = fyyur.fresh_summary(row)
+  if data is None:
+    data = await run_blocking(fyyur.load_stale_summary, kind, entity_id, row)
+  return data
+
+
+@async_view('show_venue')
+async def show_venue(venue_id):
+  data = await get_cached_detail(f'venue:{venue_id}', lambda: load_summary('venue', venue_id))
+  if data is None:
+    abort(404)
+  return fyyur.versioned_response(fyyur.data_version(f'venue:{venue_id}', data),
+                                  lambda: render_template('pages/show_venue.html', venue=data))
+
+
+@async_view('show_artist')
+async def show_artist(artist_id):
+  data = await get_cached_detail(f'artist:{artist_id}', lambda: load_summary('artist', artist_id))
+  if data is None:
+    abort(404)
+  return fyyur.versioned_response(fyyur.data_version(f'artist:{artist_id}', data),
+                                  lambda: render_template('pages/show_artist.html', artist=data))
+
+
+#----------------------------------------------------------------------------#
+# ASGI application.
+#----------------------------------------------------------------------------#
+
+def build_environ(scope, body):
+  # PEP 3333 environ for an ASGI HTTP scope.
+  script_name = (scope.get('root_path') or '').encode('utf8').decode('latin1')
+  path_info = scope['path'].encode('utf8').decode('latin1')
+  if path_info.startswith(script_name):
+    path_info = path_info[len(script_name):]
+  server_name, server_port = scope.get('server') or ('localhost', 80)
+  environ = {
+    'REQUEST_METHOD': scope['method'],
+    'SCRIPT_NAME': script_name,
+    'PATH_INFO': path_info,
+    'QUERY_STRING': scope['query_string'].decode('ascii'),
+    'SERVER_NAME': server_name,
+    'SERVER_PORT': str(server_port),
+    'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+    'wsgi.version': (1, 0),
+    'wsgi.url_scheme': scope.get('scheme', 'http'),
+    'wsgi.input': io.BytesIO(body),
+    # The whole body is read already, so a chunked request without a Content-Length
+    # can still be read to its end.
+    'wsgi.input_terminated': True,
+    'wsgi.errors': sys.stderr,
+    'wsgi.multithread': True,
+    'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+  }
+  if scope.get('client'):
+    environ['REMOTE_ADDR'] = scope['client'][0]
+  for name, value in scope.get('headers', []):
+    name = name.decode('latin1')
+    if name == 'content-length':
+      key = 'CONTENT_LENGTH'
+    elif name == 'content-type':
+      key = 'CONTENT_TYPE'
+    else:
+      key = 'HTTP_' + name.upper().replace('-', '_')
+    value = value.decode('latin1')
+    environ[key] = f'{environ[key]},{value}' if key in environ else value
+  return environ
+
+
+def encode_headers(headers):
+  return [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+
+
+async def read_body(receive):
+  chunks = []
+  while True:
+    message = await receive()
+    chunks.append(message.get('body', b''))
+    if not message.get('more_body'):
+      return b''.join(chunks)
+
+
+class Application:
+
+  def __init__(self, flask_app):
+    self.flask_app = flask_app
+
+  def match(self, scope):
+    adapter = self.flask_app.url_map.bind('localhost', script_name=scope.get('root_path') or None)
+    try:
+      endpoint, view_args = adapter.match(scope['path'], method=scope['method'])
+    except HTTPException:
+      return None
+    return async_views.get(endpoint)
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self.lifespan(receive, send)
+    view = self.match(scope) if scope['type'] == 'http' else None
+    environ = build_environ(scope, await read_body(receive))
+    if view is None:
+      return await self.run_wsgi(environ, send)
+
+    app_iter, status, headers = await self.dispatch(environ, view)
+    await send({
+      'type': 'http.response.start',
+      'status': int(status.split(' ', 1)[0]),
+      'headers': encode_headers(headers),
+    })
+    await send({'type': 'http.response.body', 'body': b''.join(app_iter)})
+
+  async def run_wsgi(self, environ, send):
+    # The rest of the app runs on a thread of its own per request (thread_sensitive=False):
+    # the shared thread asgiref uses by default would serialize the write routes. The
+    # whole response is iterated on that thread, so streamed bodies keep their request
+    # context, and each chunk is handed back to the event loop as it is produced.
+    await sync_to_async(self.respond_wsgi, thread_sensitive=False)(environ, async_to_sync(send))
+
+  def respond_wsgi(self, environ, send):
+    status_line = []
+
+    def start_response(status, headers, exc_info=None):
+      status_line[:] = [status, headers]
+      return lambda data: send({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+    def start():
+      status, headers = status_line
+      send({'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+            'headers': encode_headers(headers)})
+
+    app_iter = self.flask_app.wsgi_app(environ, start_response)
+    try:
+      started = False
+      for chunk in app_iter:
+        if not started:
+          start()
+          started = True
+        if chunk:
+          send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+      if not started:
+        start()
+      send({'type': 'http.response.body', 'body': b''})
+    finally:
+      if hasattr(app_iter, 'close'):
+        app_iter.close()
+
+  async def dispatch(self, environ, view):
+    # Flask.wsgi_app and full_dispatch_request with an awaited view: the same
+    # before/after request hooks, error handlers and session handling as WSGI mode.
+    flask_app = self.flask_app
+    ctx = flask_app.request_context(environ)
+    error = None
+    try:
+      try:
+        ctx.push()
+        try:
+          request_started.send(flask_app)
+          rv = flask_app.preprocess_request()
+          if rv is None:
+            rv = await view(**request.view_args)
+        except Exception as e:
+          rv = flask_app.handle_user_exception(e)
+        response = flask_app.finalize_request(rv)
+      except Exception as e:
+        error = e
+        response = flask_app.handle_exception(e)
+      except:
+        error = sys.exc_info()[1]
+        raise
+      return response.get_wsgi_response(environ)
+    finally:
+      if error is not None and flask_app.should_ignore_error(error):
+        error = None
+      ctx.pop(error)
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await run_blocking(fyyur.load_autocomplete_indexes)
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        await engine.dispose()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+
+application = Application(fyyur.app)
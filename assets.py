@@ -0,0 +1,176 @@
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+# Static asset pipeline behind `flask assets build`. Bundles concatenate and minify
+# the stylesheets and scripts the layout loads, every output file gets a content hash
+# in its name, and compressible files get .gz (and, with the brotli package, .br)
+# siblings. The build lands in static/dist with a manifest mapping source paths to
+# built ones, and relative url() references in stylesheets are rebased to wherever
+# the built file ends up. Without a manifest the layout falls back to the individual
+# source files.
+
+DIST_DIRECTORY = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Bundle name -> source files relative to static/, in load order.
+BUNDLES = {
+  'bundle.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main6.css', 'css/main.responsive.css',
+                 'css/main.quickfix.css'],
+  'head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js', 'js/script.js'],
+  'body.js': ['js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js', 'js/button_actions8.js'],
+}
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.ttf', '.otf', '.eot'}
+# Smaller than this, the compressed copy saves less than its own overhead.
+MIN_COMPRESS_SIZE = 256
+
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+CSS_WHITESPACE = re.compile(r'\s+')
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+ABSOLUTE_URL = re.compile(r'^(?:[a-z]+:|/|#)', re.IGNORECASE)
+
+
+def rebase_css_urls(source, source_path, target_path):
+  # Rewrites relative url()s in a stylesheet at source_path so they still point at
+  # the same files from target_path (both relative to static/).
+  def rebase(match):
+    quote, url = match.groups()
+    if ABSOLUTE_URL.match(url):
+      return match.group(0)
+    path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+    resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source_path), path))
+    rebased = posixpath.relpath(resolved, posixpath.dirname(target_path) or '.')
+    return f'url({quote}{rebased}{suffix}{quote})'
+  return CSS_URL.sub(rebase, source)
+
+
+def minify_css(source):
+  source = CSS_COMMENT.sub('', source)
+  source = CSS_WHITESPACE.sub(' ', source)
+  source = CSS_PUNCTUATION.sub(r'\1', source)
+  return source.replace(';}', '}').strip()
+
+
+def minify_js(source):
+  # Deliberately conservative (no parser): drops indentation, blank lines and lines
+  # that are only a // comment, which cannot change what the script does.
+  lines = (line.strip() for line in source.splitlines())
+  return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def minify(path, source):
+  if '.min.' in os.path.basename(path):
+    return source.strip()
+  if path.endswith('.css'):
+    return minify_css(source)
+  if path.endswith('.js'):
+    return minify_js(source)
+  return source
+
+
+def build_bundle(static_folder, sources, target_path):
+  parts = []
+  for source in sources:
+    with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+      content = minify(source, f.read())
+    if source.endswith('.css'):
+      content = rebase_css_urls(content, source, target_path)
+    parts.append(content)
+  # The separator keeps a script without a trailing semicolon from running into the
+  # next one.
+  separator = '\n' if sources[0].endswith('.css') else '\n;\n'
+  return separator.join(parts).encode('utf-8')
+
+
+def fingerprinted_name(path, content):
+  root, extension = os.path.splitext(path)
+  return f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{extension}'
+
+
+def compress(path, content):
+  # Returns the encodings written next to path. gzip with mtime=0 so that unchanged
+  # content produces byte-identical output.
+  encodings = []
+  if os.path.splitext(path)[1] not in COMPRESSIBLE_EXTENSIONS or len(content) < MIN_COMPRESS_SIZE:
+    return encodings
+  if brotli is not None:
+    with open(path + '.br', 'wb') as f:
+      f.write(brotli.compress(content, quality=11))
+    encodings.append('br')
+  with open(path + '.gz', 'wb') as f:
+    f.write(gzip.compress(content, compresslevel=9, mtime=0))
+  encodings.append('gzip')
+  return encodings
+
+
+def source_files(static_folder):
+  for directory, subdirectories, filenames in os.walk(static_folder):
+    relative = os.path.relpath(directory, static_folder)
+    if relative == DIST_DIRECTORY:
+      subdirectories[:] = []
+      continue
+    subdirectories.sort()
+    for filename in sorted(filenames):
+      if not filename.startswith('.'):
+        yield os.path.normpath(os.path.join(relative, filename)).replace(os.sep, '/')
+
+
+def build(static_folder, bundles=BUNDLES):
+  # Rebuilds static/dist from scratch and returns the manifest:
+  #   {"files": {source or bundle name: built path}, "encodings": {built path: [...]}}
+  # Built paths are relative to static/, e.g. "dist/bundle.3f2a9c0d1b7e.css".
+  dist_folder = os.path.join(static_folder, DIST_DIRECTORY)
+  shutil.rmtree(dist_folder, ignore_errors=True)
+  os.makedirs(dist_folder)
+  manifest = {'files': {}, 'encodings': {}}
+
+  def write(name, content):
+    built = f'{DIST_DIRECTORY}/{fingerprinted_name(name, content)}'
+    path = os.path.join(static_folder, built)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+      f.write(content)
+    manifest['files'][name] = built
+    encodings = compress(path, content)
+    if encodings:
+      manifest['encodings'][built] = encodings
+
+  for name, sources in bundles.items():
+    write(name, build_bundle(static_folder, sources, f'{DIST_DIRECTORY}/{name}'))
+  for source in source_files(static_folder):
+    with open(os.path.join(static_folder, source), 'rb') as f:
+      content = f.read()
+    if source.endswith('.css'):
+      content = rebase_css_urls(content.decode('utf-8'), source, f'{DIST_DIRECTORY}/{source}').encode('utf-8')
+    write(source, content)
+
+  with open(os.path.join(dist_folder, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
+  return manifest
+
+
+def load_manifest(static_folder):
+  try:
+    with open(os.path.join(static_folder, DIST_DIRECTORY, MANIFEST_NAME), encoding='utf-8') as f:
+      return json.load(f)
+  except FileNotFoundError:
+    return None
+
+
+def choose_encoding(accept_encodings, available):
+  # Brotli over gzip when the client takes both; None for the uncompressed file.
+  for encoding in ('br', 'gzip'):
+    if encoding in available and accept_encodings[encoding]:
+      return encoding
+  return None
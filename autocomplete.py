@@ -0,0 +1,155 @@
+import bisect
+import re
+import threading
+import time
+import unicodedata
+
+# In-process prefix index for the venue and artist pickers. Names are normalized
+# (case-folded, accents and punctuation dropped, whitespace collapsed) and kept in two
+# sorted lists: one keyed by the whole name and one by the rest of the name from each
+# later word on, so "blu" finds "Blue Note" and "ro" finds "The Blue Room". A query is
+# a binary search plus a walk over the entries sharing its prefix; whole-name matches
+# come before later-word matches. Each process keeps its own index: its own commits
+# reach it by id, other processes' through a shared generation counter.
+
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+  if not text:
+    return ''
+  text = unicodedata.normalize('NFKD', text)
+  text = ''.join(char for char in text if not unicodedata.combining(char))
+  return ' '.join(WORD_PATTERN.findall(text.casefold()))
+
+
+def word_keys(key):
+  words = key.split(' ')
+  return [' '.join(words[i:]) for i in range(1, len(words))]
+
+
+def discard(keys, entry):
+  i = bisect.bisect_left(keys, entry)
+  if i < len(keys) and keys[i] == entry:
+    del keys[i]
+
+
+class PrefixIndex:
+
+  def __init__(self, loader, generation=None, recheck_seconds=5, spawn=None):
+    # loader(ids) returns (id, name) pairs for the given ids, or for every entry when
+    # ids is None. Changed ids are reloaded on the next query. generation(), if
+    # given, reads a counter that other processes bump when they change names; it is
+    # read at most every recheck_seconds, and when it has moved on the whole index is
+    # reloaded through spawn(function) in the background while queries keep using
+    # the current entries.
+    self.loader = loader
+    self.read_generation = generation
+    self.recheck_seconds = recheck_seconds
+    self.spawn = spawn or (lambda function: threading.Thread(target=function, daemon=True).start())
+    self.lock = threading.Lock()
+    self.reload_lock = threading.Lock()
+    self.loaded = False
+    self.reloading = False
+    self.generation = None
+    self.checked_at = 0
+    self.pending = set()
+    self.names = {}
+    self.name_keys = []
+    self.word_keys = []
+
+  def invalidate(self, ids):
+    with self.lock:
+      self.pending.update(ids)
+
+  def clear(self):
+    with self.lock:
+      self.loaded = False
+      self.generation = None
+      self.pending.clear()
+      self.names, self.name_keys, self.word_keys = {}, [], []
+
+  def reload(self):
+    # Loads every entry; a concurrent caller waits for the load in progress instead of
+    # starting another. Sorting once is much cheaper than inserting entry by entry,
+    # and it happens outside the query lock.
+    with self.reload_lock:
+      generation = self.read_generation() if self.read_generation else None
+      if self.loaded and generation == self.generation:
+        return
+      with self.lock:
+        self.pending.clear()
+      entries = list(self.loader(None))
+      names = {entry_id: name for entry_id, name in entries}
+      name_keys = sorted((normalize(name), entry_id) for entry_id, name in entries)
+      later_keys = sorted((key, entry_id) for name_key, entry_id in name_keys for key in word_keys(name_key))
+      with self.lock:
+        self.names, self.name_keys, self.word_keys = names, name_keys, later_keys
+        self.generation = generation
+        self.checked_at = time.monotonic()
+        self.loaded = True
+
+  def check_generation(self):
+    now = time.monotonic()
+    with self.lock:
+      if self.read_generation is None or self.reloading or now - self.checked_at < self.recheck_seconds:
+        return
+      self.checked_at = now
+    if self.read_generation() != self.generation:
+      self.reloading = True
+      self.spawn(self._reload_in_background)
+
+  def _reload_in_background(self):
+    try:
+      self.reload()
+    finally:
+      self.reloading = False
+
+  def refresh(self):
+    if not self.loaded:
+      self.reload()
+      return
+    self.check_generation()
+    with self.lock:
+      if not self.pending:
+        return
+      ids = set(self.pending)
+      self.pending.clear()
+    entries = list(self.loader(ids))
+    with self.lock:
+      for entry_id in ids:
+        self._remove(entry_id)
+      for entry_id, name in entries:
+        self._add(entry_id, name)
+
+  def _add(self, entry_id, name):
+    key = normalize(name)
+    self.names[entry_id] = name
+    bisect.insort(self.name_keys, (key, entry_id))
+    for later in word_keys(key):
+      bisect.insort(self.word_keys, (later, entry_id))
+
+  def _remove(self, entry_id):
+    name = self.names.pop(entry_id, None)
+    if name is None:
+      return
+    key = normalize(name)
+    discard(self.name_keys, (key, entry_id))
+    for later in word_keys(key):
+      discard(self.word_keys, (later, entry_id))
+
+  def complete(self, prefix, limit):
+    # Returns up to limit [(id, name), ...] whose name, or a later word of it, starts
+    # with prefix, in name order within each group.
+    self.refresh()
+    prefix = normalize(prefix)
+    if not prefix:
+      return []
+    matches = {}
+    with self.lock:
+      for keys in (self.name_keys, self.word_keys):
+        i = bisect.bisect_left(keys, (prefix,))
+        while len(matches) < limit and i < len(keys) and keys[i][0].startswith(prefix):
+          matches.setdefault(keys[i][1], self.names[keys[i][1]])
+          i += 1
+    return list(matches.items())
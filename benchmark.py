@@ -0,0 +1,142 @@
+import json
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Measurement side of `flask benchmark`. A target is a named list of (method, url, form
+# data) requests; run_target cycles through them and reports latency percentiles,
+# throughput and the SQL statement count each response declared in its Server-Timing
+# header, or for streamed pages, which have none, the count the app logged when the
+# response was closed (test client only). Reports are plain JSON with sorted keys so
+# two runs can be diffed.
+# per_row_microseconds times a single function for micro-benchmarks.
+
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(sorted_values, p):
+  if not sorted_values:
+    return None
+  rank = (len(sorted_values) - 1) * p / 100
+  low = int(rank)
+  high = min(low + 1, len(sorted_values) - 1)
+  return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def query_count(headers):
+  match = QUERIES_PATTERN.search(headers.get('Server-Timing') or '')
+  return int(match.group(1)) if match else None
+
+
+class TestClientTransport:
+  # Drives the app in-process; no network or server overhead in the numbers. Bodies
+  # are read in full, since streamed pages do most of their work while being read.
+
+  concurrency = 1
+
+  def __init__(self, client, recent_stats=None):
+    # recent_stats: the app's log of per-request query summaries, newest last.
+    self.client = client
+    self.recent_stats = recent_stats
+
+  def send(self, method, url, data):
+    response = self.client.open(url, method=method, data=data, buffered=True)
+    response.close()
+    return response.status_code, response.headers
+
+  def queries(self, headers):
+    count = query_count(headers)
+    if count is None and self.recent_stats:
+      count = self.recent_stats[-1]['queries']
+    return count
+
+
+class HTTPTransport:
+  # Drives a running server, e.g. gunicorn started against the same database.
+
+  def __init__(self, base_url, concurrency=1):
+    self.base_url = base_url.rstrip('/')
+    self.concurrency = concurrency
+
+  def send(self, method, url, data):
+    body = urllib.parse.urlencode(data).encode() if data else None
+    request = urllib.request.Request(self.base_url + url, data=body, method=method)
+    try:
+      with urllib.request.urlopen(request) as response:
+        response.read()
+        return response.status, response.headers
+    except urllib.error.HTTPError as e:
+      return e.code, e.headers
+
+  def queries(self, headers):
+    return query_count(headers)
+
+
+def run_target(transport, requests, iterations, warmup=5):
+  for method, url, data in requests[:warmup]:
+    transport.send(method, url, data)
+
+  def timed(n):
+    method, url, data = requests[n % len(requests)]
+    started = time.perf_counter()
+    status, headers = transport.send(method, url, data)
+    return time.perf_counter() - started, status, transport.queries(headers)
+
+  started = time.perf_counter()
+  if transport.concurrency > 1:
+    with ThreadPoolExecutor(transport.concurrency) as pool:
+      results = list(pool.map(timed, range(iterations)))
+  else:
+    results = [timed(n) for n in range(iterations)]
+  elapsed = time.perf_counter() - started
+
+  latencies = sorted(latency for latency, _, _ in results)
+  queries = [count for _, _, count in results if count is not None]
+  return {
+    'requests': iterations,
+    'errors': sum(1 for _, status, _ in results if status >= 500),
+    'statuses': sorted({status for _, status, _ in results}),
+    'throughput_rps': round(iterations / elapsed, 1),
+    'latency_ms': {name: round(percentile(latencies, p) * 1000, 3)
+                   for name, p in (('p50', 50), ('p95', 95), ('p99', 99))},
+    'queries': {'min': min(queries), 'max': max(queries), 'mean': round(sum(queries) / len(queries), 2)}
+               if queries else None,
+  }
+
+
+def per_row_microseconds(render_page, rows, pages, before_page=None):
+  # Best-of-pages cost of render_page() divided by the rows it renders.
+  timings = []
+  for _ in range(pages):
+    if before_page:
+      before_page()
+    started = time.perf_counter()
+    render_page()
+    timings.append(time.perf_counter() - started)
+  return round(min(timings) / rows * 1e6, 3)
+
+
+def compare(report, baseline, threshold=0.1):
+  # Lines describing targets whose p95 or query count moved by more than threshold.
+  lines = []
+  for name, current in sorted(report['targets'].items()):
+    previous = baseline.get('targets', {}).get(name)
+    if previous is None:
+      lines.append(f'{name}: new')
+      continue
+    old_p95, new_p95 = previous['latency_ms']['p95'], current['latency_ms']['p95']
+    if old_p95 and abs(new_p95 - old_p95) / old_p95 > threshold:
+      lines.append(f'{name}: p95 {old_p95:.1f}ms -> {new_p95:.1f}ms')
+    old_queries = (previous.get('queries') or {}).get('max')
+    new_queries = (current.get('queries') or {}).get('max')
+    if old_queries != new_queries:
+      lines.append(f'{name}: queries {old_queries} -> {new_queries}')
+  return lines
+
+
+def load_report(path):
+  with open(path, encoding='utf-8') as source:
+    return json.load(source)
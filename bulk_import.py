@@ -0,0 +1,138 @@
+import csv
+import json
+import time
+import warnings
+
+from werkzeug.datastructures import MultiDict
+
+from forms import VenueForm, ArtistForm, ShowForm
+
+# Streaming readers, row validation and the batch loop behind `flask import`. Rows are
+# validated with the same WTForms classes the create pages use, so an imported venue
+# obeys exactly the rules a submitted one does. Writing batches is left to the caller.
+
+FORMS = {
+  'venues': VenueForm,
+  'artists': ArtistForm,
+  'shows': ShowForm,
+}
+
+# forms.py subclasses the deprecated flask_wtf.Form alias, which warns on every
+# instantiation; once per imported row is noise.
+warnings.filterwarnings('ignore', message='"flask_wtf.Form" has been renamed')
+
+# CSV cells hold several genres separated by this character; JSONL rows may use a list.
+GENRE_SEPARATOR = ';'
+
+
+class RowError:
+
+  def __init__(self, message):
+    self.message = message
+
+
+def detect_format(path):
+  return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(path, format=None):
+  # Yields one dict per record without loading the file; lines that are not valid JSON
+  # come through as RowError so they can be rejected like any other bad row.
+  format = format or detect_format(path)
+  with open(path, newline='', encoding='utf-8') as source:
+    if format == 'csv':
+      yield from csv.DictReader(source)
+      return
+    for line in source:
+      if not line.strip():
+        continue
+      try:
+        row = json.loads(line)
+      except ValueError as e:
+        yield RowError(f'invalid JSON: {e}')
+        continue
+      yield row if isinstance(row, dict) else RowError('expected a JSON object')
+
+
+def to_formdata(row):
+  data = MultiDict()
+  for key, value in row.items():
+    if value is None:
+      continue
+    if key == 'genres':
+      genres = value if isinstance(value, list) else value.split(GENRE_SEPARATOR)
+      for genre in genres:
+        if str(genre).strip():
+          data.add('genres', str(genre).strip())
+    else:
+      data.add(key, str(value).strip())
+  return data
+
+
+def validate_row(kind, row):
+  # Returns (data, None) for a valid row and (None, errors) otherwise. Keys the form
+  # does not define are passed through untouched for the writer to interpret.
+  if isinstance(row, RowError):
+    return None, {'row': [row.message]}
+  form = FORMS[kind](formdata=to_formdata(row), meta={'csrf': False})
+  if not form.validate():
+    return None, form.errors
+  data = dict(row)
+  data.update(form.data)
+  return data, None
+
+
+class Progress:
+
+  def __init__(self, label, echo, clock=time.monotonic):
+    self.label = label
+    self.echo = echo
+    self.clock = clock
+    self.started = clock()
+    self.imported = 0
+    self.rejected = 0
+
+  def report(self, done=False):
+    elapsed = max(self.clock() - self.started, 1e-9)
+    self.echo(f'{self.label}: {self.imported} imported, {self.rejected} rejected in {elapsed:.1f}s '
+              f'({self.imported / elapsed:.0f} rows/s){" - done" if done else ""}')
+
+
+def run_import(rows, kind, write_batch, batch_size, skip=0, on_reject=None, progress=None):
+  # Validates rows and hands them to write_batch(batch, position) in groups of
+  # batch_size, where position is the number of input rows consumed so far; the writer
+  # commits the batch together with that position so an interrupted import resumes
+  # after the last committed batch. write_batch returns the rows it had to reject
+  # (e.g. unknown foreign keys) as (row, errors) pairs.
+  batch = []
+  position = 0
+
+  def flush(position):
+    rejected = write_batch(batch, position) or []
+    for row, errors in rejected:
+      if on_reject:
+        on_reject(row, errors)
+    if progress:
+      progress.imported += len(batch) - len(rejected)
+      progress.rejected += len(rejected)
+      progress.report()
+    batch.clear()
+
+  for position, row in enumerate(rows, 1):
+    if position <= skip:
+      continue
+    data, errors = validate_row(kind, row)
+    if errors:
+      if on_reject:
+        on_reject(row, errors)
+      if progress:
+        progress.rejected += 1
+      continue
+    batch.append(data)
+    if len(batch) >= batch_size:
+      flush(position)
+  if batch or position > skip:
+    flush(position)
+  if progress:
+    progress.report(done=True)
+  return position
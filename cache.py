@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Backends for the venue/artist detail cache. Both expose get(key), set(key, value, ttl)
+# and delete_many(keys); values are the plain dicts built by the detail views.
+
+
+class LRUCache:
+  # In-process cache, private to one worker. Entries expire after their TTL and the
+  # least recently used entry is evicted once max_entries is reached.
+
+  def __init__(self, max_entries=1024, ttl=300, clock=time.monotonic):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self.clock = clock
+    self.entries = OrderedDict()
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      value, expires_at = entry
+      if expires_at <= self.clock():
+        del self.entries[key]
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+    if ttl <= 0:
+      return
+    with self.lock:
+      self.entries[key] = (value, self.clock() + ttl)
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+
+  def delete_many(self, keys):
+    with self.lock:
+      for key in keys:
+        self.entries.pop(key, None)
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+
+
+def encode_value(value):
+  if isinstance(value, datetime):
+    return {"__datetime__": value.isoformat()}
+  raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def decode_value(value):
+  if "__datetime__" in value:
+    return datetime.fromisoformat(value["__datetime__"])
+  return value
+
+
+class RedisCache:
+  # Cache shared by every worker that points at the same Redis server, so an
+  # invalidation in one gunicorn worker is seen by all of them. TTLs are enforced by
+  # Redis; size is bounded by the server's maxmemory with an allkeys-lru policy.
+  # `client` is anything with redis-py's get/set/delete signatures.
+
+  def __init__(self, client, prefix='fyyur:detail:', ttl=300):
+    self.client = client
+    self.prefix = prefix
+    self.ttl = ttl
+
+  @classmethod
+  def from_url(cls, url, **kwargs):
+    import redis
+    return cls(redis.Redis.from_url(url), **kwargs)
+
+  def get(self, key):
+    raw = self.client.get(self.prefix + key)
+    if raw is None:
+      return None
+    return json.loads(raw, object_hook=decode_value)
+
+  def set(self, key, value, ttl=None):
+    ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+    if int(ttl) < 1:
+      return
+    self.client.set(self.prefix + key, json.dumps(value, default=encode_value, separators=(',', ':')), ex=int(ttl))
+
+  def delete_many(self, keys):
+    keys = [self.prefix + key for key in keys]
+    if keys:
+      self.client.delete(*keys)
+
+  def clear(self):
+    # Only used by tooling; scans rather than FLUSHDB so other prefixes survive.
+    keys = list(self.client.scan_iter(match=self.prefix + '*'))
+    if keys:
+      self.client.delete(*keys)
@@ -11,4 +11,33 @@ DEBUG = True
 
 # TODO IMPLEMENT DATABASE URL - DONE
 # SQLALCHEMY_DATABASE_URI = '<Put your local database url>'
-SQLALCHEMY_DATABASE_URI = 'postgresql://will@localhost:5432/fyyurDB'
\ No newline at end of file
+SQLALCHEMY_DATABASE_URI = 'postgresql://will@localhost:5432/fyyurDB'
+
+# Venue/artist detail page cache. 'memory' keeps a per-worker LRU, 'redis' shares it
+# between workers (required for correct invalidation with more than one worker) and
+# None disables caching.
+DETAIL_CACHE_BACKEND = 'memory'
+DETAIL_CACHE_MAX_ENTRIES = 1024
+DETAIL_CACHE_TTL = 300
+DETAIL_CACHE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+# Per-request SQL instrumentation: statement counts and DB time go into a Server-Timing
+# header, shapes repeated SQL_N_PLUS_ONE_THRESHOLD times in one request are logged as
+# probable N+1 queries, and /debug/queries lists recent requests when enabled.
+# SQLALCHEMY_ECHO=1 still logs every statement, for local debugging only.
+SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO') == '1'
+SQL_INSTRUMENTATION = True
+SQL_SLOWEST_STATEMENTS = 5
+SQL_N_PLUS_ONE_THRESHOLD = 5
+SQL_RECENT_REQUESTS = 50
+SQL_DEBUG_ENDPOINT = DEBUG
+
+# Venue/artist deletion. Off, a delete removes the row and the database cascades to its
+# shows and genres in the same request. On, a delete only hides the venue or artist
+# and `flask purge`, run periodically like `flask counters rollover`, removes the rows
+# in small batches.
+SOFT_DELETE = os.environ.get('SOFT_DELETE') == '1'
+
+# Database URL for the optional ASGI mode (asgi.py). None derives it from
+# SQLALCHEMY_DATABASE_URI with the async driver swapped in (asyncpg, aiosqlite).
+ASYNC_DATABASE_URI = os.environ.get('ASYNC_DATABASE_URL')
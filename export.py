@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+# Serializers for the catalog export. Each takes the column names and an iterator of
+# row tuples and yields text chunks of roughly CHUNK_SIZE characters, so a response or
+# file can be written while the database is still streaming rows.
+
+CHUNK_SIZE = 64 * 1024
+
+
+def json_default(value):
+  if isinstance(value, (datetime, date)):
+    return value.isoformat()
+  raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def ndjson_chunks(columns, rows):
+  encoder = json.JSONEncoder(default=json_default, separators=(',', ':'))
+  chunk, size = [], 0
+  for row in rows:
+    line = encoder.encode(dict(zip(columns, row))) + '\n'
+    chunk.append(line)
+    size += len(line)
+    if size >= CHUNK_SIZE:
+      yield ''.join(chunk)
+      chunk, size = [], 0
+  if chunk:
+    yield ''.join(chunk)
+
+
+def csv_chunks(columns, rows):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(columns)
+  for row in rows:
+    writer.writerow([value.isoformat() if isinstance(value, (datetime, date)) else value for value in row])
+    if buffer.tell() >= CHUNK_SIZE:
+      yield buffer.getvalue()
+      buffer.seek(0)
+      buffer.truncate()
+  if buffer.tell():
+    yield buffer.getvalue()
+
+
+FORMATS = {
+  'ndjson': (ndjson_chunks, 'application/x-ndjson'),
+  'csv': (csv_chunks, 'text/csv'),
+}
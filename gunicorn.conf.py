@@ -0,0 +1,13 @@
+# gunicorn settings, picked up from the working directory: gunicorn app:app
+
+def post_worker_init(worker):
+  # Build the autocomplete indexes before the worker takes requests, so the first
+  # keystroke does not pay for the full load.
+  from app import load_autocomplete_indexes
+  load_autocomplete_indexes()
+
+
+def child_exit(server, worker):
+  # Drop the exited worker's live gauges from the multi-process metrics directory.
+  import metrics
+  metrics.mark_process_dead(worker.pid)
@@ -0,0 +1,85 @@
+import bisect
+import threading
+
+# Interval lookups behind show conflict detection where the database cannot enforce it
+# (SQLite). Intervals are half-open [start, end) and no longer than max_length, so
+# everything overlapping [start, end) starts within (start - max_length, end): one
+# bisect into a start-sorted list finds them in O(log n + k), the same bound an
+# interval tree gives, without rebalancing.
+
+
+class IntervalSet:
+
+  def __init__(self, max_length):
+    self.max_length = max_length
+    self.starts = []
+    self.items = []
+
+  def add(self, start, end, item):
+    position = bisect.bisect_right(self.starts, start)
+    self.starts.insert(position, start)
+    self.items.insert(position, (start, end, item))
+
+  def overlapping(self, start, end, exclude=None):
+    low = bisect.bisect_right(self.starts, start - self.max_length)
+    high = bisect.bisect_left(self.starts, end)
+    return [item for item_start, item_end, item in self.items[low:high]
+            if item_end > start and (exclude is None or item != exclude)]
+
+
+class IntervalIndex:
+  # One IntervalSet per key, loaded on first use with loader(key) -> [(start, end,
+  # item)] and dropped again by invalidate(keys) when the underlying rows change.
+  # Private to one process, like the in-memory search index. generation(), if given,
+  # reads a counter that every process bumps when it changes the rows; sync() drops
+  # every set once it has moved on, and advance(generation) records a bump made by
+  # this process's own commit, whose keys it has invalidated already.
+
+  def __init__(self, loader, max_length, generation=None):
+    self.loader = loader
+    self.max_length = max_length
+    self.read_generation = generation
+    self.lock = threading.Lock()
+    self.generation = None
+    self.sets = {}
+
+  def invalidate(self, keys):
+    with self.lock:
+      for key in keys:
+        self.sets.pop(key, None)
+
+  def clear(self):
+    with self.lock:
+      self.generation = None
+      self.sets.clear()
+
+  def sync(self):
+    if self.read_generation is None:
+      return
+    generation = self.read_generation()
+    with self.lock:
+      if generation != self.generation:
+        self.sets.clear()
+        self.generation = generation
+
+  def advance(self, generation):
+    with self.lock:
+      if self.generation is not None and self.generation == generation - 1:
+        self.generation = generation
+
+  def get(self, key):
+    with self.lock:
+      interval_set = self.sets.get(key)
+      generation = self.generation
+    if interval_set is None:
+      interval_set = IntervalSet(self.max_length)
+      for start, end, item in self.loader(key):
+        interval_set.add(start, end, item)
+      with self.lock:
+        # A set loaded before the generation moved may already be out of date.
+        if self.generation == generation:
+          interval_set = self.sets.setdefault(key, interval_set)
+    return interval_set
+
+  def overlapping(self, key, start, end, exclude=None):
+    return self.get(key).overlapping(start, end, exclude)
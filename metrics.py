@@ -0,0 +1,62 @@
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Prometheus metrics for /metrics. Counters are plain prometheus_client values: a
+# per-value lock in a single process, and mmap'd files per worker when
+# PROMETHEUS_MULTIPROC_DIR is set, so gunicorn workers are summed at scrape time. For
+# multi-process serving, point PROMETHEUS_MULTIPROC_DIR at an empty directory before
+# the workers start; gunicorn.conf.py calls mark_process_dead(worker.pid) from the
+# child_exit hook.
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+REQUESTS = Counter('fyyur_http_requests_total', 'HTTP requests handled.',
+                   ['endpoint', 'method', 'status'])
+REQUEST_LATENCY = Histogram('fyyur_http_request_duration_seconds', 'Time spent handling a request.',
+                            ['endpoint', 'method'], buckets=LATENCY_BUCKETS)
+REQUEST_DB_TIME = Histogram('fyyur_http_request_db_seconds', 'Time spent in SQL statements per request.',
+                            ['endpoint'], buckets=LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram('fyyur_http_request_queries', 'SQL statements executed per request.',
+                            ['endpoint'], buckets=(1, 2, 3, 5, 10, 25, 50, 100))
+TEMPLATE_RENDER_TIME = Histogram('fyyur_template_render_seconds', 'Time spent rendering a template.',
+                                 ['template'], buckets=LATENCY_BUCKETS)
+IN_FLIGHT = Gauge('fyyur_http_requests_in_flight', 'Requests currently being handled.',
+                  multiprocess_mode='livesum')
+
+POOL_CHECKED_OUT = Gauge('fyyur_db_pool_checked_out', 'Database connections checked out of the pool.',
+                         multiprocess_mode='livesum')
+POOL_OVERFLOW = Gauge('fyyur_db_pool_overflow', 'Connections opened beyond the pool size.',
+                      multiprocess_mode='livesum')
+POOL_SIZE = Gauge('fyyur_db_pool_size', 'Configured pool size.', multiprocess_mode='livesum')
+
+CACHE_REQUESTS = Counter('fyyur_cache_requests_total', 'Cache lookups by cache and result (hit or miss).',
+                         ['cache', 'result'])
+
+
+def record_cache(name, hit):
+  CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def sample_pool(pool):
+  # Overflow and size are sampled on checkout, when overflow can grow; pools without
+  # overflow (SQLite's) report zero; SingletonThreadPool's size is a plain attribute.
+  # Checked-out connections are counted by events.
+  POOL_OVERFLOW.set(max(pool.overflow(), 0) if hasattr(pool, 'overflow') else 0)
+  POOL_SIZE.set(pool.size() if callable(getattr(pool, 'size', None)) else 0)
+
+
+def mark_process_dead(pid):
+  if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    multiprocess.mark_process_dead(pid)
+
+
+def exposition():
+  # Returns (body, content type) for the current process or, in multi-process mode,
+  # for every worker sharing PROMETHEUS_MULTIPROC_DIR.
+  if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+  return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,34 @@
+"""name generations for the autocomplete indexes
+
+Revision ID: 0b9e5d3f7a21
+Revises: f16a2c8d4e90
+Create Date: 2026-10-19 16:05:41.217093
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b9e5d3f7a21'
+down_revision = 'f16a2c8d4e90'
+branch_labels = None
+depends_on = None
+
+NAME_GENERATIONS = ['venue_names', 'artist_names']
+
+
+def upgrade():
+    table_versions = sa.table('table_versions',
+    sa.column('name', sa.String(length=20)),
+    sa.column('version', sa.Integer()),
+    sa.column('updated_at', sa.DateTime())
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(table_versions, [{'name': name, 'version': 0, 'updated_at': now} for name in NAME_GENERATIONS])
+
+
+def downgrade():
+    op.execute(sa.text("DELETE FROM table_versions WHERE name IN ('venue_names', 'artist_names')"))
@@ -0,0 +1,40 @@
+"""trigram search indexes
+
+Revision ID: 3c1d2a7b9e41
+Revises: 91f5f903fe23
+Create Date: 2026-10-18 10:12:40.118302
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1d2a7b9e41'
+down_revision = '91f5f903fe23'
+branch_labels = None
+depends_on = None
+
+TRIGRAM_INDEXES = [
+    ('ix_venues_name_trgm', 'venues', 'name'),
+    ('ix_venues_city_trgm', 'venues', 'city'),
+    ('ix_venues_state_trgm', 'venues', 'state'),
+    ('ix_artists_name_trgm', 'artists', 'name'),
+    ('ix_artists_city_trgm', 'artists', 'city'),
+    ('ix_artists_state_trgm', 'artists', 'state'),
+    ('ix_venueGenres_name_trgm', 'venueGenres', 'name'),
+    ('ix_artistGenres_name_trgm', 'artistGenres', 'name'),
+]
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    if postgresql:
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, table_name, column_name in TRIGRAM_INDEXES:
+        op.create_index(index_name, table_name, [column_name],
+                        postgresql_using='gin', postgresql_ops={column_name: 'gin_trgm_ops'})
+
+
+def downgrade():
+    for index_name, table_name, column_name in reversed(TRIGRAM_INDEXES):
+        op.drop_index(index_name, table_name=table_name)
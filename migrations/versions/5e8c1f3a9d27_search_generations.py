@@ -0,0 +1,34 @@
+"""search generations for the in-memory search indexes
+
+Revision ID: 5e8c1f3a9d27
+Revises: 0b9e5d3f7a21
+Create Date: 2026-10-20 09:41:12.530618
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8c1f3a9d27'
+down_revision = '0b9e5d3f7a21'
+branch_labels = None
+depends_on = None
+
+SEARCH_GENERATIONS = ['venue_search', 'artist_search']
+
+
+def upgrade():
+    table_versions = sa.table('table_versions',
+    sa.column('name', sa.String(length=20)),
+    sa.column('version', sa.Integer()),
+    sa.column('updated_at', sa.DateTime())
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(table_versions, [{'name': name, 'version': 0, 'updated_at': now} for name in SEARCH_GENERATIONS])
+
+
+def downgrade():
+    op.execute(sa.text("DELETE FROM table_versions WHERE name IN ('venue_search', 'artist_search')"))
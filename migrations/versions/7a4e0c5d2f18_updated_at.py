@@ -0,0 +1,38 @@
+"""updated_at version columns
+
+Revision ID: 7a4e0c5d2f18
+Revises: 3c1d2a7b9e41
+Create Date: 2026-10-18 13:47:05.512980
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4e0c5d2f18'
+down_revision = '3c1d2a7b9e41'
+branch_labels = None
+depends_on = None
+
+TABLES = ['venues', 'artists', 'shows']
+
+
+def upgrade():
+    # Added nullable, backfilled with the migration time (UTC, like the application
+    # default) and then made NOT NULL.
+    for table_name in TABLES:
+        op.add_column(table_name, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(sa.table(table_name, sa.column('updated_at')).update().values(updated_at=datetime.utcnow()))
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        op.create_index(op.f(f'ix_{table_name}_updated_at'), table_name, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table_name in reversed(TABLES):
+        op.drop_index(op.f(f'ix_{table_name}_updated_at'), table_name=table_name)
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,47 @@
+"""show durations and overlap exclusion constraints
+
+Revision ID: a9e27c4d5b13
+Revises: f1c4b7d2e905
+Create Date: 2026-10-18 19:48:31.552906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e27c4d5b13'
+down_revision = 'f1c4b7d2e905'
+branch_labels = None
+depends_on = None
+
+SHOW_FKS = ('venue_id', 'artist_id')
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    op.add_column('shows', sa.Column('duration_minutes', sa.Integer(), server_default='120', nullable=False))
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    if postgresql:
+        op.execute("UPDATE shows SET end_time = start_time + duration_minutes * interval '1 minute'")
+    else:
+        op.execute("UPDATE shows SET end_time = datetime(start_time, '+' || duration_minutes || ' minutes')")
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+
+    if postgresql:
+        # Fails, naming the clashing rows, if existing shows already double-book a
+        # venue or artist; those have to be moved or removed first.
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for show_fk in SHOW_FKS:
+            op.execute(f'ALTER TABLE shows ADD CONSTRAINT shows_{show_fk}_overlap_excl '
+                       f'EXCLUDE USING gist ({show_fk} WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for show_fk in reversed(SHOW_FKS):
+            op.drop_constraint(f'shows_{show_fk}_overlap_excl', 'shows')
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.drop_column('end_time')
+        batch_op.drop_column('duration_minutes')
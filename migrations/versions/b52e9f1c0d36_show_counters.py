@@ -0,0 +1,50 @@
+"""denormalized show counters
+
+Revision ID: b52e9f1c0d36
+Revises: 7a4e0c5d2f18
+Create Date: 2026-10-18 15:21:33.804417
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b52e9f1c0d36'
+down_revision = '7a4e0c5d2f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('shows', sa.Column('counted_upcoming', sa.Boolean(), server_default=sa.false(), nullable=False))
+    for table_name in ('venues', 'artists'):
+        op.add_column(table_name, sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table_name, sa.Column('past_show_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill: classify every show against the migration time, then count.
+    shows = sa.table('shows', sa.column('start_time'), sa.column('counted_upcoming'),
+                     sa.column('venue_id'), sa.column('artist_id'))
+    op.execute(shows.update().values(counted_upcoming=shows.c.start_time > datetime.now()))
+    for table_name, show_fk in (('venues', shows.c.venue_id), ('artists', shows.c.artist_id)):
+        table = sa.table(table_name, sa.column('id'), sa.column('upcoming_show_count'), sa.column('past_show_count'))
+        count = sa.select(sa.func.count()).where(show_fk == table.c.id)
+        op.execute(table.update().values(
+            upcoming_show_count=count.where(shows.c.counted_upcoming == sa.true()).scalar_subquery(),
+            past_show_count=count.where(shows.c.counted_upcoming == sa.false()).scalar_subquery()
+        ))
+
+    op.create_index('ix_shows_counted_upcoming_start_time', 'shows', ['start_time'], unique=False,
+                    postgresql_where=sa.text('counted_upcoming'), sqlite_where=sa.text('counted_upcoming'))
+
+
+def downgrade():
+    op.drop_index('ix_shows_counted_upcoming_start_time', table_name='shows')
+    for table_name in ('artists', 'venues'):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('past_show_count')
+            batch_op.drop_column('upcoming_show_count')
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.drop_column('counted_upcoming')
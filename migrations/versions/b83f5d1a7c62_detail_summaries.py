@@ -0,0 +1,39 @@
+"""precomputed venue and artist page summaries
+
+Revision ID: b83f5d1a7c62
+Revises: e4b7c2a91f58
+Create Date: 2026-10-19 00:21:37.904118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83f5d1a7c62'
+down_revision = 'e4b7c2a91f58'
+branch_labels = None
+depends_on = None
+
+# Summary table, its foreign key, parent table. The tables start empty: pages build
+# their summary on first read, or run `flask summaries rebuild`.
+SUMMARY_TABLES = [
+    ('venue_summaries', 'venue_id', 'venues'),
+    ('artist_summaries', 'artist_id', 'artists'),
+]
+
+
+def upgrade():
+    for table_name, entity_fk, parent_table in SUMMARY_TABLES:
+        op.create_table(table_name,
+        sa.Column(entity_fk, sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint([entity_fk], [f'{parent_table}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(entity_fk)
+        )
+
+
+def downgrade():
+    for table_name, entity_fk, parent_table in reversed(SUMMARY_TABLES):
+        op.drop_table(table_name)
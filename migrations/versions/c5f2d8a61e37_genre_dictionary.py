@@ -0,0 +1,87 @@
+"""genre dictionary with per-genre facet counts
+
+Revision ID: c5f2d8a61e37
+Revises: a9e27c4d5b13
+Create Date: 2026-10-18 21:14:06.302817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f2d8a61e37'
+down_revision = 'a9e27c4d5b13'
+branch_labels = None
+depends_on = None
+
+# Join table, its foreign key to the venue or artist, Genre count column.
+GENRE_TABLES = [
+    ('venueGenres', 'venue_id', 'venue_count'),
+    ('artistGenres', 'artist_id', 'artist_count'),
+]
+
+genres = sa.table('genres', sa.column('id'), sa.column('name'),
+                  sa.column('venue_count'), sa.column('artist_count'))
+
+
+def join_table(table_name, entity_fk):
+    return sa.table(table_name, sa.column(entity_fk), sa.column('name'), sa.column('genre_id'))
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=20), nullable=False),
+    sa.Column('venue_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('artist_count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.execute(genres.insert().from_select(['name'], sa.union(
+        *(sa.select(join_table(table_name, entity_fk).c.name) for table_name, entity_fk, _ in GENRE_TABLES)
+    )))
+
+    for table_name, entity_fk, count_column in GENRE_TABLES:
+        table = join_table(table_name, entity_fk)
+        op.add_column(table_name, sa.Column('genre_id', sa.Integer(), nullable=True))
+        op.execute(table.update().values(
+            genre_id=sa.select(genres.c.id).where(genres.c.name == table.c.name).scalar_subquery()))
+        op.execute(genres.update().values({count_column: sa.select(sa.func.count()).select_from(table)
+                                           .where(table.c.genre_id == genres.c.id).scalar_subquery()}))
+
+        # The name index goes with the name column; the primary key now leads with the
+        # venue or artist, which makes the separate index on it redundant.
+        op.drop_index(f'ix_{table_name}_name_trgm', table_name=table_name)
+        op.drop_index(f'ix_{table_name}_{entity_fk}', table_name=table_name)
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.alter_column('genre_id', existing_type=sa.Integer(), nullable=False)
+            # SQLite's primary key has no name; recreating the table replaces it anyway.
+            if postgresql:
+                batch_op.drop_constraint(f'{table_name}_pkey', type_='primary')
+            batch_op.drop_column('name')
+            batch_op.create_primary_key(f'{table_name}_pkey', [entity_fk, 'genre_id'])
+            batch_op.create_foreign_key(f'{table_name}_genre_id_fkey', 'genres', ['genre_id'], ['id'])
+        op.create_index(f'ix_{table_name}_genre_id_{entity_fk}', table_name, ['genre_id', entity_fk])
+
+
+def downgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for table_name, entity_fk, count_column in reversed(GENRE_TABLES):
+        table = join_table(table_name, entity_fk)
+        op.drop_index(f'ix_{table_name}_genre_id_{entity_fk}', table_name=table_name)
+        op.add_column(table_name, sa.Column('name', sa.String(length=20), nullable=True))
+        op.execute(table.update().values(
+            name=sa.select(genres.c.name).where(genres.c.id == table.c.genre_id).scalar_subquery()))
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_constraint(f'{table_name}_genre_id_fkey', type_='foreignkey')
+            if postgresql:
+                batch_op.drop_constraint(f'{table_name}_pkey', type_='primary')
+            batch_op.drop_column('genre_id')
+            batch_op.alter_column('name', existing_type=sa.String(length=20), nullable=False)
+            batch_op.create_primary_key(f'{table_name}_pkey', ['name', entity_fk])
+        op.create_index(f'ix_{table_name}_{entity_fk}', table_name, [entity_fk])
+        op.create_index(f'ix_{table_name}_name_trgm', table_name, ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.drop_table('genres')
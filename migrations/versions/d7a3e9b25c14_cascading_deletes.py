@@ -0,0 +1,59 @@
+"""cascading foreign keys and soft delete for venues and artists
+
+Revision ID: d7a3e9b25c14
+Revises: c5f2d8a61e37
+Create Date: 2026-10-18 22:03:51.118064
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3e9b25c14'
+down_revision = 'c5f2d8a61e37'
+branch_labels = None
+depends_on = None
+
+# Child table, foreign key column, parent table.
+FOREIGN_KEYS = [
+    ('shows', 'venue_id', 'venues'),
+    ('shows', 'artist_id', 'artists'),
+    ('venueGenres', 'venue_id', 'venues'),
+    ('artistGenres', 'artist_id', 'artists'),
+]
+
+# The initial migration left these constraints unnamed. PostgreSQL named them
+# <table>_<column>_fkey; the same convention lets batch mode find them on SQLite.
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+HIDDEN_TABLES = ['venues', 'artists']
+
+
+def replace_foreign_keys(ondelete):
+    for table_name in dict.fromkeys(table_name for table_name, _, _ in FOREIGN_KEYS):
+        with op.batch_alter_table(table_name, naming_convention=NAMING_CONVENTION) as batch_op:
+            for fk_table, column_name, parent_table in FOREIGN_KEYS:
+                if fk_table == table_name:
+                    name = f'{table_name}_{column_name}_fkey'
+                    batch_op.drop_constraint(name, type_='foreignkey')
+                    batch_op.create_foreign_key(name, parent_table, [column_name], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    replace_foreign_keys('CASCADE')
+    for table_name in HIDDEN_TABLES:
+        op.add_column(table_name, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        op.create_index(f'ix_{table_name}_deleted_at', table_name, ['deleted_at'],
+                        postgresql_where=sa.text('deleted_at IS NOT NULL'),
+                        sqlite_where=sa.text('deleted_at IS NOT NULL'))
+
+
+def downgrade():
+    # Soft-deleted rows would reappear; purge them (`flask purge`) before downgrading.
+    for table_name in reversed(HIDDEN_TABLES):
+        op.drop_index(f'ix_{table_name}_deleted_at', table_name=table_name)
+        # A plain DROP COLUMN (SQLite 3.35+): recreating these tables in batch mode
+        # would trip over their lower(name) expression indexes.
+        op.drop_column(table_name, 'deleted_at')
+    replace_foreign_keys(None)
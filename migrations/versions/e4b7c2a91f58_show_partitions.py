@@ -0,0 +1,136 @@
+"""monthly show partitions on PostgreSQL, show archive elsewhere
+
+Revision ID: e4b7c2a91f58
+Revises: d7a3e9b25c14
+Create Date: 2026-10-18 23:12:40.417295
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c2a91f58'
+down_revision = 'd7a3e9b25c14'
+branch_labels = None
+depends_on = None
+
+SHOW_FKS = ('venue_id', 'artist_id')
+
+# Months after the current one that get a partition up front; `flask shows roll`
+# keeps adding them.
+MONTHS_AHEAD = 3
+
+# Index name, columns, keyword arguments; the same on shows and on its partitions.
+SHOW_INDEXES = [
+    ('ix_shows_venue_id_start_time', ['venue_id', 'start_time'], {}),
+    ('ix_shows_artist_id_start_time', ['artist_id', 'start_time'], {}),
+    ('ix_shows_start_time_id', ['start_time', 'id'], {}),
+    ('ix_shows_updated_at', ['updated_at'], {}),
+    ('ix_shows_counted_upcoming_start_time', ['start_time'], {'postgresql_where': sa.text('counted_upcoming')}),
+]
+
+SHOW_COLUMNS = 'id, start_time, venue_id, artist_id, updated_at, counted_upcoming, duration_minutes, end_time'
+
+
+def show_columns(id_default=None):
+    return [
+        sa.Column('id', sa.Integer(), server_default=id_default, nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=True),
+        sa.Column('artist_id', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('counted_upcoming', sa.Boolean(), server_default=sa.false(), nullable=False),
+        sa.Column('duration_minutes', sa.Integer(), server_default='120', nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ondelete='CASCADE'),
+    ]
+
+
+def month_start(value, months=0):
+    month = value.year * 12 + value.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def add_overlap_exclusions(table_name):
+    for show_fk in SHOW_FKS:
+        op.execute(f'ALTER TABLE {table_name} ADD CONSTRAINT {table_name}_{show_fk}_overlap_excl '
+                   f'EXCLUDE USING gist ({show_fk} WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def recreate_shows(primary_key, **table_kwargs):
+    # Renames shows to shows_old and creates an empty shows in its place, with the same
+    # id sequence. Indexes come back in copy_old_shows, after the rows.
+    op.rename_table('shows', 'shows_old')
+    op.execute('ALTER INDEX shows_pkey RENAME TO shows_old_pkey')
+    for name, columns, kwargs in SHOW_INDEXES:
+        op.drop_index(name, table_name='shows_old')
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY NONE')
+    op.create_table('shows', *show_columns(sa.text("nextval('shows_id_seq')")),
+                    sa.PrimaryKeyConstraint(*primary_key, name='shows_pkey'), **table_kwargs)
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+
+
+def copy_old_shows():
+    op.execute(f'INSERT INTO shows ({SHOW_COLUMNS}) SELECT {SHOW_COLUMNS} FROM shows_old')
+    op.drop_table('shows_old')
+    for name, columns, kwargs in SHOW_INDEXES:
+        op.create_index(name, 'shows', columns, **kwargs)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    op.create_table('shows_archive',
+    *show_columns(),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_shows_archive_venue_id_start_time', 'shows_archive', ['venue_id', 'start_time'])
+    op.create_index('ix_shows_archive_artist_id_start_time', 'shows_archive', ['artist_id', 'start_time'])
+    op.create_index('ix_shows_archive_start_time_id', 'shows_archive', ['start_time', 'id'])
+
+    if dialect == 'sqlite':
+        # AUTOINCREMENT, so ids of archived shows are never handed out again.
+        with op.batch_alter_table('shows', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+    elif dialect == 'postgresql':
+        # The partition key has to be part of the primary key. Everything before this
+        # month goes into one history partition, then one partition per month, and a
+        # default partition for the rest until `flask shows roll` splits it up.
+        for show_fk in SHOW_FKS:
+            op.drop_constraint(f'shows_{show_fk}_overlap_excl', 'shows')
+        recreate_shows(['id', 'start_time'], postgresql_partition_by='RANGE (start_time)')
+        now = datetime.now()
+        partitions = {'shows_history': f"FROM (MINVALUE) TO ('{month_start(now).isoformat()}')"}
+        for months in range(MONTHS_AHEAD + 1):
+            start, end = month_start(now, months), month_start(now, months + 1)
+            partitions[f'shows_{start:%Y_%m}'] = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        for name, bounds in partitions.items():
+            op.execute(f'CREATE TABLE {name} PARTITION OF shows FOR VALUES {bounds}')
+        op.execute('CREATE TABLE shows_default PARTITION OF shows DEFAULT')
+        copy_old_shows()
+        # Partitioned tables can't have exclusion constraints; each partition gets its own,
+        # which only sees its own month. Overlaps across partitions are left to the
+        # application's conflict check (find_show_conflicts in app.py).
+        for name in list(partitions) + ['shows_default']:
+            add_overlap_exclusions(name)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # The partitions and their exclusion constraints go with the old table.
+        recreate_shows(['id'])
+        copy_old_shows()
+        add_overlap_exclusions('shows')
+    elif dialect == 'sqlite':
+        with op.batch_alter_table('shows', recreate='always'):
+            pass
+
+    op.execute(f'INSERT INTO shows ({SHOW_COLUMNS}) SELECT {SHOW_COLUMNS} FROM shows_archive')
+    op.drop_index('ix_shows_archive_start_time_id', table_name='shows_archive')
+    op.drop_index('ix_shows_archive_artist_id_start_time', table_name='shows_archive')
+    op.drop_index('ix_shows_archive_venue_id_start_time', table_name='shows_archive')
+    op.drop_table('shows_archive')
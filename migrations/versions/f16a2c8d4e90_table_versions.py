@@ -0,0 +1,35 @@
+"""per-listing version counters for conditional requests
+
+Revision ID: f16a2c8d4e90
+Revises: b83f5d1a7c62
+Create Date: 2026-10-19 09:42:15.530871
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f16a2c8d4e90'
+down_revision = 'b83f5d1a7c62'
+branch_labels = None
+depends_on = None
+
+LISTING_NAMES = ['venues', 'artists', 'shows']
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('name', sa.String(length=20), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(table_versions, [{'name': name, 'version': 0, 'updated_at': now} for name in LISTING_NAMES])
+
+
+def downgrade():
+    op.drop_table('table_versions')
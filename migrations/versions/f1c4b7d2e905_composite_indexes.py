@@ -0,0 +1,44 @@
+"""composite indexes for show, genre and listing lookups
+
+Revision ID: f1c4b7d2e905
+Revises: e8d3a6b41c70
+Create Date: 2026-10-18 19:05:12.407731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c4b7d2e905'
+down_revision = 'e8d3a6b41c70'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time']),
+    ('ix_shows_start_time_id', 'shows', ['start_time', 'id']),
+    ('ix_venues_city_state', 'venues', ['city', 'state', 'id']),
+    ('ix_venues_lower_name', 'venues', [sa.text('lower(name)')]),
+    ('ix_artists_lower_name', 'artists', [sa.text('lower(name)')]),
+    ('ix_venueGenres_venue_id', 'venueGenres', ['venue_id']),
+    ('ix_artistGenres_artist_id', 'artistGenres', ['artist_id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY keeps the tables writable while the indexes build, but
+    # cannot run inside a transaction. A build that fails part way leaves an INVALID
+    # index behind, so any index of the same name is dropped first and a rerun of the
+    # upgrade starts clean.
+    with op.get_context().autocommit_block():
+        for index_name, table_name, columns in INDEXES:
+            op.drop_index(index_name, table_name=table_name, if_exists=True, postgresql_concurrently=True)
+            op.create_index(index_name, table_name, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for index_name, table_name, columns in reversed(INDEXES):
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
@@ -0,0 +1,65 @@
+import json
+import re
+
+# Query-plan checks for `flask explain`: EXPLAIN a captured statement on PostgreSQL or
+# SQLite and report the tables it reads with a full sequential scan.
+
+SQLITE_SCAN_PATTERN = re.compile(r'^SCAN (?:TABLE )?("?)(\w+)\1(?: AS \w+)?(?: USING (.*?))?(?: LEFT-JOIN)?$')
+
+
+def explain_statement(connection, statement, parameters):
+  if connection.dialect.name == 'postgresql':
+    return connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+  # (id, parent id, detail) rows.
+  return [(row[0], row[1], row[-1]) for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+
+
+def postgresql_seq_scans(plan):
+  if isinstance(plan, str):
+    plan = json.loads(plan)
+  nodes = [entry['Plan'] for entry in plan] if isinstance(plan, list) else [plan]
+  tables = []
+  while nodes:
+    node = nodes.pop()
+    if node.get('Node Type') == 'Seq Scan':
+      tables.append(node['Relation Name'])
+    nodes.extend(node.get('Plans', []))
+  return tables
+
+
+def sqlite_seq_scans(plan, statement):
+  # Any SCAN walks a whole table or index ("SEARCH" is the bounded lookup). SQLite's
+  # plans do not show a LIMIT cutting a walk short, so a scan under a LIMIT passes only
+  # when it walks an index in the order the query wants: no temp B-tree at the same
+  # level of the plan sorting all of its rows first.
+  limited = re.search(r'\bLIMIT\b', statement, re.IGNORECASE)
+  sorted_levels = {parent for node, parent, detail in plan if 'TEMP B-TREE' in detail}
+  tables = []
+  for node, parent, detail in plan:
+    match = SQLITE_SCAN_PATTERN.match(detail.strip())
+    if match is None:
+      continue
+    # A walk in rowid order shows up as a bare SCAN; ORDER BY <table>.id asks for one.
+    ordered = 'INDEX' in (match.group(3) or '') or \
+      (match.group(3) is None and re.search(rf'\bORDER BY "?{match.group(2)}"?\.id\b', statement))
+    if limited and ordered and parent not in sorted_levels:
+      continue
+    tables.append(match.group(2))
+  return tables
+
+
+def seq_scans(connection, plan, statement):
+  if connection.dialect.name == 'postgresql':
+    return postgresql_seq_scans(plan)
+  return sqlite_seq_scans(plan, statement)
+
+
+def table_row_counts(connection, table_names):
+  # Planner estimates on PostgreSQL (cheap on big tables), exact counts elsewhere.
+  if connection.dialect.name == 'postgresql':
+    rows = connection.exec_driver_sql("SELECT relname, reltuples FROM pg_class WHERE relkind IN ('r', 'p')")
+    estimates = {name: int(count) for name, count in rows}
+    return {name: estimates.get(name, 0) for name in table_names}
+  preparer = connection.dialect.identifier_preparer
+  return {name: connection.exec_driver_sql(f'SELECT count(*) FROM {preparer.quote(name)}').scalar()
+          for name in table_names}
@@ -0,0 +1,114 @@
+import contextlib
+import re
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+# Per-request SQL accounting. A QueryStats collects every statement executed while it
+# is active, with its duration, and can point out statement shapes that ran many times
+# in one request - usually a loop issuing one query per row (N+1).
+
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_PATTERN = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)|\bIN\s*\(\s*__\[POSTCOMPILE_\w+\]\s*\)', re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+  # Literals and IN lists are collapsed so that the same query with different
+  # parameters counts as one shape.
+  shape = LITERAL_PATTERN.sub('?', statement)
+  shape = IN_LIST_PATTERN.sub('IN (...)', shape)
+  return WHITESPACE_PATTERN.sub(' ', shape).strip()
+
+
+class QueryStats:
+
+  def __init__(self, clock=time.perf_counter):
+    self.clock = clock
+    self.started = clock()
+    self.statements = []
+
+  def record(self, statement, duration):
+    self.statements.append((statement, duration))
+
+  @property
+  def count(self):
+    return len(self.statements)
+
+  @property
+  def db_time(self):
+    return sum(duration for _, duration in self.statements)
+
+  @property
+  def elapsed(self):
+    return self.clock() - self.started
+
+  def slowest(self, n=5):
+    return sorted(self.statements, key=lambda item: item[1], reverse=True)[:n]
+
+  def repeated(self, threshold=5):
+    # [(shape, times)] for shapes executed at least `threshold` times.
+    shapes = Counter(statement_shape(statement) for statement, _ in self.statements)
+    return [(shape, times) for shape, times in shapes.most_common() if times >= threshold]
+
+  def server_timing(self):
+    return (f'db;dur={self.db_time * 1000:.1f};desc="{self.count} queries", '
+            f'app;dur={self.elapsed * 1000:.1f}')
+
+  def summary(self, slowest=5, threshold=5):
+    return {
+      "queries": self.count,
+      "db_ms": round(self.db_time * 1000, 2),
+      "elapsed_ms": round(self.elapsed * 1000, 2),
+      "slowest": [{"statement": statement, "ms": round(duration * 1000, 2)}
+                  for statement, duration in self.slowest(slowest)],
+      "n_plus_one": [{"statement": shape, "times": times} for shape, times in self.repeated(threshold)],
+    }
+
+
+def instrument(engine, get_stats):
+  # Times every cursor execution on `engine` (an Engine or the Engine class) and hands
+  # it to get_stats(), which returns the active QueryStats or None.
+  @event.listens_for(engine, 'before_cursor_execute')
+  def start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+  @event.listens_for(engine, 'after_cursor_execute')
+  def stop_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start'].pop()
+    stats = get_stats()
+    if stats is not None:
+      stats.record(statement, time.perf_counter() - started)
+
+  @event.listens_for(engine, 'handle_error')
+  def drop_timer(context):
+    starts = context.connection.info.get('query_start') if context.connection is not None else None
+    if starts:
+      starts.pop()
+
+
+@contextlib.contextmanager
+def assert_max_queries(engine, budget, n_plus_one_threshold=None):
+  # Test helper: fails when the block runs more than `budget` statements on `engine`,
+  # or repeats one statement shape n_plus_one_threshold times. Usage from pytest:
+  #
+  #   with assert_max_queries(db.engine, 2):
+  #     client.get('/venues/1')
+  stats = QueryStats()
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    stats.record(statement, 0)
+
+  event.listen(engine, 'after_cursor_execute', record)
+  try:
+    yield stats
+  finally:
+    event.remove(engine, 'after_cursor_execute', record)
+  if stats.count > budget:
+    listing = '\n'.join(f'  {statement}' for statement, _ in stats.statements)
+    raise AssertionError(f'{stats.count} queries executed, budget is {budget}:\n{listing}')
+  if n_plus_one_threshold is not None:
+    repeated = stats.repeated(n_plus_one_threshold)
+    if repeated:
+      raise AssertionError('probable N+1: ' + '; '.join(f'{times}x {shape}' for shape, times in repeated))
@@ -0,0 +1,184 @@
+import heapq
+import re
+import threading
+import time
+
+# In-memory inverted index used for name/city/state/genre search when the database has
+# no trigram support (SQLite in development). Documents are tokenized once; a query
+# token matches any indexed token containing it, found through a trigram -> token map
+# so partial matches do not scan the whole vocabulary. Documents may also carry exact
+# tags (genres) that searches can be restricted to.
+#
+# Each process keeps its own index. Ids invalidated by this process's commits are
+# reloaded by primary key on the next search; changes made by other processes are
+# picked up through a generation counter the index re-reads every few seconds, and
+# answered with a full reload in the background.
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+NAME_WEIGHT = 3
+GENRE_WEIGHT = 2
+LOCATION_WEIGHT = 1
+
+
+def tokenize(text):
+  return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def trigrams(token):
+  return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+
+  def __init__(self, loader, generation=None, recheck_seconds=5, spawn=None):
+    # loader(ids) returns (id, name, [(text, weight), ...], tags) tuples for the given
+    # ids, or for every document when ids is None. generation(), if given, reads a
+    # counter that other processes bump when they change what the index holds; a
+    # changed value is answered by running a full reload through spawn(function).
+    self.loader = loader
+    self.read_generation = generation
+    self.recheck_seconds = recheck_seconds
+    self.spawn = spawn or (lambda function: threading.Thread(target=function, daemon=True).start())
+    self.lock = threading.Lock()
+    self.reload_lock = threading.Lock()
+    self.reloading = False
+    self.loaded = False
+    self.generation = None
+    self.checked_at = 0
+    self.pending = set()
+    self.docs = {}
+    self.postings = {}
+    self.token_trigrams = {}
+    self.tagged = {}
+
+  def invalidate(self, ids):
+    with self.lock:
+      self.pending.update(ids)
+
+  def clear(self):
+    # Forgets everything; the next search reloads the whole index.
+    with self.lock:
+      self.loaded = False
+      self.generation = None
+      self.pending.clear()
+      self.docs, self.postings, self.token_trigrams, self.tagged = {}, {}, {}, {}
+
+  def reload(self):
+    # Builds a fresh index from every document and swaps it in, unless the generation
+    # has not moved since the last load. Searches keep the current documents meanwhile.
+    with self.reload_lock:
+      generation = self.read_generation() if self.read_generation else None
+      if self.loaded and generation == self.generation:
+        return
+      with self.lock:
+        self.pending.clear()
+      fresh = SearchIndex(self.loader)
+      for doc_id, name, fields, tags in self.loader(None):
+        fresh._add(doc_id, name, fields, tags)
+      with self.lock:
+        self.docs, self.postings, self.token_trigrams, self.tagged = \
+          fresh.docs, fresh.postings, fresh.token_trigrams, fresh.tagged
+        self.generation = generation
+        self.checked_at = time.monotonic()
+        self.loaded = True
+
+  def check_generation(self):
+    now = time.monotonic()
+    with self.lock:
+      if self.read_generation is None or self.reloading or now - self.checked_at < self.recheck_seconds:
+        return
+      self.checked_at = now
+    if self.read_generation() != self.generation:
+      self.reloading = True
+      self.spawn(self._reload_in_background)
+
+  def _reload_in_background(self):
+    try:
+      self.reload()
+    finally:
+      self.reloading = False
+
+  def refresh(self):
+    if not self.loaded:
+      self.reload()
+      return
+    self.check_generation()
+    with self.lock:
+      if not self.pending:
+        return
+      ids = set(self.pending)
+      self.pending.clear()
+    documents = list(self.loader(ids))
+    with self.lock:
+      for doc_id in ids:
+        self._remove(doc_id)
+      for doc_id, name, fields, tags in documents:
+        self._add(doc_id, name, fields, tags)
+
+  def _add(self, doc_id, name, fields, tags):
+    weights = {}
+    for text, weight in fields:
+      for token in tokenize(text):
+        weights[token] = max(weights.get(token, 0), weight)
+    self.docs[doc_id] = (name, weights, tuple(tags))
+    for tag in tags:
+      self.tagged.setdefault(tag, set()).add(doc_id)
+    for token, weight in weights.items():
+      if token not in self.postings:
+        self.postings[token] = {}
+        for gram in trigrams(token):
+          self.token_trigrams.setdefault(gram, set()).add(token)
+      self.postings[token][doc_id] = weight
+
+  def _remove(self, doc_id):
+    name, weights, tags = self.docs.pop(doc_id, (None, {}, ()))
+    for tag in tags:
+      self.tagged[tag].discard(doc_id)
+      if not self.tagged[tag]:
+        del self.tagged[tag]
+    for token in weights:
+      postings = self.postings[token]
+      del postings[doc_id]
+      if not postings:
+        del self.postings[token]
+        for gram in trigrams(token):
+          self.token_trigrams[gram].discard(token)
+          if not self.token_trigrams[gram]:
+            del self.token_trigrams[gram]
+
+  def _matching_tokens(self, query_token):
+    grams = trigrams(query_token)
+    if not grams:
+      return [token for token in self.postings if query_token in token]
+    candidates = set.intersection(*(self.token_trigrams.get(gram, set()) for gram in grams))
+    return [token for token in candidates if query_token in token]
+
+  def search(self, term, limit, tags=()):
+    # Returns ([(id, name), ...], total) with the best `limit` matches first. Every query
+    # token has to match somewhere in the document, and the document has to carry every
+    # one of tags; name matches and whole-word or prefix matches rank higher.
+    self.refresh()
+    with self.lock:
+      query_tokens = tokenize(term)
+      if not query_tokens:
+        scores = dict.fromkeys(self.docs, 0)
+      else:
+        scores = None
+        for query_token in query_tokens:
+          token_scores = {}
+          for token in self._matching_tokens(query_token):
+            boost = 2 if token == query_token else 1.5 if token.startswith(query_token) else 1
+            for doc_id, weight in self.postings[token].items():
+              token_scores[doc_id] = max(token_scores.get(doc_id, 0), weight * boost)
+          if scores is None:
+            scores = token_scores
+          else:
+            scores = {doc_id: score + token_scores[doc_id]
+                      for doc_id, score in scores.items() if doc_id in token_scores}
+      if tags:
+        allowed = set.intersection(*(self.tagged.get(tag, set()) for tag in tags))
+        scores = {doc_id: score for doc_id, score in scores.items() if doc_id in allowed}
+      best = heapq.nsmallest(limit, scores,
+                             key=lambda doc_id: (-scores[doc_id], self.docs[doc_id][0].lower(), doc_id))
+      return [(doc_id, self.docs[doc_id][0]) for doc_id in best], len(scores)
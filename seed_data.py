@@ -0,0 +1,141 @@
+import bisect
+import itertools
+import random
+from datetime import datetime, timedelta
+
+from forms import VenueForm
+
+# Deterministic synthetic data for `flask seed`. The same seed, scale and anchor always
+# produce the same rows. Cities, genres and show bookings follow a Zipf-like skew, so a
+# few big cities, genres and venues dominate the way they do on the real site.
+
+# One scale unit is 1k venues, 1k artists and 10k shows; scale 1000 gives 1M/1M/10M.
+SCALE_UNIT = {'venues': 1000, 'artists': 1000, 'shows': 10000}
+
+CITY_SKEW = 1.1
+GENRE_SKEW = 0.9
+BOOKING_SKEW = 0.8
+
+# Shows fall within this many days either side of the anchor, in slots of SLOT_HOURS.
+SHOW_WINDOW_DAYS = 365
+SLOT_HOURS = 3
+SHOW_LENGTHS = (60, 90, 120, 150)
+
+CITIES = [
+  ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'), ('Phoenix', 'AZ'),
+  ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'), ('Dallas', 'TX'), ('San Jose', 'CA'),
+  ('Austin', 'TX'), ('Jacksonville', 'FL'), ('San Francisco', 'CA'), ('Columbus', 'OH'), ('Charlotte', 'NC'),
+  ('Indianapolis', 'IN'), ('Seattle', 'WA'), ('Denver', 'CO'), ('Washington', 'DC'), ('Boston', 'MA'),
+  ('Nashville', 'TN'), ('Detroit', 'MI'), ('Portland', 'OR'), ('Las Vegas', 'NV'), ('Memphis', 'TN'),
+  ('Louisville', 'KY'), ('Baltimore', 'MD'), ('Milwaukee', 'WI'), ('Albuquerque', 'NM'), ('Tucson', 'AZ'),
+  ('Atlanta', 'GA'), ('Miami', 'FL'), ('Minneapolis', 'MN'), ('New Orleans', 'LA'), ('Cleveland', 'OH'),
+]
+
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+
+ADJECTIVES = ['Blue', 'Golden', 'Velvet', 'Electric', 'Silver', 'Crimson', 'Wild', 'Midnight', 'Lucky', 'Hollow',
+              'Broken', 'Neon', 'Rusty', 'Quiet', 'Loud', 'Little', 'Grand', 'Painted', 'Lonesome', 'Burning']
+VENUE_NOUNS = ['Room', 'Hall', 'Lounge', 'Tavern', 'Theatre', 'Club', 'Cellar', 'Garden', 'Ballroom', 'Saloon']
+ARTIST_NOUNS = ['Owls', 'Rivers', 'Engines', 'Sparrows', 'Machines', 'Wolves', 'Saints', 'Ghosts', 'Kings',
+                'Lanterns']
+STREETS = ['Main St', 'Market St', 'Broadway', 'Oak Ave', 'Elm St', 'Mission St', 'Sunset Blvd', 'Pine St']
+
+
+def zipf_cum_weights(n, skew):
+  total, cum_weights = 0.0, []
+  for rank in range(1, n + 1):
+    total += 1 / rank ** skew
+    cum_weights.append(total)
+  return cum_weights
+
+
+class SkewedChoice:
+  # Picks items with Zipf weights after a seeded shuffle, so the popular items are
+  # not simply the first ones.
+
+  def __init__(self, items, skew, rng):
+    self.items = list(items)
+    rng.shuffle(self.items)
+    self.cum_weights = zipf_cum_weights(len(self.items), skew)
+
+  def pick(self, rng):
+    position = bisect.bisect(self.cum_weights, rng.random() * self.cum_weights[-1])
+    return self.items[min(position, len(self.items) - 1)]
+
+
+def scaled_counts(scale):
+  return {kind: max(int(unit * scale), 1) for kind, unit in SCALE_UNIT.items()}
+
+
+def generate_entities(kind, count, seed):
+  # Yields rows with the same keys the import writers take: the form fields plus a
+  # list of genres.
+  rng = random.Random(f'{seed}:{kind}')
+  cities = SkewedChoice(CITIES, CITY_SKEW, rng)
+  genres = SkewedChoice(GENRES, GENRE_SKEW, rng)
+  nouns = VENUE_NOUNS if kind == 'venues' else ARTIST_NOUNS
+  for n in range(count):
+    city, state = cities.pick(rng)
+    name = f'The {rng.choice(ADJECTIVES)} {rng.choice(nouns)}'
+    if n >= len(ADJECTIVES) * len(nouns):
+      name = f'{name} {n}'
+    slug = name.lower().replace(' ', '')
+    row = {
+      'name': name,
+      'city': city,
+      'state': state,
+      'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(0, 9999):04d}',
+      'image_link': None,
+      'facebook_link': f'https://www.facebook.com/{slug}',
+      'website': f'https://www.{slug}.com' if rng.random() < 0.6 else None,
+      'seeking_description': 'Looking for new acts.' if rng.random() < 0.3 else None,
+      'genres': list(dict.fromkeys(genres.pick(rng) for _ in range(rng.randint(1, 3)))),
+    }
+    if kind == 'venues':
+      row['address'] = f'{rng.randint(1, 9999)} {rng.choice(STREETS)}'
+    yield row
+
+
+def generate_shows(count, venue_ids, artist_ids, seed, anchor=None):
+  # Popular venues host most shows and popular artists play most of them. Shows are
+  # laid out slot by slot over SHOW_WINDOW_DAYS either side of the anchor (default:
+  # today), each venue and artist at most once per slot and every show inside its
+  # slot, so the dataset never double-books and only one slot is tracked at a time.
+  rng = random.Random(f'{seed}:shows')
+  anchor = anchor or datetime.combine(datetime.now().date(), datetime.min.time())
+  venues = SkewedChoice(venue_ids, BOOKING_SKEW, rng)
+  artists = SkewedChoice(artist_ids, BOOKING_SKEW, rng)
+  slots = SHOW_WINDOW_DAYS * 2 * 24 // SLOT_HOURS
+  if -(-count // slots) > min(len(venue_ids), len(artist_ids)):
+    raise ValueError(f'{count} shows do not fit {len(venue_ids)} venues and {len(artist_ids)} artists')
+  first_slot = anchor - timedelta(days=SHOW_WINDOW_DAYS)
+  for slot in range(slots):
+    slot_start = first_slot + timedelta(hours=slot * SLOT_HOURS)
+    booked_venues, booked_artists = set(), set()
+    for _ in range(count * (slot + 1) // slots - count * slot // slots):
+      venue_id = pick_unbooked(venues, booked_venues, rng)
+      artist_id = pick_unbooked(artists, booked_artists, rng)
+      offset = rng.choice((0, 30))
+      yield {
+        'venue_id': venue_id,
+        'artist_id': artist_id,
+        'start_time': slot_start + timedelta(minutes=offset),
+        'duration_minutes': rng.choice([length for length in SHOW_LENGTHS if offset + length <= SLOT_HOURS * 60]),
+      }
+
+
+def pick_unbooked(choice, booked, rng):
+  while True:
+    item = choice.pick(rng)
+    if item not in booked:
+      booked.add(item)
+      return item
+
+
+def batched(rows, size):
+  rows = iter(rows)
+  while True:
+    batch = list(itertools.islice(rows, size))
+    if not batch:
+      return
+    yield batch
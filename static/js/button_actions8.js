@@ -16,6 +16,24 @@ if (venueDeleteButton) {
 }
 
 
+const onArtistDelete = function(e) {
+    e.preventDefault();
+    const artistId = e.target.dataset.id;
+    fetch('/artists/' + artistId, {
+        method: 'DELETE',
+    })
+    .then(() => {
+        window.location.href="/";
+    })
+    .catch((error) => error);
+};
+
+const artistDeleteButton = document.getElementById("delete-artist");
+if (artistDeleteButton) {
+    artistDeleteButton.onclick = onArtistDelete;
+}
+
+
 const onArtistEditClick = function(e) {
     e.preventDefault();
     const artistId = e.target.dataset.id;
@@ -49,4 +67,29 @@ const onVenueEditClick = function(e) {
 const venueEditButton = document.getElementById("edit-venue");
 if (venueEditButton) {
     venueEditButton.onclick = onVenueEditClick;
-}
\ No newline at end of file
+}
+
+
+const onAutocompleteInput = function(e) {
+    const input = e.target;
+    const options = document.getElementById(input.getAttribute('list'));
+    if (!input.value.trim() || /^\d+$/.test(input.value)) {
+        return;
+    }
+    fetch(input.dataset.autocomplete + '?q=' + encodeURIComponent(input.value))
+    .then((response) => response.json())
+    .then((body) => {
+        options.innerHTML = '';
+        body.data.forEach((match) => {
+            const option = document.createElement('option');
+            option.value = match.id;
+            option.label = match.name;
+            options.appendChild(option);
+        });
+    })
+    .catch((error) => error);
+};
+
+document.querySelectorAll('input[data-autocomplete]').forEach((input) => {
+    input.oninput = onAutocompleteInput;
+});
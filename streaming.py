@@ -0,0 +1,44 @@
+import itertools
+
+# Listing pages rendered with stream_template. A Listing hands the template its items
+# one at a time as they come off a lazily fetched result, so the first tiles are sent
+# while later rows are still being read and only one batch of rows is held at once.
+# Whatever the template needs after its loop (is there another page, where does it
+# start) is recorded while the items are produced.
+
+
+class Listing:
+
+  def __init__(self, produce):
+    # produce(listing) returns the item iterator and may set the attributes below.
+    self.produce = produce
+    self.has_more = False
+    self.next_cursor = None
+    self.consumed = False
+
+  def __iter__(self):
+    if self.consumed:
+      raise RuntimeError('A listing can only be iterated once.')
+    self.consumed = True
+    return iter(self.produce(self))
+
+
+def take(rows, limit, listing, cursor):
+  # The first limit rows. Statements fetch one row more than they show: if it comes
+  # back there is a next page, starting after cursor(last row shown).
+  previous = None
+  for n, row in enumerate(rows):
+    if n == limit:
+      listing.has_more = True
+      listing.next_cursor = cursor(previous)
+      return
+    previous = row
+    yield row
+
+
+def grouped(rows, key):
+  # (key, first row, iterator over the group's rows) per run of equal keys, without
+  # materializing any group.
+  for value, group in itertools.groupby(rows, key=key):
+    first = next(group)
+    yield value, first, itertools.chain([first], group)
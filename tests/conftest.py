@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.pool import StaticPool
+
+import config
+
+# The app reads its settings at import time: point it at an in-memory SQLite
+# database before anything imports it. The database is shared-cache so that the
+# ASGI app's aiosqlite connections see the same data, and the app holds one
+# connection to it, as it would for a plain sqlite:// URL.
+config.SQLALCHEMY_DATABASE_URI = 'sqlite:///file:fyyur_tests?mode=memory&cache=shared&uri=true'
+config.SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+config.WTF_CSRF_ENABLED = False
+config.DETAIL_CACHE_BACKEND = 'memory'
+
+import app as fyyur
+
+# Flask-SQLAlchemy moves the relative database name under the instance folder; the
+# ASGI app's engine has to open that same name.
+with fyyur.app.app_context():
+  fyyur.app.config['ASYNC_DATABASE_URI'] = fyyur.db.engine.url.set(drivername='sqlite+aiosqlite')
+
+
+def clear_process_state():
+  # Indexes and caches that live next to the database rather than in it.
+  for index in [*fyyur.search_indexes.values(), *fyyur.autocomplete_indexes.values()]:
+    index.clear()
+  fyyur.show_intervals.clear()
+  if fyyur.detail_cache is not None:
+    fyyur.detail_cache.clear()
+
+
+@pytest.fixture
+def app():
+  fyyur.app.config['TESTING'] = True
+  with fyyur.app.app_context():
+    fyyur.db.create_all()
+    yield fyyur.app
+    fyyur.db.session.remove()
+    fyyur.db.drop_all()
+  clear_process_state()
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+  return fyyur.db
+
+
+@pytest.fixture
+def seed(db):
+  # seed(venues, artists, shows) adds that many rows on top of what is there, in two
+  # cities and with shows spread evenly before and after now; returns the new ids.
+  def add(venues, artists, shows):
+    now = datetime.now()
+    venue_rows = [fyyur.Venue(name=f'Venue {i}', city=['San Francisco', 'New York'][i % 2],
+                              state=['CA', 'NY'][i % 2], address=f'{i} Main St', phone='555-0100',
+                              facebook_link='https://www.facebook.com/fyyur') for i in range(venues)]
+    artist_rows = [fyyur.Artist(name=f'Artist {i}', city='San Francisco', state='CA', phone='555-0100')
+                   for i in range(artists)]
+    db.session.add_all(venue_rows + artist_rows)
+    db.session.flush()
+    genre_ids = fyyur.get_genre_ids(['Jazz', 'Folk'])
+    for i, venue in enumerate(venue_rows):
+      db.session.add(fyyur.VenueGenre(genre_id=genre_ids[['Jazz', 'Folk'][i % 2]], venue_id=venue.id))
+    for artist in artist_rows:
+      db.session.add(fyyur.ArtistGenre(genre_id=genre_ids['Jazz'], artist_id=artist.id))
+    for i in range(shows):
+      db.session.add(fyyur.Show(venue_id=venue_rows[i % venues].id, artist_id=artist_rows[i % artists].id,
+                                start_time=now + timedelta(days=i - shows // 2, hours=1)))
+    db.session.commit()
+    return [venue.id for venue in venue_rows], [artist.id for artist in artist_rows]
+  return add
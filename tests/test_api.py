@@ -0,0 +1,88 @@
+import pytest
+
+import app as fyyur
+from query_stats import assert_max_queries
+
+
+def page_through(client, url, **params):
+  ids, cursor = [], None
+  while True:
+    body = client.get(url, query_string=dict(params, **({'after': cursor} if cursor else {}))).get_json()
+    ids += [item['id'] for item in body['data']]
+    cursor = body['next_cursor']
+    if cursor is None:
+      return ids
+
+
+@pytest.mark.parametrize('resource', ['venues', 'artists', 'shows'])
+def test_listings_page_with_cursors(client, seed, resource):
+  seed(7, 7, 7)
+  ids = page_through(client, f'/api/v1/{resource}', limit=3)
+  assert sorted(ids) == list(range(1, 8))
+
+
+def test_shows_page_in_start_time_order(client, db, seed):
+  seed(2, 2, 9)
+  start_times = dict(db.session.query(fyyur.Show.id, fyyur.Show.start_time))
+  ids = page_through(client, '/api/v1/shows', limit=2)
+  assert ids == sorted(start_times, key=lambda id: (start_times[id], id))
+
+
+def test_fields_narrow_the_response(client, seed):
+  seed(2, 0, 0)
+  response = client.get('/api/v1/venues?fields=name,city')
+  assert response.mimetype == 'application/json'
+  assert response.get_json()['data'] == [{'name': 'Venue 0', 'city': 'San Francisco'},
+                                         {'name': 'Venue 1', 'city': 'New York'}]
+  detail = client.get('/api/v1/venues/2?fields=name,upcoming_shows_count').get_json()
+  assert detail == {'data': {'name': 'Venue 1', 'upcoming_shows_count': 0}}
+
+
+def test_expand_embeds_relations_with_one_query_each(client, db, seed):
+  seed(2, 2, 4)
+  venues = client.get('/api/v1/venues?fields=id&expand=genres').get_json()['data']
+  assert venues == [{'id': 1, 'genres': ['Jazz']}, {'id': 2, 'genres': ['Folk']}]
+  with assert_max_queries(db.engine, 3, n_plus_one_threshold=5) as statements:
+    shows = client.get('/api/v1/shows?fields=id&expand=venue,artist').get_json()['data']
+  assert statements.count == 3
+  for show in shows:
+    row = db.session.get(fyyur.Show, show['id'])
+    venue = db.session.get(fyyur.Venue, row.venue_id)
+    assert show['venue'] == {'id': venue.id, 'name': venue.name, 'image_link': venue.image_link}
+    assert show['artist']['id'] == row.artist_id
+    assert set(show) == {'id', 'venue', 'artist'}
+
+
+@pytest.mark.parametrize('url, message', [
+  ('/api/v1/venues?fields=name,password', 'unknown fields: password; expected any of '),
+  ('/api/v1/artists?expand=shows', 'unknown expand: shows; expected any of genres'),
+  ('/api/v1/venues?after=abc', 'after must be an id'),
+  ('/api/v1/shows?after=nonsense', 'after, from and to must be a cursor and dates'),
+  ('/api/v1/shows?from=whenever', 'after, from and to must be a cursor and dates'),
+  ('/api/v1/venues/1?fields=secret', 'unknown fields: secret; expected any of '),
+])
+def test_bad_arguments_are_json_400s(client, seed, url, message):
+  seed(1, 1, 0)
+  response = client.get(url)
+  assert response.status_code == 400
+  assert response.mimetype == 'application/json'
+  error = response.get_json()['error']
+  assert error['status'] == 400
+  assert error['message'].startswith(message)
+
+
+@pytest.mark.parametrize('url, message', [
+  ('/api/v1/venues/99', 'venue 99 not found'),
+  ('/api/v1/artists/99', 'artist 99 not found'),
+])
+def test_missing_entities_are_json_404s(client, url, message):
+  response = client.get(url)
+  assert response.status_code == 404
+  assert response.get_json() == {'error': {'status': 404, 'message': message}}
+
+
+def test_detail_answers_conditional_gets(client, seed):
+  seed(1, 1, 2)
+  response = client.get('/api/v1/artists/1')
+  assert response.get_json()['data']['name'] == 'Artist 0'
+  assert client.get('/api/v1/artists/1', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
@@ -0,0 +1,131 @@
+import re
+from datetime import datetime, timedelta
+
+import app as fyyur
+
+PAST_SHOW_TIMES = re.compile(r'<h6>(.*?)</h6>')
+OLDER_SHOWS = re.compile(r'<a href="([^"]*before=[^"]*)">Older shows</a>')
+
+
+def book_past_shows(db, seed, days):
+  # Shows of venue 1 and artist 1 that started the given numbers of days ago.
+  seed(1, 1, 0)
+  now = datetime.now()
+  for day in days:
+    db.session.add(fyyur.Show(venue_id=1, artist_id=1, start_time=now - timedelta(days=day)))
+  db.session.commit()
+
+
+def roll(app, *args):
+  result = app.test_cli_runner().invoke(args=['shows', 'roll', *args])
+  assert result.exit_code == 0, result.output
+  return result.output
+
+
+def test_roll_moves_old_past_shows_to_the_archive(app, client, db, seed):
+  book_past_shows(db, seed, (60, 45, 40, 10))
+  db.session.add(fyyur.Show(venue_id=1, artist_id=1, start_time=datetime.now() + timedelta(days=5)))
+  db.session.commit()
+  assert roll(app, '--archive-after-days', '30', '--batch-size', '2') == 'Archived 3 shows.\n'
+  assert db.session.query(fyyur.Show).count() == 2
+  assert db.session.query(fyyur.ShowArchive).count() == 3
+  assert roll(app, '--archive-after-days', '30') == 'Archived 0 shows.\n'
+
+  venue = db.session.get(fyyur.Venue, 1)
+  db.session.refresh(venue)
+  assert (venue.upcoming_show_count, venue.past_show_count) == (1, 4)
+  body = client.get('/venues/1').get_data(as_text=True)
+  assert '4 Past Shows' in body and len(PAST_SHOW_TIMES.findall(body)) == 5
+
+
+def test_upcoming_shows_are_never_archived(app, db, seed):
+  # Only shows the counters already moved to past leave the shows table.
+  seed(1, 1, 0)
+  db.session.add(fyyur.Show(venue_id=1, artist_id=1, start_time=datetime.now() - timedelta(days=40)))
+  db.session.commit()
+  db.session.execute(db.update(fyyur.Show).values(counted_upcoming=True))
+  db.session.commit()
+  assert roll(app, '--archive-after-days', '30') == 'Archived 0 shows.\n'
+
+
+def test_reads_across_show_history_include_the_archive(app, client, db, seed):
+  book_past_shows(db, seed, (60, 10))
+  roll(app, '--archive-after-days', '30')
+  archived = db.session.query(fyyur.ShowArchive).one()
+
+  assert len(client.get('/api/v1/shows?limit=10').get_json()['data']) == 2
+  assert client.get('/export/shows.ndjson').get_data(as_text=True).count('\n') == 2
+  assert client.get('/shows').get_data(as_text=True).count('Venue 0') == 2
+  start = archived.start_time + timedelta(minutes=30)
+  assert fyyur.find_show_conflicts(1, 1, start, start + timedelta(hours=1)) == [
+    ('venue', archived.id), ('artist', archived.id)]
+
+
+def test_past_shows_page_newest_first_without_gaps(app, client, db, seed):
+  book_past_shows(db, seed, range(1, 31))
+  roll(app, '--archive-after-days', '20')
+
+  body = client.get('/venues/1').get_data(as_text=True)
+  seen = PAST_SHOW_TIMES.findall(body)
+  assert len(seen) == fyyur.PAST_SHOWS_PER_PAGE
+  link = OLDER_SHOWS.search(body).group(1).replace('&amp;', '&')
+  pages = 0
+  while link:
+    body = client.get(link).get_data(as_text=True)
+    seen += PAST_SHOW_TIMES.findall(body)
+    pages += 1
+    match = OLDER_SHOWS.search(body)
+    link = match and match.group(1).replace('&amp;', '&')
+  assert pages == 2
+  expected = db.session.execute(db.select(fyyur.union_shows(lambda shows: db.select(shows.start_time))))
+  expected = sorted((row.start_time for row in expected), reverse=True)
+  assert seen == [fyyur.format_datetime(value, 'full') for value in expected]
+
+
+def all_past_show_times(client, path):
+  body = client.get(path).get_data(as_text=True)
+  first, seen = body, PAST_SHOW_TIMES.findall(body)
+  match = OLDER_SHOWS.search(body)
+  while match:
+    body = client.get(match.group(1).replace('&amp;', '&')).get_data(as_text=True)
+    seen += PAST_SHOW_TIMES.findall(body)
+    match = OLDER_SHOWS.search(body)
+  return first, seen
+
+
+def test_past_show_count_matches_the_pages(app, client, db, seed):
+  # Thirty past shows of artist 1, some of them archived, and two of artist 2, one
+  # archived, which is then hidden.
+  book_past_shows(db, seed, range(1, 31))
+  seed(0, 1, 0)
+  now = datetime.now()
+  for day in (5, 25):
+    db.session.add(fyyur.Show(venue_id=1, artist_id=2, start_time=now - timedelta(days=day, hours=6)))
+  db.session.commit()
+  roll(app, '--archive-after-days', '20')
+  app.config['SOFT_DELETE'] = True
+  try:
+    client.delete('/artists/2')
+  finally:
+    app.config['SOFT_DELETE'] = False
+  # The count comes from the rows the pages list, not from the show counters.
+  db.session.execute(db.update(fyyur.Venue).values(past_show_count=99))
+  db.session.commit()
+
+  first, seen = all_past_show_times(client, '/venues/1')
+  assert len(seen) == 30 and '30 Past Shows' in first
+  first, seen = all_past_show_times(client, '/artists/1')
+  assert len(seen) == 30 and '30 Past Shows' in first
+
+
+def test_artist_past_shows_page(app, client, db, seed):
+  book_past_shows(db, seed, range(1, 15))
+  body = client.get('/artists/1/past-shows').get_data(as_text=True)
+  assert 'Venue 0' in body and len(PAST_SHOW_TIMES.findall(body)) == fyyur.PAST_SHOWS_PER_PAGE
+  assert OLDER_SHOWS.search(body)
+
+
+def test_past_shows_page_errors(client, db, seed):
+  seed(1, 1, 0)
+  assert client.get('/venues/2/past-shows').status_code == 404
+  assert client.get('/artists/1/past-shows?before=nonsense').status_code == 400
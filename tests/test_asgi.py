@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+import app as fyyur
+import asgi
+
+
+def call(path, query_string='', method='GET', headers=(), body=b''):
+  # One request through the ASGI app: (status, headers, body).
+  scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method, 'scheme': 'http',
+           'path': path, 'raw_path': path.encode(), 'query_string': query_string.encode(), 'root_path': '',
+           'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+           'client': ('127.0.0.1', 50000), 'server': ('localhost', 80)}
+  messages = []
+
+  async def receive():
+    return {'type': 'http.request', 'body': body, 'more_body': False}
+
+  async def send(message):
+    messages.append(message)
+
+  async def run():
+    try:
+      await asgi.application(scope, receive, send)
+    finally:
+      # Pooled aiosqlite connections belong to this event loop.
+      await asgi.engine.dispose()
+
+  asyncio.run(run())
+  start = messages[0]
+  headers = {name.decode('latin1'): value.decode('latin1') for name, value in start['headers']}
+  return start['status'], headers, b''.join(message.get('body', b'') for message in messages[1:])
+
+
+@pytest.mark.parametrize('path, query_string', [
+  ('/venues', 'per_area=1&page=2'),
+  ('/artists', ''),
+  ('/shows', 'limit=2'),
+  ('/venues/1', 'ref=home'),
+  ('/artists/2', ''),
+])
+def test_async_views_match_wsgi(client, seed, path, query_string):
+  seed(3, 3, 6)
+  assert asgi.application.match({'path': path, 'method': 'GET'}) is not None
+  status, headers, body = call(path, query_string)
+  expected = client.get(f'{path}?{query_string}')
+  assert status == 200
+  assert body == expected.get_data()
+  assert headers['etag'] == expected.headers['ETag']
+  assert 'server-timing' in headers
+
+
+def test_missing_entity_is_the_404_page(client, seed):
+  seed(1, 1, 0)
+  status, _, body = call('/artists/99')
+  assert status == 404
+  assert body == client.get('/artists/99').get_data()
+
+
+def test_matching_etag_is_304(seed):
+  seed(2, 2, 4)
+  _, headers, _ = call('/venues/2')
+  status, revalidated, body = call('/venues/2', headers=[('If-None-Match', headers['etag'])])
+  assert (status, body) == (304, b'')
+  assert revalidated['etag'] == headers['etag']
+
+
+def test_search_posts_a_form(seed):
+  seed(3, 3, 0)
+  status, _, body = call('/artists/search', method='POST', body=b'search_term=artist+2',
+                         headers=[('Content-Type', 'application/x-www-form-urlencoded')])
+  assert status == 200
+  assert b'/artists/3' in body
+
+
+def test_other_routes_fall_through_to_flask(client, seed):
+  seed(2, 0, 0)
+  assert asgi.application.match({'path': '/api/v1/venues', 'method': 'GET'}) is None
+  status, headers, body = call('/api/v1/venues', 'fields=name')
+  assert status == 200
+  assert headers['content-type'] == 'application/json'
+  assert body == client.get('/api/v1/venues?fields=name').get_data()
+
+
+def test_streamed_and_posted_fallbacks(client, db, seed):
+  seed(2, 2, 4)
+  status, headers, body = call('/export/shows.csv')
+  assert status == 200 and body == client.get('/export/shows.csv').get_data()
+  # Chunked, so without a Content-Length.
+  status, headers, body = call('/venues/create', method='POST',
+                               headers=[('Content-Type', 'application/x-www-form-urlencoded')],
+                               body=b'name=Via+ASGI&city=Oakland&state=CA&address=1+Main+St&phone=555-0100'
+                                    b'&facebook_link=https%3A%2F%2Fwww.facebook.com%2Ffyyur&genres=Jazz')
+  assert status == 302 and headers['location'].endswith('/')
+  assert db.session.query(fyyur.Venue).filter_by(name='Via ASGI').count() == 1
@@ -0,0 +1,99 @@
+import gzip
+import json
+
+import pytest
+from werkzeug.datastructures import Accept
+
+import app as fyyur
+import assets
+
+STYLESHEET = '/* layout */\n.logo {\n  background: url("../img/logo.png");\n  color: #fff;\n}\n' + '.x { margin: 0 }\n' * 40
+SCRIPT = '// helpers\nfunction hello() {\n    return 1;\n}\n\n' * 20
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+  # Tiny stand-ins for every file the bundles load, plus an image they refer to.
+  for sources in assets.BUNDLES.values():
+    for source in sources:
+      path = tmp_path / source
+      path.parent.mkdir(parents=True, exist_ok=True)
+      path.write_text(STYLESHEET if source.endswith('.css') else SCRIPT)
+  (tmp_path / 'img').mkdir()
+  (tmp_path / 'img' / 'logo.png').write_bytes(b'\x89PNG' + bytes(500))
+  return tmp_path
+
+
+def test_minifiers():
+  assert assets.minify_css('a , b {\n  color : red ;\n}\n/* gone */') == 'a,b{color : red}'
+  assert assets.minify_js('  // comment\n\n  var a = 1;  \n') == 'var a = 1;'
+  assert assets.minify('js/libs/x.min.js', '  kept  // as is\n') == 'kept  // as is'
+
+
+def test_css_urls_are_rebased_to_the_built_location():
+  css = 'a{background:url(../img/a.png)} b{background:url("/abs.png")} c{background:url(data:x)}'
+  assert assets.rebase_css_urls(css, 'css/main.css', 'dist/bundle.css') == \
+    'a{background:url(../img/a.png)} b{background:url("/abs.png")} c{background:url(data:x)}'
+  assert assets.rebase_css_urls('a{src:url(\'fonts/f.woff?v=1#x\')}', 'css/main.css', 'dist/css/main.css') == \
+    "a{src:url('../../css/fonts/f.woff?v=1#x')}"
+
+
+def test_build_fingerprints_and_precompresses(static_folder):
+  manifest = assets.build(str(static_folder))
+  assert manifest == json.loads((static_folder / 'dist' / 'manifest.json').read_text())
+  built_css = manifest['files']['bundle.css']
+  assert built_css.startswith('dist/bundle.') and built_css.endswith('.css')
+  content = (static_folder / built_css).read_bytes()
+  assert built_css == 'dist/' + assets.fingerprinted_name('bundle.css', content)
+  assert b'url("../img/logo.png")' in content
+  assert content.count(b'/* layout */') == 1  # only bootstrap.min.css is left as it is
+  assert gzip.decompress((static_folder / (built_css + '.gz')).read_bytes()) == content
+  assert 'gzip' in manifest['encodings'][built_css]
+  # Images are fingerprinted but not compressed.
+  assert manifest['files']['img/logo.png'] not in manifest['encodings']
+  # Unchanged sources give the same names on a rebuild.
+  assert assets.build(str(static_folder)) == manifest
+
+
+def test_choose_encoding_prefers_brotli():
+  accept = Accept([('gzip', 1), ('br', 1)])
+  assert assets.choose_encoding(accept, ['br', 'gzip']) == 'br'
+  assert assets.choose_encoding(accept, ['gzip']) == 'gzip'
+  assert assets.choose_encoding(Accept([('identity', 1)]), ['br', 'gzip']) is None
+
+
+@pytest.fixture
+def built(app, static_folder, monkeypatch):
+  manifest = assets.build(str(static_folder))
+  monkeypatch.setattr(app, 'static_folder', str(static_folder))
+  monkeypatch.setattr(fyyur, 'asset_manifest', manifest)
+  return manifest
+
+
+def test_pages_link_the_built_files(client, built):
+  body = client.get('/').get_data(as_text=True)
+  assert f'/static/{built["files"]["bundle.css"]}' in body
+  assert f'/static/{built["files"]["body.js"]}' in body
+  assert '/static/css/bootstrap.min.css' not in body
+
+
+def test_built_files_are_served_precompressed_and_immutable(client, built):
+  path = '/static/' + built['files']['bundle.css']
+  response = client.get(path, headers={'Accept-Encoding': 'gzip'})
+  assert response.headers['Content-Encoding'] == 'gzip'
+  assert response.mimetype == 'text/css'
+  assert response.headers['Vary'] == 'Accept-Encoding'
+  assert {'public', 'immutable', 'max-age=31536000'} <= set(response.headers['Cache-Control'].split(', '))
+  plain = client.get(path, headers={'Accept-Encoding': 'identity'})
+  assert 'Content-Encoding' not in plain.headers
+  assert gzip.decompress(response.get_data()) == plain.get_data()
+
+
+def test_pages_load_the_source_files_without_a_build(client):
+  body = client.get('/').get_data(as_text=True)
+  assert '/static/css/bootstrap.min.css' in body
+
+
+def test_benchmark_leaves_static_files_out(app, seed):
+  seed(1, 1, 0)
+  assert not any('/static/' in name for name in fyyur.benchmark_targets(1))
@@ -0,0 +1,101 @@
+import pytest
+
+import app as fyyur
+import autocomplete
+from query_stats import assert_max_queries
+
+NAMES = {1: 'The Blue Room', 2: 'Blue Note', 3: 'Café Ñandú', 4: 'bluegrass-barn', 5: 'Roomful'}
+
+
+def make_index(names):
+  loads = []
+
+  def load(ids):
+    loads.append(ids)
+    return [(entry_id, name) for entry_id, name in names.items() if ids is None or entry_id in ids]
+  return autocomplete.PrefixIndex(load), loads
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+  assert autocomplete.normalize('  Café   Ñandú! ') == 'cafe nandu'
+  assert autocomplete.normalize('bluegrass-barn') == 'bluegrass barn'
+  assert autocomplete.normalize(None) == ''
+
+
+def test_whole_name_matches_come_before_later_words():
+  index, _ = make_index(NAMES)
+  assert index.complete('blu', 10) == [(2, 'Blue Note'), (4, 'bluegrass-barn'), (1, 'The Blue Room')]
+  assert index.complete('ro', 10) == [(5, 'Roomful'), (1, 'The Blue Room')]
+  assert index.complete('blue ro', 10) == [(1, 'The Blue Room')]
+  assert index.complete('CAFE nan', 10) == [(3, 'Café Ñandú')]
+  assert index.complete('blu', 2) == [(2, 'Blue Note'), (4, 'bluegrass-barn')]
+  assert index.complete('  ', 10) == [] and index.complete('zzz', 10) == []
+
+
+def test_invalidated_ids_are_reloaded_alone():
+  names = dict(NAMES)
+  index, loads = make_index(names)
+  index.complete('blu', 10)
+  names[2] = 'Green Note'
+  del names[4]
+  index.invalidate({2, 4})
+  assert index.complete('blu', 10) == [(1, 'The Blue Room')]
+  assert index.complete('gre', 10) == [(2, 'Green Note')]
+  assert loads == [None, {2, 4}]
+
+
+@pytest.mark.parametrize('path, kind', [('/autocomplete/venues', 'Venue'), ('/autocomplete/artists', 'Artist')])
+def test_endpoints_follow_committed_writes(client, db, seed, path, kind):
+  seed(12, 12, 0)
+  data = client.get(path, query_string={'q': kind.lower()}).get_json()['data']
+  assert [match['name'] for match in data] == [f'{kind} {i}' for i in (0, 1, 10, 11, 2, 3, 4, 5, 6, 7)]
+  assert len(client.get(path, query_string={'q': kind, 'limit': 500}).get_json()['data']) == 12
+  assert client.get(path, query_string={'q': kind, 'limit': 0}).get_json()['data'][0]['name'] == f'{kind} 0'
+
+  model = getattr(fyyur, kind)
+  db.session.get(model, 1).name = 'Zebra Lounge'
+  db.session.commit()
+  with assert_max_queries(db.engine, 1):
+    assert client.get(path, query_string={'q': 'lou'}).get_json() == {'data': [{'id': 1, 'name': 'Zebra Lounge'}]}
+  with assert_max_queries(db.engine, 0):
+    assert client.get(path, query_string={'q': 'zeb'}).get_json()['data'] == [{'id': 1, 'name': 'Zebra Lounge'}]
+
+
+def test_deleted_entities_leave_the_index(client, db, seed):
+  seed(2, 0, 0)
+  assert len(client.get('/autocomplete/venues?q=venue').get_json()['data']) == 2
+  assert client.delete('/venues/1').get_json() == {'success': True}
+  assert client.get('/autocomplete/venues?q=venue').get_json()['data'] == [{'id': 2, 'name': 'Venue 1'}]
+
+
+def test_other_processes_changes_reload_the_index(client, db, seed, monkeypatch):
+  seed(2, 0, 0)
+  index = fyyur.autocomplete_indexes[fyyur.Venue]
+  monkeypatch.setattr(index, 'recheck_seconds', 0)
+  monkeypatch.setattr(index, 'spawn', lambda function: function())
+  assert client.get('/autocomplete/venues?q=venue').get_json()['data'][0]['name'] == 'Venue 0'
+
+  # Another process renames the venue: none of this process's commit hooks run.
+  with db.engine.begin() as connection:
+    connection.execute(fyyur.Venue.__table__.update().where(fyyur.Venue.id == 1).values(name='Other Process'))
+  assert client.get('/autocomplete/venues?q=other').get_json()['data'] == []
+
+  with db.engine.begin() as connection:
+    table = fyyur.TableVersion.__table__
+    connection.execute(table.update().where(table.c.name == 'venue_names').values(version=table.c.version + 1))
+  assert client.get('/autocomplete/venues?q=other').get_json()['data'] == [{'id': 1, 'name': 'Other Process'}]
+
+
+def test_name_changes_bump_the_generation(db, seed):
+  def generations():
+    db.session.rollback()
+    return dict(db.session.query(fyyur.TableVersion.name, fyyur.TableVersion.version)
+                .filter(fyyur.TableVersion.name.in_(['venue_names', 'artist_names'])))
+  seed(1, 1, 0)
+  before = generations()
+  db.session.get(fyyur.Venue, 1).city = 'Oakland'
+  db.session.commit()
+  assert generations() == before
+  db.session.get(fyyur.Venue, 1).name = 'Renamed'
+  db.session.commit()
+  assert generations() == dict(before, venue_names=before['venue_names'] + 1)
@@ -0,0 +1,134 @@
+import fnmatch
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as fyyur
+import cache
+
+
+class FakeRedis:
+  # Stand-in for redis.Redis: the calls RedisCache makes, with expiry on a fake clock.
+
+  def __init__(self):
+    self.now = 0
+    self.values = {}
+
+  def get(self, key):
+    value, expires_at = self.values.get(key, (None, None))
+    if expires_at is not None and expires_at <= self.now:
+      del self.values[key]
+      return None
+    return value
+
+  def set(self, key, value, ex=None):
+    self.values[key] = (value.encode(), None if ex is None else self.now + ex)
+
+  def delete(self, *keys):
+    for key in keys:
+      self.values.pop(key, None)
+
+  def scan_iter(self, match='*'):
+    return [key for key in list(self.values) if fnmatch.fnmatch(key, match)]
+
+
+@pytest.fixture
+def redis_cache(monkeypatch):
+  detail_cache = cache.RedisCache(FakeRedis(), ttl=300)
+  monkeypatch.setattr(fyyur, 'detail_cache', detail_cache)
+  return detail_cache
+
+
+def test_lru_cache_evicts_least_recently_used_and_expires():
+  now = [0]
+  detail_cache = cache.LRUCache(max_entries=2, ttl=10, clock=lambda: now[0])
+  detail_cache.set('a', 1)
+  detail_cache.set('b', 2)
+  detail_cache.get('a')
+  detail_cache.set('c', 3)
+  assert (detail_cache.get('a'), detail_cache.get('b'), detail_cache.get('c')) == (1, None, 3)
+  detail_cache.set('c', 3, ttl=2)
+  now[0] = 2
+  assert detail_cache.get('c') is None
+  assert detail_cache.get('a') == 1
+  now[0] = 10
+  assert detail_cache.get('a') is None
+
+
+def test_redis_cache_round_trips_datetimes():
+  detail_cache = cache.RedisCache(FakeRedis())
+  value = {'id': 1, 'upcoming_shows': [{'start_time': datetime(2030, 5, 1, 20, 30)}]}
+  detail_cache.set('venue:1', value)
+  assert detail_cache.get('venue:1') == value
+
+
+def test_redis_cache_expires_and_caps_ttl():
+  client = FakeRedis()
+  detail_cache = cache.RedisCache(client, ttl=60)
+  detail_cache.set('venue:1', {'id': 1}, ttl=3600)
+  detail_cache.set('venue:2', {'id': 2}, ttl=0.5)
+  assert detail_cache.get('venue:2') is None
+  client.now = 59
+  assert detail_cache.get('venue:1') == {'id': 1}
+  client.now = 60
+  assert detail_cache.get('venue:1') is None
+
+
+def test_redis_cache_clear_keeps_other_prefixes():
+  client = FakeRedis()
+  detail_cache = cache.RedisCache(client)
+  detail_cache.set('venue:1', {'id': 1})
+  client.set('other:key', 'kept')
+  detail_cache.clear()
+  assert detail_cache.get('venue:1') is None
+  assert client.get('other:key') == b'kept'
+
+
+def test_detail_pages_read_through_redis_and_edits_invalidate(client, db, seed, redis_cache):
+  seed(2, 2, 4)
+  assert client.get('/venues/1').status_code == 200
+  assert redis_cache.get('venue:1')['name'] == 'Venue 0'
+
+  response = client.post('/venues/1/edit', data={
+    'name': 'The Fillmore', 'city': 'San Francisco', 'state': 'CA', 'address': '1805 Geary Blvd',
+    'phone': '555-0100', 'facebook_link': 'https://www.facebook.com/fyyur', 'genres': ['Jazz'],
+  })
+  assert response.status_code == 302
+  assert redis_cache.get('venue:1') is None
+  assert 'The Fillmore' in client.get('/venues/1').get_data(as_text=True)
+  assert redis_cache.get('venue:1')['name'] == 'The Fillmore'
+
+
+def test_booking_a_show_invalidates_both_pages(client, db, seed, redis_cache):
+  seed(2, 2, 2)
+  client.get('/venues/2')
+  client.get('/artists/2')
+  client.get('/venues/1')
+  assert all(redis_cache.get(key) is not None for key in ('venue:2', 'artist:2', 'venue:1'))
+  db.session.add(fyyur.Show(venue_id=2, artist_id=2, start_time=datetime(2099, 1, 1, 20)))
+  db.session.commit()
+  assert redis_cache.get('venue:2') is None and redis_cache.get('artist:2') is None
+  assert redis_cache.get('venue:1') is not None
+  client.get('/venues/2')
+  assert [show['artist_id'] for show in redis_cache.get('venue:2')['upcoming_shows']][-1] == 2
+
+
+def test_rename_invalidates_counterpart_pages(client, db, seed, redis_cache):
+  seed(2, 2, 4)
+  client.get('/venues/1')
+  client.get('/venues/2')
+  db.session.get(fyyur.Artist, 1).name = 'Renamed'
+  db.session.commit()
+  assert redis_cache.get('venue:1') is None
+  assert redis_cache.get('venue:2') is not None
+  assert 'Renamed' in client.get('/venues/1').get_data(as_text=True)
+
+
+def test_entries_expire_when_the_first_upcoming_show_starts(client, seed, redis_cache):
+  seed(1, 1, 0)
+  soon = datetime.now() + timedelta(seconds=90)
+  fyyur.db.session.add(fyyur.Show(venue_id=1, artist_id=1, start_time=soon))
+  fyyur.db.session.commit()
+  client.get('/venues/1')
+  _, expires_at = redis_cache.client.values['fyyur:detail:venue:1']
+  assert 0 < expires_at <= 90
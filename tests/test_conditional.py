@@ -0,0 +1,122 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as fyyur
+from query_stats import assert_max_queries
+
+PAGES = ['/venues', '/artists', '/shows', '/venues/1', '/artists/1']
+
+
+# Listings check a version row; detail pages hash the page data, which a detail-cache
+# hit already holds.
+@pytest.mark.parametrize('path, queries', [('/venues', 1), ('/artists', 1), ('/shows', 1),
+                                           ('/venues/1', 0), ('/artists/1', 0)])
+def test_matching_etag_is_304_after_at_most_one_query(client, db, seed, path, queries):
+  seed(3, 3, 6)
+  response = client.get(path)
+  assert response.status_code == 200
+  assert response.headers['Cache-Control'] == 'no-cache'
+  with assert_max_queries(db.engine, 1, n_plus_one_threshold=5) as statements:
+    revalidated = client.get(path, headers={'If-None-Match': response.headers['ETag']})
+  assert revalidated.status_code == 304
+  assert revalidated.headers['ETag'] == response.headers['ETag']
+  assert statements.count == queries
+
+
+@pytest.mark.parametrize('path', ['/venues/1', '/artists/1', '/api/v1/venues/1'])
+def test_detail_etag_without_the_cache_is_one_summary_read(client, db, seed, path):
+  seed(3, 3, 6)
+  etag = client.get(path).headers['ETag']
+  fyyur.detail_cache.clear()
+  with assert_max_queries(db.engine, 1) as stats:
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+  assert '_summaries' in stats.statements[0][0]
+
+
+@pytest.mark.parametrize('path', ['/venues', '/artists', '/shows'])
+def test_last_modified_is_honoured(client, seed, path):
+  seed(3, 3, 6)
+  last_modified = client.get(path).headers['Last-Modified']
+  assert client.get(path, headers={'If-Modified-Since': last_modified}).status_code == 304
+
+
+@pytest.mark.parametrize('path', PAGES)
+def test_writes_change_the_etag(client, db, seed, path):
+  seed(3, 3, 6)
+  etag = client.get(path).headers['ETag']
+  db.session.get(fyyur.Venue, 1).name = 'Renamed venue'
+  db.session.get(fyyur.Artist, 1).name = 'Renamed artist'
+  db.session.commit()
+  response = client.get(path, headers={'If-None-Match': etag})
+  assert response.status_code == 200
+  assert response.headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('path', ['/venues', '/shows', '/venues/1'])
+def test_deleting_a_show_changes_the_etag(client, db, seed, path):
+  seed(2, 2, 4)
+  etag = client.get(path).headers['ETag']
+  db.session.delete(db.session.get(fyyur.Show, 1))
+  db.session.commit()
+  assert client.get(path, headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_detail_etag_changes_when_a_show_starts(client, db, seed, monkeypatch):
+  seed(1, 1, 0)
+  start = datetime.now() + timedelta(hours=1)
+  db.session.add(fyyur.Show(venue_id=1, artist_id=1, start_time=start))
+  db.session.commit()
+  etag = client.get('/venues/1').headers['ETag']
+
+  class Clock(type):
+    # Rows loaded from the database are plain datetimes; they must still pass the
+    # app's isinstance(value, datetime) checks.
+    def __instancecheck__(cls, value):
+      return isinstance(value, datetime)
+
+  class Later(datetime, metaclass=Clock):
+    @classmethod
+    def now(cls, tz=None):
+      return start + timedelta(minutes=1)
+  monkeypatch.setattr(fyyur, 'datetime', Later)
+  later = time.monotonic() + 61 * 60
+  monkeypatch.setattr(fyyur.detail_cache, 'clock', lambda: later)
+  assert client.get('/venues/1', headers={'If-None-Match': etag}).status_code == 200
+
+
+def versions(db):
+  db.session.rollback()
+  return dict(db.session.query(fyyur.TableVersion.name, fyyur.TableVersion.version)
+              .filter(fyyur.TableVersion.name.in_(['venues', 'artists', 'shows'])))
+
+
+@pytest.mark.parametrize('path', ['/venues', '/artists', '/shows'])
+def test_listing_versions_are_read_by_primary_key(client, db, seed, path):
+  seed(3, 3, 6)
+  etag = client.get(path).headers['ETag']
+  with assert_max_queries(db.engine, 1) as stats:
+    client.get(path, headers={'If-None-Match': etag})
+  [(statement, _)] = stats.statements
+  assert 'table_versions' in statement and 'shows' not in statement.replace("'shows'", '')
+
+
+def test_listing_versions_follow_orm_and_bulk_writes(app, db, seed, tmp_path):
+  seed(2, 2, 0)
+  before = versions(db)
+  db.session.add(fyyur.Show(venue_id=1, artist_id=2, start_time=datetime.now() + timedelta(days=1)))
+  db.session.commit()
+  after = versions(db)
+  assert {name: after[name] - before[name] for name in after} == {'venues': 1, 'artists': 1, 'shows': 1}
+
+  db.session.get(fyyur.Artist, 1).name = 'Not committed'
+  db.session.flush()
+  assert versions(db) == after
+
+  source = tmp_path / 'venues.jsonl'
+  source.write_text('{"name": "Imported", "city": "San Francisco", "state": "CA", "address": "1 Main St", '
+                    '"phone": "555-0100", "facebook_link": "https://www.facebook.com/fyyur", "genres": ["Jazz"]}\n')
+  assert app.test_cli_runner().invoke(args=['import', 'venues', str(source)]).exit_code == 0
+  imported = versions(db)
+  assert {name: imported[name] - after[name] for name in imported} == {'venues': 1, 'artists': 0, 'shows': 0}
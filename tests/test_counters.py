@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import app as fyyur
+
+
+def counters(db, model, entity_id):
+  entity = db.session.get(model, entity_id)
+  db.session.refresh(entity)
+  return entity.upcoming_show_count, entity.past_show_count
+
+
+def test_booking_moving_and_deleting_shows_keep_counters(db, seed):
+  seed(2, 2, 4)
+  assert counters(db, fyyur.Venue, 1) == (1, 1)
+  assert counters(db, fyyur.Artist, 2) == (1, 1)
+
+  show = fyyur.Show(venue_id=1, artist_id=2, start_time=datetime.now() + timedelta(days=30))
+  db.session.add(show)
+  db.session.commit()
+  assert counters(db, fyyur.Venue, 1) == (2, 1)
+
+  show = db.session.get(fyyur.Show, show.id)
+  show.venue_id = 2
+  show.start_time = datetime.now() - timedelta(days=30)
+  db.session.commit()
+  assert counters(db, fyyur.Venue, 1) == (1, 1)
+  assert counters(db, fyyur.Venue, 2) == (1, 2)
+
+  db.session.delete(show)
+  db.session.commit()
+  assert counters(db, fyyur.Venue, 2) == (1, 1)
+  assert counters(db, fyyur.Artist, 2) == (1, 1)
+  assert fyyur.reconcile_show_counters() == []
+
+
+def test_rollover_moves_started_shows_to_past(db, seed):
+  seed(1, 1, 4)
+  assert counters(db, fyyur.Venue, 1) == (2, 2)
+  moved = fyyur.rollover_show_counters(now=datetime.now() + timedelta(hours=2), batch_size=1)
+  assert moved == 1
+  assert counters(db, fyyur.Venue, 1) == (1, 3)
+  assert counters(db, fyyur.Artist, 1) == (1, 3)
+
+
+def test_reconcile_reports_and_fixes_drift(app, db, seed):
+  seed(2, 1, 4)
+  db.session.execute(fyyur.Venue.__table__.update().where(fyyur.Venue.id == 1).values(upcoming_show_count=9))
+  db.session.commit()
+  result = app.test_cli_runner().invoke(args=['counters', 'reconcile'])
+  assert result.exit_code == 1
+  assert 'venues 1: stored upcoming/past (9, 1), actual (1, 1)' in result.output
+  result = app.test_cli_runner().invoke(args=['counters', 'reconcile', '--fix'])
+  assert result.exit_code == 0
+  assert fyyur.reconcile_show_counters() == []
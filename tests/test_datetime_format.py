@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+import babel.dates
+import pytest
+
+import app as fyyur
+
+VALUES = [datetime(2030, 1, 1, 0, 0), datetime(2030, 6, 15, 12, 30), datetime(2031, 12, 31, 23, 59, 59, 999)]
+
+
+@pytest.mark.parametrize('format', ['full', 'medium'])
+@pytest.mark.parametrize('value', VALUES)
+def test_output_matches_the_string_round_trip(value, format):
+  expected = babel.dates.format_datetime(value, fyyur.DATETIME_FORMATS[format])
+  assert fyyur.format_datetime(value, format) == expected
+  assert fyyur.format_datetime(str(value), format) == expected
+
+
+def test_named_babel_formats_and_locales_pass_through():
+  value = VALUES[1]
+  assert fyyur.format_datetime(value, 'short') == babel.dates.format_datetime(value, 'short')
+  assert fyyur.format_datetime(value, 'full', locale='de_DE') == \
+    babel.dates.format_datetime(value, fyyur.DATETIME_FORMATS['full'], locale='de_DE')
+
+
+def test_repeated_values_are_memoized():
+  fyyur.format_datetime_cached.cache_clear()
+  for _ in range(3):
+    fyyur.format_datetime(VALUES[0], 'full')
+  assert fyyur.format_datetime_cached.cache_info().hits == 2
+
+
+def test_pages_show_formatted_start_times(client, db, seed):
+  seed(1, 1, 2)
+  start_time = db.session.get(fyyur.Show, 2).start_time
+  body = client.get('/venues/1').get_data(as_text=True)
+  assert babel.dates.format_datetime(start_time, fyyur.DATETIME_FORMATS['full']) in body
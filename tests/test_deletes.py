@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as fyyur
+
+
+@pytest.fixture
+def soft_delete(app):
+  app.config['SOFT_DELETE'] = True
+  yield
+  app.config['SOFT_DELETE'] = False
+
+
+def book_both_artists(db, seed):
+  # Venue 1 hosts a past and an upcoming show of artist 1 and an upcoming show of
+  # artist 2; artist 2 also plays venue 2.
+  seed(2, 2, 0)
+  now = datetime.now()
+  for venue_id, artist_id, days in ((1, 1, -3), (1, 1, 3), (1, 2, 4), (2, 2, 5)):
+    db.session.add(fyyur.Show(venue_id=venue_id, artist_id=artist_id, start_time=now + timedelta(days=days)))
+  db.session.commit()
+
+
+def counters(db, model, entity_id):
+  entity = db.session.get(model, entity_id)
+  db.session.refresh(entity)
+  return entity.upcoming_show_count, entity.past_show_count
+
+
+def test_delete_cascades_and_releases_counters(client, db, seed):
+  book_both_artists(db, seed)
+  assert 'Venue 0' in client.get('/artists/2').get_data(as_text=True)  # cached from here on
+  assert client.delete('/venues/1').get_json() == {'success': True}
+  assert db.session.get(fyyur.Venue, 1) is None
+  assert db.session.query(fyyur.Show).filter_by(venue_id=1).count() == 0
+  assert db.session.query(fyyur.VenueGenre).filter_by(venue_id=1).count() == 0
+  assert counters(db, fyyur.Artist, 1) == (0, 0)
+  assert counters(db, fyyur.Artist, 2) == (1, 0)
+  assert dict(db.session.execute(fyyur.genre_facets_statement(fyyur.Venue)).all()) == {'Folk': 1}
+  assert 'Venue 0' not in client.get('/artists/2').get_data(as_text=True)
+  start = datetime.now() + timedelta(days=4)
+  assert fyyur.find_show_conflicts(2, 2, start, start + timedelta(hours=1)) == []
+
+
+def test_artists_can_be_deleted_too(client, db, seed):
+  book_both_artists(db, seed)
+  assert client.delete('/artists/2').get_json() == {'success': True}
+  assert db.session.query(fyyur.Show).count() == 2
+  assert counters(db, fyyur.Venue, 1) == (1, 1)
+  assert counters(db, fyyur.Venue, 2) == (0, 0)
+
+
+def test_deleting_a_missing_entity_is_a_404(client, seed):
+  seed(1, 1, 0)
+  assert client.delete('/venues/9').status_code == 404
+  assert client.delete('/artists/9').status_code == 404
+
+
+def test_soft_deleted_entities_disappear_at_once(client, db, seed, soft_delete):
+  book_both_artists(db, seed)
+  assert client.delete('/artists/2').get_json() == {'success': True}
+  assert db.session.get(fyyur.Artist, 2).deleted_at is not None
+  assert client.delete('/artists/2').status_code == 404
+  assert client.get('/artists/2').status_code == 404
+  assert client.get('/api/v1/artists/2').status_code == 404
+  assert 'href="/artists/2"' not in client.get('/artists').get_data(as_text=True)
+  assert 'href="/artists/2"' not in client.post('/artists/search', data={'search_term': 'artist'}).get_data(as_text=True)
+  assert [item['id'] for item in client.get('/api/v1/artists?fields=id').get_json()['data']] == [1]
+  assert {show['artist_id'] for show in client.get('/api/v1/shows').get_json()['data']} == {1}
+  assert 'Artist 1' not in client.get('/venues/1').get_data(as_text=True)
+
+
+def test_purge_removes_hidden_rows_in_batches(app, db, seed, soft_delete):
+  book_both_artists(db, seed)
+  with app.test_client() as client:
+    client.delete('/artists/2')
+  result = app.test_cli_runner().invoke(args=['purge', '--batch-size', '1'])
+  assert result.exit_code == 0, result.output
+  assert 'artists: purged 1 with 2 shows.' in result.output
+  assert db.session.get(fyyur.Artist, 2) is None
+  assert db.session.query(fyyur.Show).filter_by(artist_id=2).count() == 0
+  assert counters(db, fyyur.Venue, 1) == (1, 1)
+  assert counters(db, fyyur.Venue, 2) == (0, 0)
+  assert dict(db.session.execute(fyyur.genre_facets_statement(fyyur.Artist)).all()) == {'Jazz': 1}
+
+
+def test_shows_cannot_be_booked_against_hidden_entities(app, client, db, seed, soft_delete, tmp_path):
+  seed(2, 2, 0)
+  client.delete('/venues/2')
+  start = (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d %H:%M:%S')
+  response = client.post('/shows/create', data={'venue_id': 2, 'artist_id': 1, 'start_time': start})
+  assert response.headers['Location'].endswith('/shows/create')
+  with client.session_transaction() as session:
+    assert [message for _, message in session.pop('_flashes', [])][-1:] == [
+      'Show could not be listed: there is no venue with that ID.']
+  client.post('/shows/create', data={'venue_id': 9, 'artist_id': 9, 'start_time': start})
+  with client.session_transaction() as session:
+    assert [message for _, message in session.pop('_flashes', [])] == [
+      'Show could not be listed: there is no venue or artist with that ID.']
+
+  source = tmp_path / 'shows.csv'
+  source.write_text(f'venue_id,venue,artist_id,artist,start_time\n2,,1,,{start}\n,Venue 1,1,,{start}\n')
+  result = app.test_cli_runner().invoke(args=['import', 'shows', str(source)])
+  assert result.exit_code == 0, result.output
+  assert db.session.query(fyyur.Show).count() == 0
+
+
+def test_soft_deletes_release_the_counterparts_show_counters(app, client, db, seed, soft_delete):
+  book_both_artists(db, seed)
+  assert '2 Upcoming Shows' in client.get('/venues/1').get_data(as_text=True)
+  client.delete('/artists/2')
+  assert counters(db, fyyur.Venue, 1) == (1, 1)
+  assert counters(db, fyyur.Venue, 2) == (0, 0)
+  assert '1 Upcoming Show<' in client.get('/venues/1').get_data(as_text=True)
+  assert fyyur.search_entities(fyyur.Venue, fyyur.VenueGenre, fyyur.VenueGenre.venue_id, 'venue')['data'] == [
+    {'id': 1, 'name': 'Venue 0', 'num_upcoming_shows': 1}, {'id': 2, 'name': 'Venue 1', 'num_upcoming_shows': 0}]
+  assert client.get('/api/v1/venues/2?fields=upcoming_shows_count').get_json() == {'data': {'upcoming_shows_count': 0}}
+
+  # Shows already released with the artist are not released again with the venue.
+  client.delete('/venues/1')
+  assert counters(db, fyyur.Artist, 1) == (0, 0)
+  assert counters(db, fyyur.Artist, 2) == (0, 0)
+  assert fyyur.reconcile_show_counters() == []
+  # Every remaining show has a hidden side, so none is counted or rolled over.
+  assert fyyur.rollover_show_counters(datetime.now() + timedelta(days=30)) == 0
+  assert fyyur.reconcile_show_counters() == []
+  app.test_cli_runner().invoke(args=['purge'])
+  assert counters(db, fyyur.Venue, 2) == (0, 0)
+  assert fyyur.reconcile_show_counters() == []
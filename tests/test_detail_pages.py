@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as fyyur
+from query_stats import assert_max_queries
+
+# A venue or artist page is built from its summary row. Building one is a fixed set of
+# statements (lock the row, load the entity with its genres, then its past and
+# upcoming shows with their counterparts' names and images, count its past shows when
+# there is more than a page of them, then store it) however many shows there are; a
+# fresh summary is one primary-key read, and a detail cache hit is none.
+
+BUILD_BUDGET = 8
+
+
+@pytest.fixture(autouse=True)
+def cold_detail_cache():
+  fyyur.detail_cache.clear()
+
+
+@pytest.mark.parametrize('path', ['/venues/1', '/artists/1'])
+def test_detail_page_query_count_does_not_grow_with_shows(client, db, seed, path):
+  seed(2, 2, 4)
+  with assert_max_queries(db.engine, BUILD_BUDGET, n_plus_one_threshold=3):
+    assert client.get(path).status_code == 200
+
+  # Venue 1 and artist 1 now have over 200 shows, half of them past.
+  seed(1, 1, 0)
+  now = datetime.now()
+  for venue_id, artist_id in ((1, 1), (1, 3), (3, 1)):
+    for day in range(-35, 35):
+      db.session.add(fyyur.Show(venue_id=venue_id, artist_id=artist_id,
+                                start_time=now + timedelta(days=day, hours=venue_id * 3 + artist_id)))
+  db.session.commit()
+  fyyur.detail_cache.clear()
+  with assert_max_queries(db.engine, BUILD_BUDGET, n_plus_one_threshold=3):
+    response = client.get(path)
+  assert response.status_code == 200
+  assert response.get_data(as_text=True).count('Artist ' if path.startswith('/venues') else 'Venue ') >= 100
+
+
+@pytest.mark.parametrize('path', ['/venues/1', '/artists/1'])
+def test_fresh_summary_and_cache_hit(client, db, seed, path):
+  seed(2, 2, 4)
+  client.get(path)
+  with assert_max_queries(db.engine, 0):
+    assert client.get(path).status_code == 200
+  fyyur.detail_cache.clear()
+  with assert_max_queries(db.engine, 1):
+    assert client.get(path).status_code == 200
+
+
+@pytest.mark.parametrize('path', ['/venues/99', '/artists/99'])
+def test_missing_entity_is_404_without_writes(client, db, path):
+  with assert_max_queries(db.engine, 2) as stats:
+    assert client.get(path).status_code == 404
+  assert all(statement.lstrip().upper().startswith('SELECT') for statement, _ in stats.statements)
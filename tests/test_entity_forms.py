@@ -0,0 +1,97 @@
+import contextlib
+
+import pytest
+from sqlalchemy import event
+
+import app as fyyur
+from query_stats import assert_max_queries
+
+VENUE_FORM = {'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St', 'phone': '555-0100',
+              'facebook_link': 'https://www.facebook.com/fyyur'}
+ARTIST_FORM = {'city': 'San Francisco', 'state': 'CA', 'phone': '555-0100'}
+
+
+@contextlib.contextmanager
+def count_commits(engine):
+  commits = []
+  listener = lambda conn: commits.append(conn)
+  event.listen(engine, 'commit', listener)
+  try:
+    yield commits
+  finally:
+    event.remove(engine, 'commit', listener)
+
+
+def genres_of(db, model, entity_id):
+  genre_model, genre_fk = fyyur.GENRE_LINKS[model][:2]
+  return sorted(name for name, in db.session.query(fyyur.Genre.name).join(genre_model).filter(genre_fk == entity_id))
+
+
+def test_create_saves_the_entity_and_its_genres_in_one_commit(client, db):
+  with count_commits(db.engine) as commits:
+    client.post('/venues/create', data=dict(VENUE_FORM, name='The Fillmore', genres=['Jazz', 'Folk']))
+  assert len(commits) == 1
+  assert genres_of(db, fyyur.Venue, 1) == ['Folk', 'Jazz']
+
+
+def test_edit_adds_and_removes_genres_in_one_commit(client, db, seed):
+  seed(1, 1, 0)
+  client.post('/venues/1/edit', data=dict(VENUE_FORM, name='Venue 0', genres=['Jazz', 'Blues', 'Soul']))
+  with count_commits(db.engine) as commits, assert_max_queries(db.engine, 20) as stats:
+    response = client.post('/venues/1/edit', data=dict(VENUE_FORM, name='Venue 0', genres=['Jazz', 'Folk']))
+  assert response.status_code == 302
+  assert len(commits) == 1
+  assert genres_of(db, fyyur.Venue, 1) == ['Folk', 'Jazz']
+  # Jazz is kept as it is; only Blues and Soul go and Folk comes in.
+  changes = [statement.split()[0] for statement, _ in stats.statements
+             if 'venueGenres' in statement and statement.startswith(('INSERT', 'DELETE'))]
+  assert changes == ['DELETE', 'INSERT']
+  assert dict(db.session.execute(fyyur.genre_facets_statement(fyyur.Venue)).all()) == {'Jazz': 1, 'Folk': 1}
+
+
+def test_edit_without_genres_keeps_them(client, db, seed):
+  seed(1, 1, 0)
+  client.post('/venues/1/edit', data=dict(VENUE_FORM, name='Renamed'))
+  assert db.session.get(fyyur.Venue, 1).name == 'Renamed'
+  assert genres_of(db, fyyur.Venue, 1) == ['Jazz']
+
+
+def test_artist_edit_touches_only_that_artists_genres(client, db, seed):
+  seed(0, 3, 0)
+  client.post('/artists/2/edit', data=dict(ARTIST_FORM, name='Artist 1', genres=['Folk']))
+  assert [genres_of(db, fyyur.Artist, artist_id) for artist_id in (1, 2, 3)] == [['Jazz'], ['Folk'], ['Jazz']]
+  assert dict(db.session.execute(fyyur.genre_facets_statement(fyyur.Artist)).all()) == {'Jazz': 2, 'Folk': 1}
+
+
+def test_genre_edits_reach_search_and_detail_pages(client, seed):
+  seed(1, 1, 0)
+  assert 'Soul' not in client.get('/artists/1').get_data(as_text=True)
+  assert client.post('/artists/search', data={'search_term': 'soul'}).get_data(as_text=True).count('href="/artists/1"') == 0
+  client.post('/artists/1/edit', data=dict(ARTIST_FORM, name='Artist 0', genres=['Soul']))
+  assert 'Soul' in client.get('/artists/1').get_data(as_text=True)
+  assert 'href="/artists/1"' in client.post('/artists/search', data={'search_term': 'soul'}).get_data(as_text=True)
+
+
+@pytest.mark.parametrize('path, form, model', [('/venues/99/edit', VENUE_FORM, fyyur.Venue),
+                                               ('/artists/99/edit', ARTIST_FORM, fyyur.Artist)])
+def test_editing_a_missing_entity_is_404_and_creates_nothing(client, db, seed, path, form, model):
+  seed(1, 1, 0)
+  assert client.get(path).status_code == 404
+  with count_commits(db.engine) as commits:
+    assert client.post(path, data=dict(form, name='Ghost', genres=['Jazz'])).status_code == 404
+  assert commits == []
+  assert db.session.query(model).count() == 1
+
+
+@pytest.mark.parametrize('kind, form', [('venue', VENUE_FORM), ('artist', ARTIST_FORM)])
+def test_editing_a_soft_deleted_entity_is_404(app, client, db, seed, kind, form):
+  seed(1, 1, 0)
+  app.config['SOFT_DELETE'] = True
+  try:
+    assert client.delete(f'/{kind}s/1').get_json() == {'success': True}
+  finally:
+    app.config['SOFT_DELETE'] = False
+  assert client.get(f'/{kind}s/1/edit').status_code == 404
+  assert client.post(f'/{kind}s/1/edit', data=dict(form, name='Back Again')).status_code == 404
+  entity = db.session.get(getattr(fyyur, kind.capitalize()), 1)
+  assert entity.name == f'{kind.capitalize()} 0' and entity.deleted_at is not None
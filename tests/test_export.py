@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as fyyur
+import export
+
+
+def parse(fmt, text):
+  if fmt == 'ndjson':
+    return [json.loads(line) for line in text.splitlines()]
+  return list(csv.DictReader(io.StringIO(text)))
+
+
+@pytest.mark.parametrize('fmt', sorted(export.FORMATS))
+@pytest.mark.parametrize('entity', fyyur.EXPORT_ENTITIES)
+def test_route_streams_every_row(client, seed, monkeypatch, entity, fmt):
+  seed(4, 3, 10)
+  monkeypatch.setattr(export, 'CHUNK_SIZE', 100)  # forces several chunks
+  response = client.get(f'/export/{entity}.{fmt}')
+  assert response.status_code == 200
+  assert response.is_streamed
+  assert response.mimetype == export.FORMATS[fmt][1]
+  assert response.headers['Content-Disposition'] == f'attachment; filename={entity}.{fmt}'
+  rows = parse(fmt, response.get_data(as_text=True))
+  assert len(rows) == {'venues': 4, 'artists': 3, 'genres': 7, 'shows': 10}[entity]
+  if entity != 'genres':
+    assert [int(row['id']) for row in rows] == list(range(1, len(rows) + 1))
+    assert 'counted_upcoming' not in rows[0]
+
+
+def test_shows_serialize_datetimes_as_iso(client, db, seed):
+  seed(1, 1, 1)
+  start_time = db.session.get(fyyur.Show, 1).start_time
+  for fmt in export.FORMATS:
+    [row] = parse(fmt, client.get(f'/export/shows.{fmt}').get_data(as_text=True))
+    assert row['start_time'] == start_time.isoformat()
+
+
+def test_since_limits_rows_and_genres_follow_their_parent(client, db, seed):
+  seed(3, 1, 0)
+  cutoff = datetime.utcnow() + timedelta(hours=1)
+  db.session.get(fyyur.Venue, 2).updated_at = cutoff
+  db.session.commit()
+  since = cutoff.isoformat()
+  venues = parse('ndjson', client.get('/export/venues.ndjson', query_string={'since': since}).get_data(as_text=True))
+  assert [row['id'] for row in venues] == [2]
+  genres = parse('ndjson', client.get('/export/genres.ndjson', query_string={'since': since}).get_data(as_text=True))
+  assert [(row['kind'], row['entity_id']) for row in genres] == [('venue', 2)]
+
+
+def test_bad_requests(client):
+  assert client.get('/export/users.csv').status_code == 404
+  assert client.get('/export/venues.xml').status_code == 404
+  assert client.get('/export/venues.csv?since=soon').status_code == 400
+
+
+@pytest.mark.parametrize('fmt', sorted(export.FORMATS))
+def test_command_writes_the_same_rows_as_the_route(app, client, seed, tmp_path, fmt):
+  seed(2, 2, 4)
+  output = tmp_path / f'artists.{fmt}'
+  result = app.test_cli_runner().invoke(args=['export', 'artists', '--format', fmt, '--output', str(output)])
+  assert result.exit_code == 0, result.output
+  assert output.read_bytes() == client.get(f'/export/artists.{fmt}').get_data()
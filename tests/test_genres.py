@@ -0,0 +1,100 @@
+import re
+
+import pytest
+
+import app as fyyur
+
+VENUE_FORM = {'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St', 'phone': '555-0100',
+              'facebook_link': 'https://www.facebook.com/fyyur'}
+
+
+def stored_facets(db, model):
+  return dict(db.session.execute(fyyur.genre_facets_statement(model)).all())
+
+
+def counted_facets(db, model):
+  # The same counts, straight from the join table, for visible entities.
+  genre_model, genre_fk = fyyur.GENRE_LINKS[model][:2]
+  rows = db.session.query(fyyur.Genre.name, db.func.count()).join(genre_model, genre_model.genre_id == fyyur.Genre.id) \
+    .join(model, model.id == genre_fk).filter(model.deleted_at.is_(None)).group_by(fyyur.Genre.name)
+  return dict(rows.all())
+
+
+def assert_facets_match(db):
+  db.session.expire_all()
+  for model in (fyyur.Venue, fyyur.Artist):
+    assert stored_facets(db, model) == counted_facets(db, model)
+
+
+def test_facet_counts_follow_creates_edits_and_deletes(client, db, seed):
+  seed(2, 2, 0)
+  assert stored_facets(db, fyyur.Venue) == {'Jazz': 1, 'Folk': 1}
+
+  client.post('/venues/create', data=dict(VENUE_FORM, name='New Venue', genres=['Jazz', 'Blues']))
+  assert stored_facets(db, fyyur.Venue) == {'Jazz': 2, 'Folk': 1, 'Blues': 1}
+  assert_facets_match(db)
+
+  client.post('/venues/3/edit', data=dict(VENUE_FORM, name='New Venue', genres=['Blues', 'Folk']))
+  assert stored_facets(db, fyyur.Venue) == {'Jazz': 1, 'Folk': 2, 'Blues': 1}
+  assert_facets_match(db)
+
+  assert client.delete('/venues/3').get_json() == {'success': True}
+  assert stored_facets(db, fyyur.Venue) == {'Jazz': 1, 'Folk': 1}
+  assert_facets_match(db)
+
+
+def test_sidebar_lists_genres_with_counts(client, seed):
+  seed(3, 1, 0)
+  body = client.get('/venues').get_data(as_text=True)
+  assert 'genre=Folk' in body and 'genre=Jazz' in body
+
+
+@pytest.mark.parametrize('genres, expected', [
+  (['Jazz'], [1, 3]),
+  (['Jazz', 'Blues'], [3]),
+  (['Punk'], []),
+])
+def test_filters_require_every_genre(client, db, seed, genres, expected):
+  seed(3, 0, 0)
+  genre_ids = fyyur.get_genre_ids(['Blues'])
+  db.session.add(fyyur.VenueGenre(venue_id=3, genre_id=genre_ids['Blues']))
+  db.session.commit()
+  data = client.get('/api/v1/venues', query_string={'genre': genres, 'fields': 'id'}).get_json()['data']
+  assert [item['id'] for item in data] == expected
+  body = client.get('/venues', query_string={'genre': genres}).get_data(as_text=True)
+  assert sorted(int(id) for id in re.findall(r'href="/venues/(\d+)"', body)) == expected
+  search = client.post('/venues/search?' + '&'.join(f'genre={genre}' for genre in genres),
+                       data={'search_term': 'venue'}).get_data(as_text=True)
+  assert sorted(int(id) for id in re.findall(r'href="/venues/(\d+)"', search)) == expected
+
+
+def test_reconcile_fixes_drifted_counts(app, db, seed):
+  seed(2, 2, 0)
+  db.session.execute(fyyur.Genre.__table__.update().where(fyyur.Genre.name == 'Jazz').values(venue_count=7))
+  db.session.commit()
+  runner = app.test_cli_runner()
+  result = runner.invoke(args=['counters', 'reconcile'])
+  assert result.exit_code == 1
+  assert 'genre Jazz: stored venue_count 7, actual 1' in result.output
+  assert runner.invoke(args=['counters', 'reconcile', '--fix']).exit_code == 0
+  assert_facets_match(db)
+
+
+def test_soft_deletes_leave_the_facet_counts_and_purges_leave_them_alone(app, client, db, seed):
+  seed(3, 2, 0)
+  app.config['SOFT_DELETE'] = True
+  try:
+    assert client.delete('/venues/1').get_json() == {'success': True}
+    assert client.delete('/artists/2').get_json() == {'success': True}
+  finally:
+    app.config['SOFT_DELETE'] = False
+  assert stored_facets(db, fyyur.Venue) == {'Jazz': 1, 'Folk': 1}
+  assert stored_facets(db, fyyur.Artist) == {'Jazz': 1}
+  assert_facets_match(db)
+  runner = app.test_cli_runner()
+  assert runner.invoke(args=['counters', 'reconcile']).exit_code == 0
+
+  assert runner.invoke(args=['purge']).exit_code == 0
+  assert stored_facets(db, fyyur.Venue) == {'Jazz': 1, 'Folk': 1}
+  assert stored_facets(db, fyyur.Artist) == {'Jazz': 1}
+  assert_facets_match(db)
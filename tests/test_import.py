@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timedelta
+
+import app as fyyur
+
+VENUE = {'name': 'The Fillmore', 'city': 'San Francisco', 'state': 'CA', 'address': '1805 Geary Blvd',
+         'phone': '555-0100', 'genres': ['Jazz', 'Folk'], 'facebook_link': 'https://www.facebook.com/fillmore'}
+
+
+def write_jsonl(path, rows):
+  path.write_text(''.join((row if isinstance(row, str) else json.dumps(row)) + '\n' for row in rows))
+  return path
+
+
+def run_import(app, kind, path, *args):
+  return app.test_cli_runner().invoke(args=['import', kind, str(path), *args])
+
+
+def read_rejects(path):
+  return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_malformed_rows_are_rejected_and_the_rest_imported(app, db, tmp_path):
+  source = write_jsonl(tmp_path / 'venues.jsonl', [
+    VENUE,
+    dict(VENUE, name=''),
+    '{"name": "truncated',
+    dict(VENUE, name='Bad Link', facebook_link='not a url'),
+    '["not", "an", "object"]',
+    dict(VENUE, name='The Warfield', genres='Rock n Roll;Soul'),
+  ])
+  rejects = tmp_path / 'rejects.jsonl'
+  result = run_import(app, 'venues', source, '--batch-size', '2', '--rejects', str(rejects))
+  assert result.exit_code == 0, result.output
+  assert sorted(name for name, in db.session.query(fyyur.Venue.name)) == ['The Fillmore', 'The Warfield']
+  errors = [reject['errors'] for reject in read_rejects(rejects)]
+  assert [sorted(error) for error in errors] == [['name'], ['row'], ['facebook_link'], ['row']]
+  warfield = db.session.query(fyyur.Venue).filter_by(name='The Warfield').one()
+  assert sorted(genre.name for genre in warfield.children) == ['Rock n Roll', 'Soul']
+
+
+def test_shows_resolve_ids_and_names_and_reject_unknown_ones(app, db, seed, tmp_path):
+  seed(3, 2, 0)
+  db.session.get(fyyur.Venue, 3).name = 'Venue 0'  # makes the name ambiguous
+  db.session.commit()
+  start = (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d %H:%M:%S')
+  source = tmp_path / 'shows.csv'
+  source.write_text('venue_id,venue,artist_id,artist,start_time\n'
+                    f'2,,,Artist 1,{start}\n'
+                    f'99,,1,,{start}\n'
+                    f',Venue 0,1,,{start}\n'
+                    f',Nowhere,1,,{start}\n'
+                    f'1,,1,,not a time\n')
+  rejects = tmp_path / 'rejects.jsonl'
+  result = run_import(app, 'shows', source, '--rejects', str(rejects))
+  assert result.exit_code == 0, result.output
+  assert [(show.venue_id, show.artist_id) for show in db.session.query(fyyur.Show)] == [(2, 2)]
+  assert db.session.get(fyyur.Venue, 2).upcoming_show_count == 1
+  assert [sorted(reject['errors']) for reject in read_rejects(rejects)] == [
+    ['start_time'], ['venue'], ['venue'], ['venue']]
+
+
+def test_interrupted_import_resumes_after_its_checkpoint(app, db, tmp_path):
+  source = write_jsonl(tmp_path / 'venues.jsonl', [dict(VENUE, name=f'Venue {i}') for i in range(5)])
+  db.session.add(fyyur.ImportCheckpoint(source=str(source), kind='venues', rows_committed=3,
+                                        fingerprint=fyyur.file_fingerprint(str(source))))
+  db.session.commit()
+  result = run_import(app, 'venues', source, '--batch-size', '1')
+  assert result.exit_code == 0, result.output
+  assert 'Resuming' in result.output
+  assert sorted(name for name, in db.session.query(fyyur.Venue.name)) == ['Venue 3', 'Venue 4']
+  assert db.session.get(fyyur.ImportCheckpoint, str(source)) is None
+
+
+def test_changed_file_needs_restart(app, db, tmp_path):
+  source = write_jsonl(tmp_path / 'venues.jsonl', [VENUE])
+  db.session.add(fyyur.ImportCheckpoint(source=str(source), kind='venues', rows_committed=1, fingerprint='stale'))
+  db.session.commit()
+  assert run_import(app, 'venues', source).exit_code == 1
+  result = run_import(app, 'venues', source, '--restart')
+  assert result.exit_code == 0, result.output
+  assert db.session.query(fyyur.Venue).count() == 1
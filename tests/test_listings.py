@@ -0,0 +1,38 @@
+from query_stats import assert_max_queries
+
+# Listing pages run a fixed number of statements however many rows they show: the
+# version lookup for conditional requests, the genre facets and the page query.
+
+
+def fetch(client, path):
+  response = client.get(path)
+  body = response.get_data(as_text=True)
+  response.close()
+  return response, body
+
+
+def test_venue_listing_query_count_does_not_grow_with_venues(client, db, seed):
+  seed(4, 4, 8)
+  with assert_max_queries(db.engine, 3, n_plus_one_threshold=5) as few:
+    response, _ = fetch(client, '/venues')
+  assert response.status_code == 200
+
+  seed(60, 60, 240)
+  with assert_max_queries(db.engine, 3, n_plus_one_threshold=5) as many:
+    response, _ = fetch(client, '/venues')
+  assert response.status_code == 200
+  assert many.count == few.count == 3
+
+
+def test_venue_listing_groups_areas_and_counts_upcoming_shows(client, seed):
+  seed(4, 2, 8)
+  _, body = fetch(client, '/venues')
+  assert 'San Francisco' in body and 'New York' in body
+  assert body.count('Venue ') >= 4
+
+
+def test_venue_listing_pages_each_area(client, seed):
+  seed(6, 2, 0)
+  _, body = fetch(client, '/venues?per_area=2&page=2')
+  assert 'Venue 4' in body and 'Venue 5' in body
+  assert 'Venue 0' not in body and 'Venue 1' not in body
@@ -0,0 +1,82 @@
+import runpy
+from pathlib import Path
+
+from prometheus_client import REGISTRY
+from sqlalchemy.pool import QueuePool, SingletonThreadPool, StaticPool
+
+import metrics
+
+# Metric values live in the process-wide registry, so each test compares them before
+# and after the requests it makes.
+
+
+def sample(name, **labels):
+  return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_are_counted_and_timed(client, seed):
+  seed(1, 1, 1)
+  before = sample('fyyur_http_requests_total', endpoint='show_venue', method='GET', status='200')
+  timed = sample('fyyur_http_request_duration_seconds_count', endpoint='show_venue', method='GET')
+  queries = sample('fyyur_http_request_queries_sum', endpoint='show_venue')
+  in_flight = sample('fyyur_http_requests_in_flight')
+  client.get('/venues/1')
+  client.get('/venues/1')
+  assert sample('fyyur_http_requests_total', endpoint='show_venue', method='GET', status='200') == before + 2
+  assert sample('fyyur_http_request_duration_seconds_count', endpoint='show_venue', method='GET') == timed + 2
+  assert sample('fyyur_http_request_queries_sum', endpoint='show_venue') > queries
+  assert sample('fyyur_template_render_seconds_count', template='pages/show_venue.html') >= 1
+  assert sample('fyyur_http_requests_in_flight') == in_flight
+
+
+def test_unmatched_requests_share_one_label(client):
+  before = sample('fyyur_http_requests_total', endpoint='unmatched', method='GET', status='404')
+  client.get('/no/such/page')
+  assert sample('fyyur_http_requests_total', endpoint='unmatched', method='GET', status='404') == before + 1
+
+
+def test_cache_hits_and_misses(client, seed):
+  seed(1, 1, 1)
+  detail = {result: sample('fyyur_cache_requests_total', cache='detail', result=result) for result in ('hit', 'miss')}
+  http_hits = sample('fyyur_cache_requests_total', cache='http', result='hit')
+  response = client.get('/artists/1')
+  client.get('/artists/1')
+  # The revalidation is answered from the cached page too.
+  client.get('/artists/1', headers={'If-None-Match': response.headers['ETag']})
+  assert sample('fyyur_cache_requests_total', cache='detail', result='miss') == detail['miss'] + 1
+  assert sample('fyyur_cache_requests_total', cache='detail', result='hit') == detail['hit'] + 2
+  assert sample('fyyur_cache_requests_total', cache='http', result='hit') == http_hits + 1
+
+
+def test_endpoint_exposes_text_format(client, seed):
+  seed(1, 0, 0)
+  client.get('/venues')
+  response = client.get('/metrics')
+  assert response.status_code == 200
+  assert response.content_type.startswith('text/plain')
+  body = response.get_data(as_text=True)
+  assert 'fyyur_http_requests_total{endpoint="venues",method="GET",status="200"}' in body
+  assert 'fyyur_db_pool_checked_out' in body
+
+
+def test_mark_process_dead_is_a_no_op_in_single_process_mode(monkeypatch):
+  monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+  metrics.mark_process_dead(12345)
+
+
+def test_gunicorn_marks_exited_workers_dead(monkeypatch):
+  marked = []
+  monkeypatch.setattr(metrics, 'mark_process_dead', marked.append)
+  hooks = runpy.run_path(str(Path(__file__).parent.parent / 'gunicorn.conf.py'))
+
+  class Worker:
+    pid = 4242
+  hooks['child_exit'](None, Worker())
+  assert marked == [4242]
+
+
+def test_pool_size_is_sampled_from_every_pool_class():
+  for pool, size in ((QueuePool(None, pool_size=3), 3), (SingletonThreadPool(None, pool_size=3), 0),
+                     (StaticPool(None), 0)):
+    metrics.sample_pool(pool)
+    assert sample('fyyur_db_pool_size') == size
@@ -0,0 +1,68 @@
+import app as fyyur
+import query_plans
+
+
+def flat(*details):
+  # EXPLAIN QUERY PLAN rows at the top level of the plan.
+  return [(node, 0, detail) for node, detail in enumerate(details, 1)]
+
+
+def test_sqlite_scans_are_read_from_the_plan():
+  plan = flat('SCAN venues', 'SEARCH shows USING INDEX ix_shows_venue_id_start_time (venue_id=?)',
+              'SCAN TABLE "artistGenres" AS g USING INDEX sqlite_autoindex_artistGenres_1')
+  assert query_plans.sqlite_seq_scans(plan, 'SELECT 1') == ['venues', 'artistGenres']
+  assert query_plans.sqlite_seq_scans(flat('SEARCH venues USING INTEGER PRIMARY KEY (rowid=?)', 'SCAN shows LEFT-JOIN'),
+                                      'SELECT 1') == ['shows']
+
+
+def test_sqlite_limit_passes_ordered_walks_only():
+  # A walk in the order the query wants stops at the LIMIT; anything else reads it all.
+  walk = flat('SCAN shows USING INDEX ix_shows_start_time_id')
+  assert query_plans.sqlite_seq_scans(walk, 'SELECT 1 FROM shows ORDER BY start_time LIMIT 5') == []
+  assert query_plans.sqlite_seq_scans(flat('SCAN shows'), 'SELECT 1 FROM shows ORDER BY shows.id LIMIT 5') == []
+  assert query_plans.sqlite_seq_scans(flat('SCAN shows'), 'SELECT 1 FROM shows LIMIT 5') == ['shows']
+  assert query_plans.sqlite_seq_scans(flat('SCAN shows USING INDEX ix_shows_start_time_id', 'USE TEMP B-TREE FOR ORDER BY'),
+                                      'SELECT 1 FROM shows ORDER BY x LIMIT 5') == ['shows']
+
+
+def test_sqlite_sorts_only_count_at_their_own_level():
+  # Merging two limited index walks sorts their rows, not the tables.
+  plan = [(1, 0, 'MERGE (UNION ALL)'), (2, 1, 'LEFT'), (3, 2, 'CO-ROUTINE a'),
+          (4, 3, 'SCAN shows USING INDEX ix_shows_start_time_id'), (5, 2, 'SCAN a'),
+          (6, 2, 'USE TEMP B-TREE FOR ORDER BY'), (7, 1, 'RIGHT'), (8, 7, 'CO-ROUTINE b'),
+          (9, 8, 'SCAN shows_archive USING INDEX ix_shows_archive_start_time_id'), (10, 7, 'SCAN b'),
+          (11, 7, 'USE TEMP B-TREE FOR ORDER BY')]
+  assert query_plans.sqlite_seq_scans(plan, 'SELECT 1 ORDER BY start_time LIMIT 5') == ['a', 'b']
+  assert query_plans.sqlite_seq_scans(plan, 'SELECT 1') == ['shows', 'a', 'shows_archive', 'b']
+
+
+def test_postgresql_scans_are_found_in_nested_plans():
+  plan = [{'Plan': {'Node Type': 'Nested Loop', 'Plans': [
+    {'Node Type': 'Index Scan', 'Relation Name': 'venues'},
+    {'Node Type': 'Hash', 'Plans': [{'Node Type': 'Seq Scan', 'Relation Name': 'shows'}]},
+  ]}}]
+  assert query_plans.postgresql_seq_scans(plan) == ['shows']
+
+
+def test_read_routes_use_indexes(app):
+  runner = app.test_cli_runner()
+  result = runner.invoke(args=['seed', '--scale', '0.05', '--anchor', '2030-06-01'])
+  assert result.exit_code == 0, result.output
+  # The genre dictionary is small by design and read whole.
+  # Without ANALYZE, SQLite plans as it would for tables of any size.
+  result = runner.invoke(args=['explain', '--min-rows', '40'])
+  assert result.exit_code == 0, result.output
+  assert ', 0 with sequential scans' in result.output
+
+
+def test_missing_index_fails_the_check(app, db):
+  app.test_cli_runner().invoke(args=['seed', '--scale', '0.05', '--anchor', '2030-06-01'])
+  # With only (venue_id, start_time) gone SQLite walks the (start_time, id) index
+  # instead, which EXPLAIN reports as a bounded SEARCH.
+  for index in ('ix_shows_venue_id_start_time', 'ix_shows_start_time_id'):
+    db.session.execute(db.text(f'DROP INDEX {index}'))
+  db.session.commit()
+  result = app.test_cli_runner().invoke(args=['explain', '--min-rows', '40'])
+  assert result.exit_code == 1
+  assert 'venue_id>: sequential scan of shows' in result.output
+  assert 'WHERE shows.venue_id = ?' in result.output
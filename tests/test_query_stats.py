@@ -0,0 +1,57 @@
+import re
+
+import pytest
+
+import app as fyyur
+import query_stats
+from query_stats import assert_max_queries
+
+SERVER_TIMING = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries", app;dur=[\d.]+')
+
+
+def test_statement_shape_collapses_literals_and_in_lists():
+  assert query_stats.statement_shape("SELECT * FROM venues WHERE id = 12 AND name = 'It''s'") == \
+    query_stats.statement_shape('SELECT *  FROM venues\n WHERE id = 7 AND name = \'x\'')
+  assert query_stats.statement_shape('SELECT 1 FROM shows WHERE id IN (?, ?, ?)') == \
+    'SELECT ? FROM shows WHERE id IN (...)'
+
+
+def test_repeated_shapes_are_counted():
+  stats = query_stats.QueryStats()
+  for id in range(6):
+    stats.record(f'SELECT name FROM artists WHERE id = {id}', 0.001)
+  stats.record('SELECT count(*) FROM shows', 0.01)
+  assert stats.repeated(5) == [('SELECT name FROM artists WHERE id = ?', 6)]
+  assert stats.slowest(1) == [('SELECT count(*) FROM shows', 0.01)]
+
+
+def test_assert_max_queries_fails_over_budget_or_on_n_plus_one(db, seed):
+  seed(3, 0, 0)
+  with pytest.raises(AssertionError, match='2 queries executed, budget is 1'):
+    with assert_max_queries(db.engine, 1):
+      db.session.execute(db.select(fyyur.Venue.id)).all()
+      db.session.execute(db.select(fyyur.Artist.id)).all()
+  with pytest.raises(AssertionError, match='probable N\\+1: 3x'):
+    with assert_max_queries(db.engine, 10, n_plus_one_threshold=3):
+      for id in (1, 2, 3):
+        db.session.execute(db.select(fyyur.Venue.name).where(fyyur.Venue.id == id)).all()
+
+
+def test_responses_carry_server_timing(client, seed):
+  seed(2, 2, 2)
+  response = client.get('/venues/1')
+  assert int(SERVER_TIMING.fullmatch(response.headers['Server-Timing']).group(1)) == 7
+
+
+def test_debug_endpoint_lists_recent_requests(app, client, seed):
+  seed(1, 1, 1)
+  app.config['SQL_DEBUG_ENDPOINT'] = False
+  assert client.get('/debug/queries').status_code == 404
+  app.config['SQL_DEBUG_ENDPOINT'] = True
+  try:
+    client.get('/artists/1?x=1')
+    [latest, *_] = client.get('/debug/queries').get_json()['requests']
+  finally:
+    app.config['SQL_DEBUG_ENDPOINT'] = False
+  assert (latest['path'], latest['status'], latest['queries']) == ('/artists/1?x=1', 200, 7)
+  assert latest['n_plus_one'] == []
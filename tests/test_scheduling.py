@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import app as fyyur
+import intervals
+
+START = datetime(2030, 6, 1, 20, 0)
+
+
+def hours(n):
+  return timedelta(hours=n)
+
+
+def book(db, venue_id, artist_id, start_time, duration_minutes=120):
+  show = fyyur.Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time, duration_minutes=duration_minutes)
+  db.session.add(show)
+  db.session.commit()
+  return show.id
+
+
+def post_show(client, venue_id, artist_id, start_time, duration_minutes=120):
+  response = client.post('/shows/create', data={'venue_id': venue_id, 'artist_id': artist_id,
+                                                'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+                                                'duration_minutes': duration_minutes})
+  with client.session_transaction() as session:
+    flashes = [message for _, message in session.pop('_flashes', [])]
+  return response.headers['Location'], flashes
+
+
+def test_interval_set_finds_overlaps_but_not_neighbours():
+  bookings = intervals.IntervalSet(hours(24))
+  bookings.add(START - hours(20), START + hours(1), 'long')
+  bookings.add(START, START + hours(2), 'main')
+  bookings.add(START + hours(2), START + hours(3), 'after')
+  assert bookings.overlapping(START + hours(1), START + hours(2)) == ['main']
+  assert bookings.overlapping(START - hours(1), START) == ['long']
+  assert bookings.overlapping(START + hours(3), START + hours(4)) == []
+  assert bookings.overlapping(START, START + hours(3), exclude='main') == ['long', 'after']
+
+
+@pytest.mark.parametrize('start, duration, expected', [
+  (START + hours(1), 30, [('venue', 1)]),       # inside the booked show
+  (START - hours(1), 90, [('venue', 1)]),       # runs into it
+  (START - hours(1), 60, []),                   # ends as it starts
+  (START + hours(2), 120, []),                  # starts as it ends
+])
+def test_venue_bookings(client, db, seed, start, duration, expected):
+  seed(1, 2, 0)
+  book(db, 1, 1, START)
+  assert fyyur.find_show_conflicts(1, 2, start, start + timedelta(minutes=duration)) == expected
+  location, flashes = post_show(client, 1, 2, start, duration)
+  if expected:
+    assert location.endswith('/shows/create')
+    assert flashes == ['Show could not be listed: it overlaps another show at this venue.']
+  else:
+    assert flashes == ['Show was successfully listed!']
+  assert db.session.query(fyyur.Show).count() == (1 if expected else 2)
+
+
+def test_artist_and_venue_conflicts_are_reported_together(client, db, seed):
+  seed(2, 2, 0)
+  book(db, 1, 1, START)
+  book(db, 2, 2, START)
+  assert fyyur.find_show_conflicts(1, 2, START, START + hours(1)) == [('venue', 1), ('artist', 2)]
+  _, flashes = post_show(client, 1, 2, START)
+  assert flashes == ['Show could not be listed: it overlaps another show at this venue and for this artist.']
+
+
+def test_a_show_does_not_conflict_with_itself_when_moved(db, seed):
+  seed(1, 1, 0)
+  show_id = book(db, 1, 1, START)
+  book(db, 1, 1, START + hours(3))
+  moved = START + hours(2)
+  assert fyyur.find_show_conflicts(1, 1, moved, moved + hours(2), exclude_id=show_id) == [
+    ('venue', 2), ('artist', 2)]
+  assert fyyur.find_show_conflicts(1, 1, START - hours(1), START + hours(1), exclude_id=show_id) == []
+
+
+def test_commits_invalidate_the_interval_index(db, seed):
+  seed(1, 1, 0)
+  assert fyyur.find_show_conflicts(1, 1, START, START + hours(1)) == []
+  show_id = book(db, 1, 1, START)
+  assert fyyur.find_show_conflicts(1, 1, START, START + hours(1)) == [('venue', show_id), ('artist', show_id)]
+  db.session.delete(db.session.get(fyyur.Show, show_id))
+  db.session.commit()
+  assert fyyur.find_show_conflicts(1, 1, START, START + hours(1)) == []
+
+
+def book_from_another_process(db, venue_id, artist_id, start_time):
+  # None of this process's commit hooks run; only the shows table version moves.
+  with db.engine.begin() as connection:
+    show_id = connection.execute(fyyur.Show.__table__.insert().values(
+      venue_id=venue_id, artist_id=artist_id, start_time=start_time, end_time=start_time + hours(2),
+      duration_minutes=120, updated_at=datetime.utcnow()).returning(fyyur.Show.id)).scalar()
+    table = fyyur.TableVersion.__table__
+    connection.execute(table.update().where(table.c.name == 'shows').values(version=table.c.version + 1))
+  return show_id
+
+
+def test_other_processes_bookings_reach_the_interval_index(db, seed):
+  seed(1, 2, 0)
+  assert fyyur.find_show_conflicts(1, 1, START, START + hours(1)) == []
+  db.session.commit()
+  show_id = book_from_another_process(db, 1, 2, START)
+  assert fyyur.find_show_conflicts(1, 1, START + hours(1), START + hours(3)) == [('venue', show_id)]
+  assert fyyur.find_show_conflicts(1, 1, START + hours(2), START + hours(3)) == []
+  assert fyyur.find_show_conflicts(1, 1, START - hours(1), START) == []
+  assert fyyur.find_show_conflicts(1, 2, START, START + hours(1), exclude_id=show_id) == []
+
+
+def test_own_commits_keep_the_other_interval_sets(db, seed):
+  seed(2, 2, 0)
+  for venue_id in (1, 2):
+    fyyur.find_show_conflicts(venue_id, venue_id, START, START + hours(1))
+  generation = fyyur.show_intervals.generation
+  book(db, 1, 1, START)
+  assert fyyur.show_intervals.generation == generation + 1
+  assert set(fyyur.show_intervals.sets) == {('venue', 2), ('artist', 2)}
+  fyyur.find_show_conflicts(2, 2, START, START + hours(1))
+  assert ('venue', 2) in fyyur.show_intervals.sets
+
+
+def test_end_time_follows_start_time_and_duration(db, seed):
+  seed(1, 1, 0)
+  show = db.session.get(fyyur.Show, book(db, 1, 1, START))
+  assert show.end_time == START + hours(2)
+  show.duration_minutes = 45
+  db.session.commit()
+  assert show.end_time == START + timedelta(minutes=45)
+
+
+def test_show_length_is_bounded(client, db, seed):
+  seed(1, 1, 0)
+  _, flashes = post_show(client, 1, 1, START, fyyur.MAX_SHOW_DURATION + 1)
+  assert flashes == [f'Show length must be between 1 and {fyyur.MAX_SHOW_DURATION} minutes.']
+  assert db.session.query(fyyur.Show).count() == 0
+
+
+def test_import_rejects_shows_that_overlap(app, db, seed, tmp_path):
+  seed(2, 2, 0)
+  book(db, 1, 1, START)
+  source = tmp_path / 'shows.csv'
+  source.write_text('venue_id,artist_id,start_time,duration_minutes\n'
+                    f'1,2,{START + hours(1)},60\n'    # the booked show at venue 1
+                    f'2,2,{START + hours(5)},120\n'
+                    f'2,1,{START + hours(6)},120\n'   # the row before it at venue 2
+                    f'2,1,{START + hours(7)},60\n')
+  rejects = tmp_path / 'rejects.jsonl'
+  result = app.test_cli_runner().invoke(args=['import', 'shows', str(source), '--rejects', str(rejects)])
+  assert result.exit_code == 0, result.output
+  assert [(show.venue_id, show.artist_id) for show in db.session.query(fyyur.Show).order_by(fyyur.Show.id)] == [
+    (1, 1), (2, 2), (2, 1)]
+  assert rejects.read_text().count('overlaps a show booked at this venue') == 2
+
+
+def test_bookings_across_a_month_boundary_conflict(client, db, seed):
+  # Monthly partitions each carry their own exclusion constraints; the application
+  # check is what sees both months.
+  seed(1, 2, 0)
+  book(db, 1, 1, datetime(2030, 5, 31, 23, 0))
+  _, flashes = post_show(client, 1, 2, datetime(2030, 6, 1, 0, 30), 60)
+  assert flashes == ['Show could not be listed: it overlaps another show at this venue.']
+
+
+def test_bookings_lock_their_venue_and_artist_rows(client, db, seed, monkeypatch):
+  # Concurrent bookings for one venue or artist run their conflict checks in turn.
+  seed(1, 1, 0)
+  statements = []
+  execute = db.session.execute
+  monkeypatch.setattr(db.session, 'execute', lambda statement, *args, **kwargs: (
+    statements.append(statement), execute(statement, *args, **kwargs))[1])
+  post_show(client, 1, 1, START)
+  locks = [str(statement.compile(dialect=postgresql.dialect())) for statement in statements
+           if getattr(statement, '_for_update_arg', None) is not None]
+  assert [lock.split('FROM ')[1].split()[0] for lock in locks] == ['venues', 'artists']
+  assert all(lock.endswith('FOR NO KEY UPDATE') for lock in locks)
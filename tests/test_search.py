@@ -0,0 +1,157 @@
+import re
+
+import pytest
+
+import app as fyyur
+import search
+
+RESULT_LINK = re.compile(r'<a href="/(?:venues|artists)/(\d+)">')
+RESULT_COUNT = re.compile(r'Number of search results for "[^"]*": (\d+)')
+
+
+def make_index(documents):
+  # documents: {id: (name, [(text, weight), ...], tags)}; the loader honours ids like
+  # the app's loaders do.
+  def load(ids):
+    for doc_id, (name, fields, tags) in documents.items():
+      if ids is None or doc_id in ids:
+        yield doc_id, name, fields, tags
+  return search.SearchIndex(load)
+
+
+def venue(name, city='Springfield', genres=()):
+  return (name, [(name, search.NAME_WEIGHT), (city, search.LOCATION_WEIGHT)] +
+          [(genre, search.GENRE_WEIGHT) for genre in genres], list(genres))
+
+
+def test_tokenize_drops_case_and_punctuation():
+  assert search.tokenize("The Dueling Pianos' Bar!") == ['the', 'dueling', 'pianos', 'bar']
+  assert search.tokenize('') == [] and search.tokenize(None) == []
+
+
+def test_every_query_token_has_to_match():
+  index = make_index({1: venue('Blue Note', 'New York'), 2: venue('Blue Room', 'Chicago')})
+  assert index.search('blue york', 10) == ([(1, 'Blue Note')], 1)
+  assert index.search('blue boston', 10) == ([], 0)
+
+
+def test_substrings_and_short_tokens_match():
+  index = make_index({1: venue('The Musical Hop'), 2: venue('Park Square Live Music & Coffee')})
+  assert sorted(index.search('usi', 10)[0]) == [(1, 'The Musical Hop'), (2, 'Park Square Live Music & Coffee')]
+  assert index.search('ho', 10)[0] == [(1, 'The Musical Hop')]
+
+
+def test_name_matches_rank_above_genre_and_location_matches():
+  index = make_index({
+    1: venue('Corner Bar', city='Jazzville'),
+    2: venue('Corner Bar Two', genres=['Jazz']),
+    3: venue('Jazz Cellar'),
+  })
+  assert [doc_id for doc_id, _ in index.search('jazz', 10)[0]] == [3, 2, 1]
+
+
+def test_whole_word_and_prefix_matches_rank_above_substrings():
+  index = make_index({1: venue('Reggaeton Hall'), 2: venue('Reggae House'), 3: venue('Ska Reggaestyle')})
+  assert [doc_id for doc_id, _ in index.search('reggae', 10)[0]] == [2, 1, 3]
+
+
+def test_limit_keeps_the_total():
+  index = make_index({doc_id: venue(f'Stage {doc_id}') for doc_id in range(1, 8)})
+  matches, total = index.search('stage', 3)
+  assert [doc_id for doc_id, _ in matches] == [1, 2, 3] and total == 7
+
+
+def test_invalidated_documents_are_reloaded_on_the_next_search():
+  documents = {1: venue('Blue Note'), 2: venue('Red Room')}
+  index = make_index(documents)
+  assert index.search('blue', 10)[1] == 1
+  documents[1] = venue('Green Note')
+  del documents[2]
+  assert index.search('blue', 10)[1] == 1
+  index.invalidate([1, 2])
+  assert index.search('blue', 10) == ([], 0)
+  assert index.search('green', 10) == ([(1, 'Green Note')], 1)
+  assert index.search('room', 10) == ([], 0)
+
+
+def search_page(client, kind, term):
+  body = client.post(f'/{kind}/search', data={'search_term': term}).get_data(as_text=True)
+  return [int(entity_id) for entity_id in RESULT_LINK.findall(body)], int(RESULT_COUNT.search(body).group(1))
+
+
+def test_search_routes_match_name_city_and_genre(client, seed):
+  seed(4, 2, 0)
+  assert search_page(client, 'venues', 'venue 1') == ([2], 1)
+  assert search_page(client, 'venues', 'new york') == ([2, 4], 2)
+  assert search_page(client, 'venues', 'folk') == ([2, 4], 2)
+  assert search_page(client, 'artists', 'artist') == ([1, 2], 2)
+
+
+def test_commits_reach_the_index(client, db, seed):
+  seed(2, 1, 0)
+  assert search_page(client, 'venues', 'fillmore') == ([], 0)
+  db.session.get(fyyur.Venue, 1).name = 'The Fillmore'
+  db.session.commit()
+  assert search_page(client, 'venues', 'fillmore') == ([1], 1)
+  db.session.delete(db.session.get(fyyur.Venue, 1))
+  db.session.commit()
+  assert search_page(client, 'venues', 'fillmore') == ([], 0)
+
+
+def test_rolled_back_changes_do_not_reach_the_index(client, db, seed):
+  seed(1, 1, 0)
+  search_page(client, 'venues', 'venue')
+  db.session.get(fyyur.Venue, 1).name = 'Uncommitted'
+  db.session.flush()
+  db.session.rollback()
+  assert search_page(client, 'venues', 'uncommitted') == ([], 0)
+
+
+def test_other_processes_changes_reload_the_index(client, db, seed, monkeypatch):
+  seed(2, 0, 0)
+  index = fyyur.search_indexes[fyyur.Venue]
+  monkeypatch.setattr(index, 'recheck_seconds', 0)
+  monkeypatch.setattr(index, 'spawn', lambda function: function())
+  assert search_page(client, 'venues', 'venue') == ([1, 2], 2)
+
+  # Another process moves the venue: none of this process's commit hooks run.
+  with db.engine.begin() as connection:
+    connection.execute(fyyur.Venue.__table__.update().where(fyyur.Venue.id == 1).values(city='Reno'))
+  assert search_page(client, 'venues', 'reno') == ([], 0)
+
+  with db.engine.begin() as connection:
+    table = fyyur.TableVersion.__table__
+    connection.execute(table.update().where(table.c.name == 'venue_search').values(version=table.c.version + 1))
+  assert search_page(client, 'venues', 'reno') == ([1], 1)
+
+
+def test_searched_changes_bump_the_generation(db, seed):
+  def generations():
+    db.session.rollback()
+    return dict(db.session.query(fyyur.TableVersion.name, fyyur.TableVersion.version)
+                .filter(fyyur.TableVersion.name.in_(['venue_search', 'artist_search'])))
+  seed(1, 1, 0)
+  before = generations()
+  db.session.get(fyyur.Venue, 1).phone = '555-0199'
+  db.session.commit()
+  assert generations() == before
+  db.session.get(fyyur.Venue, 1).city = 'Oakland'
+  db.session.commit()
+  assert generations() == dict(before, venue_search=before['venue_search'] + 1)
+  fyyur.update_entity(db.session.get(fyyur.Artist, 1), {}, ['Folk'])
+  db.session.commit()
+  assert generations() == dict(before, venue_search=before['venue_search'] + 1,
+                               artist_search=before['artist_search'] + 1)
+
+
+def test_create_all_adds_pg_trgm_on_postgresql():
+  executed = []
+
+  class Connection:
+    class dialect:
+      name = 'postgresql'
+
+    def execute(self, statement):
+      executed.append(str(statement))
+  fyyur.create_trigram_extension(fyyur.db.metadata, Connection())
+  assert executed == ['CREATE EXTENSION IF NOT EXISTS pg_trgm']
@@ -0,0 +1,84 @@
+import json
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import app as fyyur
+import benchmark
+import seed_data
+
+ANCHOR = datetime(2030, 6, 1)
+
+
+def test_generated_rows_depend_only_on_the_seed():
+  def venues(seed):
+    return list(seed_data.generate_entities('venues', 50, seed))
+
+  def shows(seed):
+    return list(seed_data.generate_shows(200, range(1, 51), range(1, 51), seed, ANCHOR))
+
+  assert venues(3) == venues(3) and venues(3) != venues(4)
+  assert shows(3) == shows(3) and shows(3) != shows(4)
+  assert all(abs((show['start_time'] - ANCHOR).days) <= seed_data.SHOW_WINDOW_DAYS for show in shows(3))
+
+
+def test_bookings_are_skewed_towards_a_few_venues():
+  shows = list(seed_data.generate_shows(5000, range(100), range(100), 0, ANCHOR))
+  per_venue = sorted((sum(show['venue_id'] == id for show in shows) for id in range(100)), reverse=True)
+  assert sum(per_venue[:10]) > 3 * sum(per_venue[-10:])
+
+
+def test_seed_command_fills_an_empty_database(app, db, seed):
+  runner = app.test_cli_runner()
+  result = runner.invoke(args=['seed', '--scale', '0.01', '--anchor', '2030-06-01'])
+  assert result.exit_code == 0, result.output
+  counts = [db.session.query(model).count() for model in (fyyur.Venue, fyyur.Artist, fyyur.Show)]
+  assert counts == [10, 10, 100]
+  first = db.session.get(fyyur.Venue, 1).name
+
+  assert runner.invoke(args=['seed', '--scale', '0.01']).exit_code == 1
+  result = runner.invoke(args=['seed', '--scale', '0.01', '--anchor', '2030-06-01', '--reset'])
+  assert result.exit_code == 0, result.output
+  assert db.session.query(fyyur.Show).count() == 100
+  assert db.session.query(fyyur.Venue.name).order_by(fyyur.Venue.id).first() == (first,)
+
+
+def test_benchmark_reports_every_read_route(app, seed, tmp_path):
+  seed(3, 3, 6)
+  output = tmp_path / 'report.json'
+  result = app.test_cli_runner().invoke(args=['benchmark', '--requests', '3', '--warmup', '0', '--samples', '2',
+                                              '--output', str(output)])
+  assert result.exit_code == 0, result.output
+  report = json.loads(output.read_text())
+  assert report['dataset'] == {'venues': 3, 'artists': 3, 'shows': 6}
+  targets = report['targets']
+  assert {'GET /venues/<int:venue_id>', 'GET /venues', 'GET /shows', 'POST /venues/search'} <= set(targets)
+  assert not any(name.startswith(('POST /venues/create', 'GET /metrics')) for name in targets)
+  assert targets['GET /venues/<int:venue_id>']['errors'] == 0
+  # Routes run in URL order, so /api/v1/venues/<id> has already filled the detail
+  # cache and the page runs no query at all.
+  assert targets['GET /venues/<int:venue_id>']['queries'] == {'min': 0, 'max': 0, 'mean': 0.0}
+
+
+def test_compare_flags_changed_routes():
+  def report(p95, queries):
+    return {'targets': {'venues': {'latency_ms': {'p95': p95}, 'queries': {'max': queries}}}}
+
+  assert benchmark.compare(report(10.5, 2), report(10, 2)) == []
+  assert benchmark.compare(report(20, 3), report(10, 2)) == ['venues: p95 10.0ms -> 20.0ms', 'venues: queries 2 -> 3']
+  assert benchmark.compare(report(10, 2), {'targets': {}}) == ['venues: new']
+
+
+def test_web_workers_do_not_load_the_tooling_modules():
+  # Only the seed, benchmark and explain commands import them.
+  script = ("import sys, config; config.SQLALCHEMY_DATABASE_URI = 'sqlite://'; import app; "
+            "print(sorted({'seed_data', 'benchmark', 'query_plans'} & set(sys.modules)))")
+  output = subprocess.run([sys.executable, '-c', script], cwd=Path(fyyur.__file__).parent,
+                          capture_output=True, text=True, check=True).stdout
+  assert output == '[]\n'
+
+
+def test_batched():
+  assert list(fyyur.batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+  assert list(fyyur.batched([], 2)) == []
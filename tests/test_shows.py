@@ -0,0 +1,71 @@
+import html
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as fyyur
+from query_stats import assert_max_queries
+
+NEXT_LINK = re.compile(r'<a href="([^"]*)">More shows</a>')
+ARTIST_LINK = re.compile(r'<a href="/artists/(\d+)">')
+
+
+def book_ties(db, seed, shows, distinct_times):
+  # One show per artist, so the artist links identify shows; start times repeat, so
+  # pages are cut inside runs of equal start_time. Returns artist ids in listing order
+  # and the earliest start time.
+  venue_ids, artist_ids = seed(shows, shows, 0)
+  base = datetime.now().replace(microsecond=0) + timedelta(days=1)
+  booked = []
+  for i, (venue_id, artist_id) in enumerate(zip(venue_ids, artist_ids)):
+    show = fyyur.Show(venue_id=venue_id, artist_id=artist_id, start_time=base + timedelta(hours=i % distinct_times))
+    db.session.add(show)
+    booked.append(show)
+  db.session.commit()
+  return [show.artist_id for show in sorted(booked, key=lambda show: (show.start_time, show.id))], base
+
+
+def page_through(client, path):
+  pages = []
+  while path:
+    response = client.get(path)
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    pages.append([int(artist_id) for artist_id in ARTIST_LINK.findall(body)])
+    match = NEXT_LINK.search(body)
+    path = html.unescape(match.group(1)) if match else None
+  return pages
+
+
+@pytest.mark.parametrize('limit', [1, 4, 5, 12, 13])
+def test_pages_cover_equal_start_times_without_duplicates_or_gaps(client, db, seed, limit):
+  expected, _ = book_ties(db, seed, 12, 3)
+  pages = page_through(client, f'/shows?limit={limit}')
+  assert [artist_id for page in pages for artist_id in page] == expected
+  assert all(len(page) == limit for page in pages[:-1])
+  # The last page is never empty: a full page only links on when more rows exist.
+  assert 0 < len(pages[-1]) <= limit
+  assert len(pages) == -(-len(expected) // limit)
+
+
+def test_pages_respect_start_time_bounds(client, db, seed):
+  expected, base = book_ties(db, seed, 6, 6)
+  start, end = base + timedelta(hours=2), base + timedelta(hours=5)
+  pages = page_through(client, f'/shows?limit=2&from={start.isoformat()}&to={end.isoformat()}')
+  assert [artist_id for page in pages for artist_id in page] == expected[2:5]
+
+
+def test_show_listing_query_count_does_not_grow_with_shows(client, db, seed):
+  book_ties(db, seed, 4, 2)
+  with assert_max_queries(db.engine, 2, n_plus_one_threshold=5) as few:
+    client.get('/shows').get_data()
+  book_ties(db, seed, 60, 7)
+  with assert_max_queries(db.engine, 2, n_plus_one_threshold=5) as many:
+    client.get('/shows').get_data()
+  assert many.count == few.count == 2
+
+
+@pytest.mark.parametrize('query', ['after=garbage', 'after=2030-01-01T00:00:00_x', 'from=not-a-date'])
+def test_bad_cursor_or_bound_is_400(client, query):
+  assert client.get(f'/shows?{query}').status_code == 400
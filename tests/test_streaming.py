@@ -0,0 +1,78 @@
+import pytest
+from prometheus_client import REGISTRY
+
+import app as fyyur
+import streaming
+from query_stats import assert_max_queries
+
+
+def test_listing_can_only_be_iterated_once():
+  listing = streaming.Listing(lambda listing: iter([1, 2]))
+  assert list(listing) == [1, 2]
+  with pytest.raises(RuntimeError):
+    list(listing)
+
+
+@pytest.mark.parametrize('rows, expected, has_more, cursor', [
+  ([1, 2, 3], [1, 2], True, 'after 2'),
+  ([1, 2], [1, 2], False, None),
+  ([], [], False, None),
+])
+def test_take_records_the_next_page(rows, expected, has_more, cursor):
+  listing = streaming.Listing(lambda listing: streaming.take(iter(rows), 2, listing, lambda row: f'after {row}'))
+  assert list(listing) == expected
+  assert (listing.has_more, listing.next_cursor) == (has_more, cursor)
+
+
+def test_grouped_yields_runs_lazily():
+  fetched = []
+
+  def rows():
+    for row in ['a1', 'a2', 'b1']:
+      fetched.append(row)
+      yield row
+
+  groups = streaming.grouped(rows(), key=lambda row: row[0])
+  key, first, group = next(groups)
+  assert (key, first, fetched) == ('a', 'a1', ['a1'])
+  assert list(group) == ['a1', 'a2']
+  assert [(key, list(group)) for key, _, group in groups] == [('b', ['b1'])]
+
+
+@pytest.mark.parametrize('path', ['/venues', '/artists', '/shows'])
+def test_listings_stream_the_same_html_in_small_batches(client, seed, monkeypatch, path):
+  seed(7, 7, 14)
+  whole = client.get(path).get_data()
+  monkeypatch.setattr(fyyur, 'LISTING_YIELD_PER', 2)
+  response = client.get(path)
+  assert response.is_streamed
+  assert response.get_data() == whole
+
+
+def test_venue_listing_flags_a_next_page_after_rendering_its_areas(client, seed):
+  seed(6, 0, 0)
+  first = client.get('/venues?per_area=2').get_data(as_text=True)
+  last = client.get('/venues?per_area=2&page=2').get_data(as_text=True)
+  assert 'page=2">Next</a>' in first
+  assert '>Next</a>' not in last
+
+
+def test_streamed_pages_are_measured_when_they_close(app, client, seed, monkeypatch):
+  seed(7, 7, 14)
+  monkeypatch.setattr(fyyur, 'LISTING_YIELD_PER', 2)
+  monkeypatch.setitem(app.config, 'SQL_DEBUG_ENDPOINT', True)
+  requests = REGISTRY.get_sample_value('fyyur_http_requests_total',
+                                       {'endpoint': 'shows', 'method': 'GET', 'status': '200'}) or 0
+  in_flight = REGISTRY.get_sample_value('fyyur_http_requests_in_flight')
+  with assert_max_queries(fyyur.db.engine, 10) as executed:
+    response = client.get('/shows')
+    assert response.is_streamed and 'Server-Timing' not in response.headers
+    response.get_data()
+  assert REGISTRY.get_sample_value('fyyur_http_requests_in_flight') == in_flight + 1
+  response.close()
+  assert REGISTRY.get_sample_value('fyyur_http_requests_in_flight') == in_flight
+  assert REGISTRY.get_sample_value('fyyur_http_requests_total',
+                                   {'endpoint': 'shows', 'method': 'GET', 'status': '200'}) == requests + 1
+  [latest, *_] = client.get('/debug/queries').get_json()['requests']
+  # Every query of the page, not just those before the first chunk.
+  assert (latest['path'], latest['queries']) == ('/shows', executed.count)
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as fyyur
+from query_stats import assert_max_queries
+
+
+@pytest.fixture(autouse=True)
+def cold_detail_cache():
+  fyyur.detail_cache.clear()
+
+
+def stored(db, kind, entity_id):
+  # The summary row's data, or None when it is missing or cleared.
+  db.session.rollback()
+  row = db.session.execute(fyyur.summary_statement(kind, entity_id)).first()
+  return row and row.data
+
+
+def page(client, path):
+  fyyur.detail_cache.clear()
+  response = client.get(path)
+  assert response.status_code == 200
+  return response.get_data(as_text=True)
+
+
+def test_pages_build_their_summary_on_first_read(client, db, seed):
+  seed(2, 2, 4)
+  assert stored(db, 'venue', 1) is None
+  page(client, '/venues/1')
+  assert '"name":"Venue 0"' in stored(db, 'venue', 1)
+  assert stored(db, 'venue', 2) is None
+
+
+def test_pages_are_served_from_the_stored_summary(client, db, seed):
+  seed(1, 1, 2)
+  page(client, '/artists/1')
+  db.session.execute(db.update(fyyur.ArtistSummary).values(
+    data=db.func.replace(fyyur.ArtistSummary.data, 'Artist 0', 'Stored Artist')))
+  db.session.commit()
+  assert 'Stored Artist' in page(client, '/artists/1')
+
+  # Once its next show has started the page is rebuilt from the tables.
+  db.session.execute(db.update(fyyur.ArtistSummary).values(expires_at=datetime.now() - timedelta(minutes=1)))
+  db.session.commit()
+  body = page(client, '/artists/1')
+  assert 'Stored Artist' not in body and 'Artist 0' in body
+
+
+def test_writes_clear_the_pages_they_change(client, db, seed):
+  seed(2, 2, 0)
+  for path in ('/venues/1', '/venues/2', '/artists/1', '/artists/2'):
+    page(client, path)
+  db.session.add(fyyur.Show(venue_id=1, artist_id=2, start_time=datetime.now() + timedelta(days=3)))
+  db.session.commit()
+  assert [stored(db, 'venue', 1), stored(db, 'artist', 2)] == [None, None]
+  assert stored(db, 'venue', 2) and stored(db, 'artist', 1)
+  assert 'Artist 1' in page(client, '/venues/1')
+
+  # Renaming the artist changes the venue page that lists the show.
+  artist = db.session.get(fyyur.Artist, 2)
+  artist.name = 'Renamed Artist'
+  db.session.commit()
+  assert stored(db, 'venue', 1) is None
+  assert 'Renamed Artist' in page(client, '/venues/1')
+
+
+def test_rebuild_command(app, client, db, seed):
+  seed(3, 2, 4)
+  page(client, '/venues/1')
+  runner = app.test_cli_runner()
+  result = runner.invoke(args=['summaries', 'rebuild', '--stale-only', '--batch-size', '1'])
+  assert result.exit_code == 0, result.output
+  assert result.output == 'Rebuilt 2 venue summaries.\nRebuilt 2 artist summaries.\n'
+  assert all(stored(db, 'venue', venue_id) for venue_id in (1, 2, 3))
+  result = runner.invoke(args=['summaries', 'rebuild', '--stale-only'])
+  assert result.output == 'Rebuilt 0 venue summaries.\nRebuilt 0 artist summaries.\n'
+  result = runner.invoke(args=['summaries', 'rebuild'])
+  assert result.output == 'Rebuilt 3 venue summaries.\nRebuilt 2 artist summaries.\n'
+
+
+def test_a_summary_found_fresh_under_the_lock_is_not_rebuilt(client, db, seed):
+  # Readers that queued behind another's rebuild take its result.
+  seed(2, 1, 2)
+  page(client, '/venues/1')
+  with assert_max_queries(db.engine, 2) as stats:
+    built = fyyur.build_summaries('venue', [1])
+    db.session.commit()
+  assert built[1]['name'] == 'Venue 0'
+  # Only the no-op insert of a missing row, and the locking read.
+  assert [statement.split()[0] for statement, _ in stats.statements] == ['INSERT', 'SELECT']
+
+
+def test_hidden_entities_lose_their_summary(app, client, db, seed):
+  seed(2, 1, 2)
+  page(client, '/venues/1')
+  app.config['SOFT_DELETE'] = True
+  try:
+    client.delete('/venues/1')
+  finally:
+    app.config['SOFT_DELETE'] = False
+  assert client.get('/venues/1').status_code == 404
+  db.session.rollback()
+  assert db.session.execute(fyyur.summary_statement('venue', 1)).first() is None